@@ -1,5 +1,9 @@
 from data_loader import MinuteDataLoader
 from dominant_contract import DominantContractLoader
+from bar_resampler import BarResampler
+from continuous_cache import ContinuousSeriesCache
+import queue
+import threading
 import pandas as pd
 import numpy as np
 from tabulate import tabulate
@@ -7,13 +11,26 @@ from visualizer import BacktestVisualizer
 import matplotlib.pyplot as plt
 
 class BacktestEngine:
-    def __init__(self, initial_capital=1000000, commission_rate=0.00005):
+    def __init__(self, initial_capital=1000000, commission_rate=0.00005, continuous_cache_dir=None):
+        """
+        Parameters:
+        -----------
+        initial_capital: float
+            初始资金
+        commission_rate: float
+            手续费率
+        continuous_cache_dir: str
+            主力连续数据的缓存目录（第一次写入时创建，如 continuous_cache.DEFAULT_CACHE_DIR），
+            默认None表示不缓存，每次重新拼接
+        """
         self.initial_capital = initial_capital
         self.current_capital = initial_capital
         self.positions = {}  # 当前持仓 {symbol: position}
         self.trades = []     # 交易记录
         self.data_loader = MinuteDataLoader()
         self.dominant_loader = DominantContractLoader()
+        # 主力连续数据缓存（同一品种只读取缺少的日期）
+        self.continuous_cache = ContinuousSeriesCache(self.dominant_loader, continuous_cache_dir)
         self.data = None
         self.commission_rate = commission_rate  # 手续费率
         
@@ -29,6 +46,7 @@ class BacktestEngine:
             ['费后收益', f"{results['费后收益']:,.2f}"],
             ['换手率', f"{results['换手率']:.2%}"],
             ['交易次数', results['交易次数']],
+            ['交易天数', results['交易天数']],
             ['合约切换次数', results['合约切换次数']]
         ]
         
@@ -58,39 +76,32 @@ class BacktestEngine:
         df['cash'] = self.initial_capital
         df['commission'] = 0
         
-        # 遍历所有交易，更新持仓和现金
         trades_df = pd.DataFrame(self.trades)
         if trades_df.empty:
-            return df
+            # 没有交易时（如较短的样本外区间）净值保持不变
+            trades_df = pd.DataFrame(columns=['timestamp', 'direction', 'volume', 'cost', 'commission'])
         
-        trades_df['timestamp'] = pd.to_datetime(trades_df['timestamp'])
-        trades_df = trades_df.set_index('timestamp')
+        # 定位每笔交易所在的K线，不在数据中的时间戳忽略
+        timestamps = pd.DatetimeIndex(pd.to_datetime(trades_df['timestamp']))
+        locs = df.index.searchsorted(timestamps)
+        valid = locs < len(df)
+        valid[valid] = df.index[locs[valid]] == timestamps[valid]
+        locs = locs[valid]
+        direction = trades_df['direction'].values[valid].astype(float)
         
-        # 初始化当前持仓
-        current_position = 0
-        current_cash = self.initial_capital
+        # 按K线累加持仓、现金和手续费变动，再做累计求和
+        position_change = np.zeros(len(df))
+        cash_change = np.zeros(len(df))
+        commission = np.zeros(len(df))
+        np.add.at(position_change, locs, direction * trades_df['volume'].values[valid])
+        np.add.at(cash_change, locs, -(direction * trades_df['cost'].values[valid] +
+                                      trades_df['commission'].values[valid]))
+        np.add.at(commission, locs, trades_df['commission'].values[valid])
         
-        for timestamp in df.index:
-            # 更新当日交易
-            if timestamp in trades_df.index:
-                day_trades = trades_df.loc[timestamp]
-                if isinstance(day_trades, pd.Series):
-                    day_trades = pd.DataFrame([day_trades])
-                
-                for _, trade in day_trades.iterrows():
-                    # 更新持仓
-                    current_position += trade['direction'] * trade['volume']
-                    # 更新现金
-                    current_cash -= trade['direction'] * trade['cost'] + trade['commission']
-                    # 记录手续费
-                    df.loc[timestamp, 'commission'] += trade['commission']
-            
-            # 更新当前状态
-            df.loc[timestamp, 'position'] = current_position
-            df.loc[timestamp, 'cash'] = current_cash
-            
-            # 计算持仓市值
-            df.loc[timestamp, 'position_value'] = current_position * df.loc[timestamp, 'close']
+        df['position'] = np.cumsum(position_change)
+        df['cash'] = self.initial_capital + np.cumsum(cash_change)
+        df['commission'] = commission
+        df['position_value'] = df['position'] * df['close']
         
         # 计算总资产和收益
         df['total_value'] = df['cash'] + df['position_value']
@@ -99,7 +110,49 @@ class BacktestEngine:
         
         return df
     
-    def run_backtest(self, strategy, symbol, start_date, end_date, show_plots=True):
+    def load_data(self, symbol, start_date, end_date, bar_size=None):
+        """
+        加载回测数据（同 run_backtest 的数据加载），结果同时保存在 self.data
+        
+        Parameters:
+        -----------
+        symbol: str
+            合约代码（如 'IF2309'）或品种代码（如 'IF'，加载主力连续数据）
+        start_date, end_date: str
+            日期，格式：'YYYYMMDD'
+        bar_size: str
+            K线周期（如 '15min'），None为分钟K线
+            
+        Returns:
+        --------
+        pd.DataFrame: 行情数据，索引为时间戳，包含 symbol 列
+        """
+        self._load_data(symbol, start_date, end_date, bar_size=bar_size)
+        return self.data
+    
+    def _load_data(self, symbol, start_date, end_date, data=None, bar_size=None):
+        """加载回测数据，返回是否为主力连续合约"""
+        # 判断是否是品种代码（主力合约）
+        is_dominant = len(symbol) <= 2 or symbol.isalpha()
+        
+        if data is not None:
+            # 使用调用方预先加载的数据
+            self.data = data
+        elif bar_size is not None:
+            # 读取合成后的高周期K线（按数据文件指纹缓存）
+            resampler = BarResampler(self.data_loader, self.dominant_loader)
+            self.data = resampler.load(symbol, start_date, end_date, bar_size)
+        elif is_dominant:
+            # 加载主力合约数据
+            self.data = self.continuous_cache.load(symbol, start_date, end_date)
+        else:
+            # 加载单个合约数据
+            self.data = self.data_loader.load_future_data(symbol, start_date, end_date)
+            self.data['symbol'] = symbol  # 添加合约列
+        return is_dominant
+    
+    def run_backtest(self, strategy, symbol, start_date, end_date, show_plots=True,
+                     data=None, plot=True, verbose=True, bar_size=None):
         """
         运行回测
         
@@ -115,18 +168,17 @@ class BacktestEngine:
             结束日期 'YYYYMMDD'
         show_plots: bool
             是否显示图表
+        data: pd.DataFrame
+            预先加载的K线数据（需包含symbol列），为None时从数据目录加载
+        plot: bool
+            是否生成图表
+        verbose: bool
+            是否打印回测结果
+        bar_size: str
+            K线周期，如 '15min'、'60min' 或 'D'（日线），None表示使用分钟K线；见 bar_resampler
         """
-        # 判断是否是品种代码（主力合约）
-        is_dominant = len(symbol) <= 2 or symbol.isalpha()
-        
-        if is_dominant:
-            # 加载主力合约数据
-            self.data = self.dominant_loader.load_dominant_data(symbol, start_date, end_date)
-            current_contract = None
-        else:
-            # 加载单个合约数据
-            self.data = self.data_loader.load_future_data(symbol, start_date, end_date)
-            self.data['symbol'] = symbol  # 添加合约列
+        is_dominant = self._load_data(symbol, start_date, end_date, data, bar_size)
+        current_contract = None
             
         # 回测主循环
         for i, (timestamp, bar) in enumerate(self.data.iterrows()):
@@ -148,13 +200,180 @@ class BacktestEngine:
                 
                 self._process_signals(signals, bar['symbol'], bar, next_open)
                 
+        return self._finish_backtest(strategy, show_plots, plot, verbose)
+    
+    def run_vectorized_backtest(self, strategy, symbol, start_date, end_date, show_plots=True,
+                                data=None, plot=True, verbose=True, bar_size=None):
+        """
+        向量化回测：策略一次性生成整段数据的交易信号，只对信号和合约切换逐笔撮合
+        
+        撮合规则与 run_backtest 一致（下一根K线开盘价成交、同一K线先处理合约切换再处理信号），
+        要求策略实现 generate_signal_arrays 方法
+        
+        Parameters:
+        -----------
+        同 run_backtest
+        """
+        is_dominant = self._load_data(symbol, start_date, end_date, data, bar_size)
+        signals = strategy.generate_signal_arrays(self.data)
+        
+        opens = self.data['open'].values
+        symbols = self.data['symbol'].values
+        
+        # 合约切换K线（仅主力连续合约）
+        if is_dominant and len(symbols) > 1:
+            switch_indices = np.flatnonzero(symbols[1:] != symbols[:-1]) + 1
+        else:
+            switch_indices = np.array([], dtype=int)
+        
+        # 按K线顺序合并切换事件与交易信号，同一K线先处理切换
+        signal_indices = np.asarray(signals['bar_index'], dtype=int)
+        event_bars = np.concatenate([switch_indices, signal_indices])
+        event_kinds = np.concatenate([np.zeros(len(switch_indices), dtype=int),
+                                      np.ones(len(signal_indices), dtype=int)])
+        event_refs = np.concatenate([np.arange(len(switch_indices)), np.arange(len(signal_indices))])
+        order = np.lexsort((event_refs, event_kinds, event_bars))
+        
+        for k in order:
+            i = event_bars[k]
+            bar = self.data.iloc[i]
+            if event_kinds[k] == 0:
+                self._handle_contract_switch(symbols[i - 1], symbols[i], bar)
+                continue
+            j = event_refs[k]
+            signal = {
+                'direction': signals['direction'][j],
+                'volume': signals['volume'][j]
+            }
+            next_open = opens[i + 1] if i + 1 < len(opens) else None
+            self._process_signals([signal], symbols[i], bar, next_open)
+        
+        return self._finish_backtest(strategy, show_plots, plot, verbose)
+    
+    def _iter_days(self, symbol, start_date, end_date, is_dominant):
+        """逐日读取K线数据（含当日主力合约选择），没有数据的日期跳过"""
+        if is_dominant:
+            yield from self.dominant_loader.iter_dominant_days(symbol, start_date, end_date)
+            return
+        for date in pd.date_range(pd.Timestamp(start_date), pd.Timestamp(end_date), freq='D'):
+            date_str = date.strftime('%Y%m%d')
+            try:
+                data = self.data_loader.load_future_data(symbol, date_str, date_str)
+            except ValueError:
+                continue
+            data['symbol'] = symbol
+            yield date_str, data
+    
+    def _prefetch_days(self, days, prefetch_days):
+        """
+        后台线程预读后续交易日的数据，队列长度不超过 prefetch_days，回测落后时读取线程等待
+        
+        Returns:
+        --------
+        tuple: (逐日数据迭代器, 停止事件)，提前结束时设置停止事件让读取线程退出
+        """
+        buffer = queue.Queue(maxsize=max(1, prefetch_days))
+        stop = threading.Event()
+        end = object()
+        
+        def put(item):
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def producer():
+            try:
+                for item in days:
+                    if not put(item):
+                        return
+            except Exception as e:
+                put(e)
+                return
+            put(end)
+        
+        threading.Thread(target=producer, daemon=True).start()
+        
+        def consume():
+            while True:
+                item = buffer.get()
+                if item is end:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        
+        return consume(), stop
+    
+    def run_streaming_backtest(self, strategy, symbol, start_date, end_date, show_plots=True,
+                               plot=True, verbose=True, prefetch_days=2):
+        """
+        流式回测：逐日读取数据并回测，后台线程同时预读并解析后续交易日（含主力合约选择），
+        读取与计算重叠进行
+        
+        撮合规则与 run_backtest 一致，每日最后一根K线的信号以下一交易日第一根K线的开盘价成交，
+        因此回测第N日时至少需要已读取第N+1日
+        
+        每日数据回测完即释放，只保留计算净值和绘图所需的 close、symbol 列，回测结束后的 self.data
+        只包含这两列
+        
+        Parameters:
+        -----------
+        prefetch_days: int
+            预读的交易日数量上限，控制内存占用
+        其余参数同 run_backtest
+        """
+        is_dominant = len(symbol) <= 2 or symbol.isalpha()
+        days, stop = self._prefetch_days(self._iter_days(symbol, start_date, end_date, is_dominant), prefetch_days)
+        current_contract = None
+        daily_data = []
+        
+        try:
+            pending = next(days, None)
+            while pending is not None:
+                _, day_data = pending
+                pending = next(days, None)
+                following_open = pending[1]['open'].iloc[0] if pending is not None else None
+                daily_data.append(day_data[['close', 'symbol']])
+                
+                opens = day_data['open'].values
+                for i, (timestamp, bar) in enumerate(day_data.iterrows()):
+                    # 如果合约发生变化，需要处理持仓转移
+                    if is_dominant and (current_contract != bar['symbol']):
+                        if current_contract is not None:
+                            self._handle_contract_switch(current_contract, bar['symbol'], bar)
+                        current_contract = bar['symbol']
+                    
+                    # 更新策略
+                    signals = strategy.on_bar(timestamp, bar)
+                    
+                    # 处理交易信号，当日最后一根K线使用下一交易日的开盘价
+                    if signals:
+                        next_open = opens[i + 1] if i + 1 < len(opens) else following_open
+                        self._process_signals(signals, bar['symbol'], bar, next_open)
+                # 当日数据回测完即释放
+                del day_data, opens
+        finally:
+            stop.set()
+        
+        if not daily_data:
+            raise ValueError(f"未找到{symbol}在指定日期范围内的数据")
+        self.data = pd.concat(daily_data)
+        return self._finish_backtest(strategy, show_plots, plot, verbose)
+    
+    def _finish_backtest(self, strategy, show_plots, plot=True, verbose=True):
+        """计算回测结果并绘制图表"""
         # 计算回测结果
         self.pnl_df = self._calculate_pnl()
         results = self._calculate_results()
-        self.print_results(results)
+        if verbose:
+            self.print_results(results)
         
         # 绘制图表
-        if self.trades:
+        if plot and self.trades:
             visualizer = BacktestVisualizer(
                 self.trades, 
                 self.data, 
@@ -243,6 +462,8 @@ class BacktestEngine:
     def _calculate_results(self):
         """计算回测结果统计"""
         trades_df = pd.DataFrame(self.trades)
+        if trades_df.empty:
+            trades_df = pd.DataFrame(columns=['timestamp', 'symbol', 'type', 'cost'])
         
         # 使用pnl_df中的结果
         final_pnl = self.pnl_df['pnl'].iloc[-1]
@@ -254,14 +475,12 @@ class BacktestEngine:
         turnover_rate = total_trade_value / avg_capital
         
         # 获取合约切换信息
-        switch_trades = trades_df[trades_df['type'] == 'switch_close']
-        contract_switches = []
-        for _, trade in switch_trades.iterrows():
-            contract_switches.append({
-                '切换时间': trade['timestamp'],
-                '旧合约': trade['symbol'],
-                '新合约': trades_df.loc[trades_df.index[trades_df.index.get_loc(trade.name) + 1], 'symbol']
-            })
+        # 换月时平仓旧合约和开仓新合约的成交相邻记录，平仓的下一笔即为新合约
+        closes = np.flatnonzero(trades_df['type'].to_numpy() == 'switch_close')
+        symbols = trades_df['symbol'].to_numpy()
+        contract_switches = [{'切换时间': timestamp, '旧合约': old, '新合约': new}
+                             for timestamp, old, new in zip(trades_df['timestamp'].iloc[closes],
+                                                            symbols[closes], symbols[closes + 1])]
         
         # 按交易类型分类统计
         normal_trades = trades_df[trades_df['type'] == 'trade']
@@ -276,6 +495,7 @@ class BacktestEngine:
             '费后收益': final_pnl,
             '换手率': turnover_rate,
             '交易次数': len(normal_trades),
+            '交易天数': pd.DatetimeIndex(self.data.index).normalize().nunique(),
             '合约切换次数': len(switch_trades) // 2,
             '合约切换记录': contract_switches
         }
@@ -0,0 +1,453 @@
+"""
+常驻回测服务
+
+长期运行的本地进程，已加载的行情数据（含主力合约切换）保存在内存中，通过 localhost HTTP
+接收回测或参数扫描请求并返回结果，省去每次启动解释器、导入依赖和重新读取数据的时间。
+
+启动服务：
+    python backtest_server.py --port 8765 --preload IF 20240101 20241105
+
+客户端（如 notebook 中）：
+    client = BacktestClient(port=8765)
+    client.backtest('MA', {'short_period': 5, 'long_period': 20}, 'IF', '20240101', '20241105')
+    client.sweep('Grid', {'grid_num': [5, 10], 'price_range_ratio': [0.01, 0.02]}, 'IF', '20240101', '20241105')
+
+接口：
+- POST /backtest  单次回测
+- POST /sweep     参数扫描
+- GET  /status    已缓存的数据和运行时间
+- POST /evict     清空数据缓存（并关闭进程池，正在运行的扫描结束后再关闭）
+"""
+import argparse
+import importlib
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+import pandas as pd
+from backtest_engine import BacktestEngine
+from parallel_executor import ParallelExecutor, run_task, slice_dates
+from param_space import ParamSpace
+
+# 可直接使用简称的策略
+STRATEGY_ALIASES = {
+    'VWAP': 'strategies.vwap_strategy.VWAPStrategy',
+    'MA': 'strategies.ma_strategy.MAStrategy',
+    'Grid': 'strategies.grid_strategy.GridStrategy',
+    'DailyReturn': 'strategies.daily_return_strategy.DailyReturnStrategy'
+}
+
+
+def resolve_strategy(name, reload=False):
+    """
+    按简称或 strategies 包内的完整路径（如 'strategies.ma_strategy.MAStrategy'）查找策略类
+
+    reload 为 True 时重新加载策略所在模块，修改策略代码后无需重启服务。只重新加载策略类所在的模块，
+    策略依赖的其他模块（如 strategies.indicators）修改后仍需重启服务
+    """
+    path = STRATEGY_ALIASES.get(name, name)
+    module_name, _, class_name = path.rpartition('.')
+    if not module_name.startswith('strategies.'):
+        raise ValueError(f"只能使用 strategies 包中的策略: {name}")
+    module = importlib.import_module(module_name)
+    if reload:
+        module = importlib.reload(module)
+    return getattr(module, class_name)
+
+
+def _to_json(value):
+    """结果中的 numpy 标量、时间戳和 pd.Series 转换为 JSON 格式"""
+    if isinstance(value, pd.Series):
+        return {str(k.date()) if hasattr(k, 'date') else str(k): float(v) for k, v in value.items()}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return str(value)
+    raise TypeError(f"无法序列化的类型: {type(value)}")
+
+
+class MarketDataCache:
+    """
+    内存中的行情数据缓存
+
+    请求的日期区间落在已加载的区间内时直接截取，否则加载并缓存新区间。数据在全局锁之外加载，同一区间的
+    并发请求只加载一次，加载期间其他数据的请求不受影响。超过 max_datasets 个数据集时淘汰最久未使用的，
+    每个数据集的并行回测进程池随数据集一起保留和淘汰；进程池按使用计数管理，淘汰或清空时正在运行扫描的
+    进程池等扫描结束后再关闭
+
+    Parameters:
+    -----------
+    max_datasets: int
+        最多缓存的数据集数量
+    """
+    def __init__(self, max_datasets=4):
+        self.max_datasets = max_datasets
+        self.datasets = OrderedDict()  # {(品种, 开始日期, 结束日期, K线周期): pd.DataFrame}，按最近使用排序
+        self.executors = {}  # {(数据集, 进程数): ParallelExecutor}
+        self.lock = threading.Lock()
+        self._leases = {}  # {ParallelExecutor: 正在使用的请求数}
+        self._retired = set()  # 已从缓存中移除、等待使用结束后关闭的进程池
+        self._loading = {}  # {数据集: 加载锁}
+
+    def _find(self, symbol, start_date, end_date, bar_size):
+        """查找覆盖请求区间的数据集（需持有 self.lock），返回数据集键"""
+        for key in self.datasets:
+            cached_symbol, cached_start, cached_end, cached_bar_size = key
+            if (cached_symbol == symbol and cached_bar_size == bar_size
+                    and cached_start <= start_date and end_date <= cached_end):
+                self.datasets.move_to_end(key)
+                return key
+        return None
+
+    def acquire(self, symbol, start_date, end_date, bar_size=None):
+        """
+        获取覆盖请求区间的数据集，没有时加载
+
+        Returns:
+        --------
+        tuple: (数据集键, 完整数据集)
+        """
+        key = (symbol, start_date, end_date, bar_size)
+        with self.lock:
+            found = self._find(symbol, start_date, end_date, bar_size)
+            if found is not None:
+                return found, self.datasets[found]
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            # 等待期间可能已由其他请求加载
+            with self.lock:
+                found = self._find(symbol, start_date, end_date, bar_size)
+                if found is not None:
+                    return found, self.datasets[found]
+            try:
+                data = BacktestEngine().load_data(symbol, start_date, end_date, bar_size)
+            finally:
+                with self.lock:
+                    self._loading.pop(key, None)
+            with self.lock:
+                self.datasets[key] = data
+                evicted = self._evict()
+        self._close_executors(evicted)
+        return key, data
+
+    def get(self, symbol, start_date, end_date, bar_size=None):
+        """按请求区间截取的行情数据"""
+        _, data = self.acquire(symbol, start_date, end_date, bar_size)
+        return slice_dates(data, start_date, end_date)
+
+    @contextmanager
+    def executor(self, key, data, n_jobs):
+        """
+        数据集对应的并行回测进程池（同一数据集和进程数只创建一次，之后的请求共用），在 with 语句中使用，
+        使用期间进程池被淘汰或清空时延迟到最后一个使用者退出后再关闭
+
+        Yields:
+        -------
+        ParallelExecutor: 数据集已被淘汰时为None
+        """
+        executor = self._checkout(key, data, n_jobs)
+        try:
+            yield executor
+        finally:
+            if executor is not None:
+                self._release(executor)
+
+    def _checkout(self, key, data, n_jobs):
+        """取出（必要时创建）进程池并增加使用计数"""
+        with self.lock:
+            executor = self.executors.get((key, n_jobs))
+            if executor is not None or key not in self.datasets:
+                return self._lease(executor)
+        # 把数据复制到共享内存较慢，在锁外创建；并发创建时保留先创建的
+        created = ParallelExecutor(data, n_jobs)
+        with self.lock:
+            if key in self.datasets:
+                executor = self._lease(self.executors.setdefault((key, n_jobs), created))
+        if executor is not created:
+            created.close()
+        return executor
+
+    def _lease(self, executor):
+        """增加进程池的使用计数（需持有 self.lock）"""
+        if executor is not None:
+            self._leases[executor] = self._leases.get(executor, 0) + 1
+        return executor
+
+    def _release(self, executor):
+        """减少进程池的使用计数，已从缓存中移除且不再使用时关闭"""
+        with self.lock:
+            self._leases[executor] -= 1
+            idle = self._leases[executor] == 0
+            if idle:
+                del self._leases[executor]
+            retired = idle and executor in self._retired
+            if retired:
+                self._retired.remove(executor)
+        if retired:
+            executor.close()
+
+    def _retire(self, executors):
+        """
+        移除进程池（需持有 self.lock）：正在使用的等使用结束后关闭，其余立即关闭
+
+        Returns:
+        --------
+        list: 可以立即关闭的进程池，在锁外关闭
+        """
+        idle = []
+        for executor in executors:
+            if executor in self._leases:
+                self._retired.add(executor)
+            else:
+                idle.append(executor)
+        return idle
+
+    def _evict(self):
+        """淘汰超出数量上限的数据集（需持有 self.lock），返回可以立即关闭的进程池"""
+        evicted = []
+        while len(self.datasets) > self.max_datasets:
+            key, _ = self.datasets.popitem(last=False)
+            evicted.extend(self.executors.pop(k) for k in list(self.executors) if k[0] == key)
+        return self._retire(evicted)
+
+    @staticmethod
+    def _close_executors(executors):
+        for executor in executors:
+            executor.close()
+
+    def recycle_executors(self):
+        """
+        关闭全部进程池（正在使用的延迟关闭），之后的请求创建新的进程池，子进程重新导入策略模块
+        """
+        with self.lock:
+            executors, self.executors = list(self.executors.values()), {}
+            idle = self._retire(executors)
+        self._close_executors(idle)
+
+    def status(self):
+        with self.lock:
+            return [{'symbol': symbol, 'start_date': start, 'end_date': end, 'bar_size': bar_size, 'bars': len(data)}
+                    for (symbol, start, end, bar_size), data in self.datasets.items()]
+
+    def clear(self):
+        """清空数据集并关闭进程池（正在使用的延迟关闭）"""
+        with self.lock:
+            self.datasets = OrderedDict()
+        self.recycle_executors()
+
+
+class BacktestService:
+    """
+    回测服务：解析请求、在缓存数据上运行回测
+
+    Parameters:
+    -----------
+    initial_capital: float
+        默认初始资金
+    commission_rate: float
+        默认手续费率
+    max_datasets: int
+        最多缓存的行情数据集数量
+    """
+    def __init__(self, initial_capital=1000000, commission_rate=0.00005, max_datasets=4):
+        self.initial_capital = initial_capital
+        self.commission_rate = commission_rate
+        self.data = MarketDataCache(max_datasets)
+        self.start_time = time.time()
+
+    def _task(self, job, strategy, params):
+        return {
+            'strategy': strategy,
+            'params': params,
+            'symbol': job['symbol'],
+            'start_date': job['start_date'],
+            'end_date': job['end_date'],
+            'initial_capital': job.get('initial_capital', self.initial_capital),
+            'commission_rate': job.get('commission_rate', self.commission_rate),
+            'return_equity': job.get('return_equity', False)
+        }
+
+    def backtest(self, job):
+        """
+        单次回测
+
+        job: {'strategy', 'params', 'symbol', 'start_date', 'end_date'}，
+        可选 'initial_capital'、'commission_rate'、'return_equity'、'bar_size'（如 '15min'）、'reload'
+        """
+        strategy_class = resolve_strategy(job['strategy'], job.get('reload', False))
+        params = job.get('params') or {}
+        space = ParamSpace(strategy_class, {name: [value] for name, value in params.items()})
+        data = self.data.get(job['symbol'], job['start_date'], job['end_date'], job.get('bar_size'))
+        return run_task(self._task(job, space.make_strategy(params), params), data)
+
+    def sweep(self, job):
+        """
+        参数扫描
+
+        job: {'strategy', 'space': {参数名: 取值列表}, 'symbol', 'start_date', 'end_date'}，
+        可选 'constraints'（如 [['short_period', '<', 'long_period']]）、'n_jobs'、'bar_size'、
+        'reload'（同时重建进程池）
+        """
+        strategy_class = resolve_strategy(job['strategy'], job.get('reload', False))
+        if job.get('reload', False):
+            # 进程池的子进程中仍是重新加载前的策略类
+            self.data.recycle_executors()
+        space = ParamSpace(strategy_class, job.get('space'),
+                           constraints=[tuple(c) for c in job.get('constraints', [])])
+        key, data = self.data.acquire(job['symbol'], job['start_date'], job['end_date'], job.get('bar_size'))
+        tasks = [self._task(job, space.make_strategy(params), params) for params in space.candidates()]
+
+        # run_task 按任务日期截取数据，进程池挂载完整数据集，同一数据集的扫描请求共用
+        n_jobs = job.get('n_jobs', 1)
+        if n_jobs != 1 and len(tasks) > 1:
+            with self.data.executor(key, data, n_jobs) as executor:
+                if executor is not None:
+                    return executor.map(tasks)
+            # 数据集刚被淘汰，使用临时进程池
+            with ParallelExecutor(data, n_jobs) as executor:
+                return executor.map(tasks)
+        return [run_task(task, data) for task in tasks]
+
+    def status(self):
+        return {'uptime': time.time() - self.start_time, 'datasets': self.data.status()}
+
+    def close(self):
+        """释放缓存的数据和进程池"""
+        self.data.clear()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def _reply(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=_to_json).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/status':
+            self._reply(200, self.service.status())
+        else:
+            self._reply(404, {'error': f"未知接口: {self.path}"})
+
+    def do_POST(self):
+        routes = {'/backtest': self.service.backtest, '/sweep': self.service.sweep}
+        if self.path == '/evict':
+            self.service.data.clear()
+            self._reply(200, {'ok': True})
+            return
+        if self.path not in routes:
+            self._reply(404, {'error': f"未知接口: {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            job = json.loads(self.rfile.read(length) or b'{}')
+            start = time.perf_counter()
+            result = routes[self.path](job)
+            self._reply(200, {'result': result, 'seconds': time.perf_counter() - start})
+        except Exception as e:
+            self._reply(400, {'error': f"{type(e).__name__}: {e}"})
+
+    def log_message(self, format, *args):
+        # 不打印每个请求的访问日志
+        pass
+
+
+def serve(port=8765, preload=None, initial_capital=1000000, commission_rate=0.00005, max_datasets=4):
+    """
+    启动服务（只监听 127.0.0.1）
+
+    Parameters:
+    -----------
+    port: int
+        端口
+    preload: tuple
+        启动时预先加载的 (品种, 开始日期, 结束日期)
+    max_datasets: int
+        最多缓存的行情数据集数量，超出时淘汰最久未使用的
+    """
+    service = BacktestService(initial_capital, commission_rate, max_datasets)
+    if preload:
+        start = time.perf_counter()
+        data = service.data.get(*preload)
+        print(f"已加载 {preload[0]} {preload[1]}-{preload[2]}: {len(data)} 根K线, 耗时 {time.perf_counter() - start:.2f}秒")
+
+    handler = type('Handler', (_Handler,), {'service': service})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    print(f"回测服务已启动: http://127.0.0.1:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+class BacktestClient:
+    """
+    回测服务客户端
+
+    Parameters:
+    -----------
+    host: str
+        服务地址
+    port: int
+        服务端口
+    """
+    def __init__(self, host='127.0.0.1', port=8765):
+        self.url = f"http://{host}:{port}"
+
+    def _request(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode('utf-8')
+        request = urllib.request.Request(self.url + path, data=data,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(json.loads(e.read()).get('error')) from None
+
+    def backtest(self, strategy, params, symbol, start_date, end_date, **options):
+        """单次回测，返回结果汇总"""
+        job = dict(strategy=strategy, params=params, symbol=symbol,
+                   start_date=start_date, end_date=end_date, **options)
+        return self._request('/backtest', job)['result']
+
+    def sweep(self, strategy, space, symbol, start_date, end_date, **options):
+        """参数扫描，返回结果汇总列表"""
+        job = dict(strategy=strategy, space=space, symbol=symbol,
+                   start_date=start_date, end_date=end_date, **options)
+        return self._request('/sweep', job)['result']
+
+    def status(self):
+        return self._request('/status')
+
+    def evict(self):
+        return self._request('/evict', {})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='常驻回测服务')
+    parser.add_argument('--port', type=int, default=8765, help='端口（只监听 127.0.0.1）')
+    parser.add_argument('--preload', nargs=3, metavar=('SYMBOL', 'START', 'END'), help='启动时预先加载的数据')
+    parser.add_argument('--initial-capital', type=float, default=1000000, help='默认初始资金')
+    parser.add_argument('--commission-rate', type=float, default=0.00005, help='默认手续费率')
+    parser.add_argument('--max-datasets', type=int, default=4, help='最多缓存的行情数据集数量')
+    args = parser.parse_args(argv)
+    serve(args.port, tuple(args.preload) if args.preload else None, args.initial_capital, args.commission_rate,
+          args.max_datasets)
+
+
+if __name__ == "__main__":
+    main()
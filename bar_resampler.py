@@ -0,0 +1,221 @@
+"""
+多周期K线合成
+
+由分钟K线合成 5/15/30/60 分钟线和日线，合成结果按输入数据文件指纹缓存到磁盘，
+高周期回测直接读取几千根K线，不再每次读取并合成几十万根分钟线。
+
+合成规则：
+- 分钟K线的时间戳为该分钟的结束时间，合成K线的时间戳为其最后一根分钟K线的时间戳
+- 相邻K线间隔超过 session_gap 分钟视为新的交易时段（午休、夜盘），合成K线不跨交易时段；
+  分钟线按交易时段开盘时间（首根K线时间向下取整到15分钟）对齐，如股指期货60分钟线为
+  10:30、11:30、14:00、15:00，开盘集合竞价的K线（如09:30）并入第一根合成K线
+- 日线按交易日合成，夜盘（18:00之后及凌晨）的K线属于下一个交易日
+- 合成K线不跨主力合约切换（symbol 列变化）
+
+    resampler = BarResampler()
+    bars = resampler.load('IF', '20240101', '20241105', '15min')
+"""
+import hashlib
+import json
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from data_loader import MinuteDataLoader
+from dominant_contract import DominantContractLoader
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.bar_cache')
+
+# 合成规则变化时修改，使旧的缓存失效
+CACHE_VERSION = 1
+
+# 交易时段开盘时间的对齐单位
+_SESSION_ALIGN = pd.Timedelta(minutes=15)
+
+
+def parse_bar_size(bar_size):
+    """
+    解析K线周期
+
+    Returns:
+    --------
+    pd.Timedelta: 分钟线周期；日线返回None
+    """
+    if str(bar_size).upper() in ('D', '1D'):
+        return None
+    period = pd.Timedelta(bar_size)
+    if period < pd.Timedelta(minutes=1) or period % pd.Timedelta(minutes=1) or period > pd.Timedelta(hours=4):
+        raise ValueError(f"不支持的K线周期: {bar_size}（支持整数分钟到240分钟，或 'D' 日线）")
+    return period
+
+
+def trading_days(index):
+    """
+    每根K线所属的交易日：日盘K线为当天，夜盘K线（18:00之后及凌晨）为之后第一个有日盘K线的日期，
+    之后没有日盘数据时按下一个工作日计算
+    """
+    index = pd.DatetimeIndex(index)
+    hours = index.hour
+    day_session = (hours >= 8) & (hours < 18)
+    days = pd.Series(index.normalize().where(day_session), dtype='datetime64[ns]').bfill()
+
+    # 数据末尾的夜盘K线
+    missing = days.isna().to_numpy()
+    if missing.any():
+        evening = index[missing].normalize() + pd.to_timedelta(np.where(hours[missing] >= 18, 1, 0), unit='D')
+        days[missing] = evening + pd.offsets.BDay(0)
+    return pd.DatetimeIndex(days)
+
+
+def _group_starts(keys):
+    """分组键（按行排列的多个数组）变化的位置，即每个分组的第一行"""
+    n = len(keys[0])
+    changed = np.zeros(n, dtype=bool)
+    changed[0] = True
+    for key in keys:
+        changed[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(changed)
+
+
+def resample_bars(data, bar_size, session_gap=30):
+    """
+    由分钟K线合成高周期K线（矩阵化计算，不逐根循环）
+
+    Parameters:
+    -----------
+    data: pd.DataFrame
+        分钟K线，索引为时间戳，包含 open、high、low、close、volume 列，
+        可选 amount（成交额）和 symbol（主力连续数据的合约代码）列
+    bar_size: str
+        K线周期，如 '5min'、'15min'、'30min'、'60min' 或 'D'（日线）
+    session_gap: int
+        相邻K线间隔超过该分钟数视为新的交易时段
+
+    Returns:
+    --------
+    pd.DataFrame: 合成后的K线，列与输入一致
+    """
+    period = parse_bar_size(bar_size)
+    if data.empty:
+        return data.copy()
+    data = data.sort_index()
+    index = pd.DatetimeIndex(data.index)
+    stamps = index.asi8
+
+    # 合约代码编号，合成K线不跨主力合约切换
+    contracts = pd.factorize(data['symbol'])[0] if 'symbol' in data.columns else np.zeros(len(stamps), dtype=int)
+
+    if period is None:
+        keys = [contracts, trading_days(index).asi8]
+    else:
+        # 交易时段：间隔超过 session_gap 或合约切换时开始新时段
+        new_session = np.ones(len(stamps), dtype=bool)
+        new_session[1:] = (np.diff(stamps) > pd.Timedelta(minutes=session_gap).value) | (contracts[1:] != contracts[:-1])
+        session_ids = np.cumsum(new_session)
+        session_open = index[new_session].floor(_SESSION_ALIGN).asi8
+        offsets = stamps - session_open[session_ids - 1]
+        # 开盘集合竞价K线（偏移为0）并入第一根合成K线
+        buckets = np.maximum(-(-offsets // period.value), 1)
+        keys = [session_ids, buckets]
+
+    starts = _group_starts(keys)
+    ends = np.r_[starts[1:], len(stamps)] - 1
+
+    bars = pd.DataFrame({
+        'open': data['open'].to_numpy()[starts],
+        'high': np.maximum.reduceat(data['high'].to_numpy(), starts),
+        'low': np.minimum.reduceat(data['low'].to_numpy(), starts),
+        'close': data['close'].to_numpy()[ends],
+        'volume': np.add.reduceat(data['volume'].to_numpy(), starts)
+    }, index=index[ends])
+    if 'amount' in data.columns:
+        bars['amount'] = np.add.reduceat(data['amount'].to_numpy(), starts)
+    if 'symbol' in data.columns:
+        bars['symbol'] = data['symbol'].to_numpy()[ends]
+    bars.index.name = data.index.name
+    return bars
+
+
+class BarResampler:
+    """
+    带磁盘缓存的K线合成
+
+    缓存键由品种/合约、日期区间、K线周期、session_gap 和输入数据文件指纹共同决定，
+    分钟数据文件变化后自动重新合成
+
+    Parameters:
+    -----------
+    data_loader: MinuteDataLoader
+        分钟数据加载器，默认使用默认数据目录
+    dominant_loader: DominantContractLoader
+        主力合约加载器，默认使用默认数据目录
+    cache_dir: str
+        缓存目录，None表示不缓存
+    session_gap: int
+        相邻K线间隔超过该分钟数视为新的交易时段
+    """
+    def __init__(self, data_loader=None, dominant_loader=None, cache_dir=DEFAULT_CACHE_DIR, session_gap=30):
+        self.data_loader = data_loader or MinuteDataLoader()
+        self.dominant_loader = dominant_loader or DominantContractLoader()
+        self.cache_dir = cache_dir
+        self.session_gap = session_gap
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, symbol, start_date, end_date, bar_size):
+        content = json.dumps({
+            'version': CACHE_VERSION,
+            'symbol': symbol,
+            'start_date': start_date,
+            'end_date': end_date,
+            'bar_size': str(bar_size),
+            'session_gap': self.session_gap,
+            'data': self.data_loader.fingerprint(symbol, start_date, end_date)
+        }, sort_keys=True)
+        key = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{symbol}-{bar_size}-{key}.pkl")
+
+    def _load_minutes(self, symbol, start_date, end_date):
+        # 品种代码（如 'IF'）加载主力连续数据，否则加载单个合约
+        if len(symbol) <= 2 or symbol.isalpha():
+            return self.dominant_loader.load_dominant_data(symbol, start_date, end_date)
+        data = self.data_loader.load_future_data(symbol, start_date, end_date)
+        data['symbol'] = symbol
+        return data
+
+    def load(self, symbol, start_date, end_date, bar_size):
+        """
+        读取合成后的K线（命中缓存时直接读取）
+
+        Parameters:
+        -----------
+        symbol: str
+            期货品种代码（如'IF'，使用主力连续数据）或具体合约代码（如'IF2309'）
+        start_date, end_date: str
+            日期，格式：'YYYYMMDD'
+        bar_size: str
+            K线周期，如 '15min' 或 'D'；'1min' 直接返回分钟K线
+
+        Returns:
+        --------
+        pd.DataFrame: K线数据，包含 symbol 列
+        """
+        if parse_bar_size(bar_size) == pd.Timedelta(minutes=1):
+            return self._load_minutes(symbol, start_date, end_date)
+
+        path = self._cache_path(symbol, start_date, end_date, bar_size) if self.cache_dir else None
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    return pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                pass
+
+        bars = resample_bars(self._load_minutes(symbol, start_date, end_date), bar_size, self.session_gap)
+        if path:
+            # 先写临时文件再替换，保证并发读取时文件完整
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(bars, f)
+            os.replace(tmp_path, path)
+        return bars
@@ -0,0 +1,199 @@
+"""
+主力连续数据缓存
+
+按品种把拼接好的主力连续分钟数据（不复权）连同每日的主力合约、各合约收盘价和数据文件指纹保存到磁盘，
+复权价格由换月信息即时计算。请求缓存范围内的日期区间时直接截取；请求更长的区间时只读取缺少的日期，
+接在已有数据的一侧，不重新拼接整个区间；数据文件有变化的日期单独重新读取。
+
+    cache = ContinuousSeriesCache(cache_dir=DEFAULT_CACHE_DIR)
+    data = cache.load('IF', '20240101', '20241105')
+    adjusted = cache.load('IF', '20200101', '20241105', adjust='forward')  # 只读取 2020-2023 年的数据
+    rolls = cache.roll_table('IF', '20200101', '20241105')
+"""
+import os
+import pickle
+import threading
+import numpy as np
+import pandas as pd
+from dominant_contract import DominantContractLoader, roll_factor
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.continuous_cache')
+
+# 缓存格式变化时修改，使旧的缓存失效
+CACHE_VERSION = 1
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+# 缓存数据中记录每根K线所属数据日期（YYYYMMDD 整数）的列
+_DATE_COLUMN = '_date'
+
+
+class ContinuousSeriesCache:
+    """
+    带磁盘缓存的主力连续数据
+
+    Parameters:
+    -----------
+    dominant_loader: DominantContractLoader
+        主力合约加载器，默认使用默认数据目录
+    cache_dir: str
+        缓存目录（如 DEFAULT_CACHE_DIR），默认None表示不缓存（每次重新拼接）
+    """
+    def __init__(self, dominant_loader=None, cache_dir=None):
+        self.dominant_loader = dominant_loader or DominantContractLoader()
+        self.cache_dir = cache_dir
+
+    def _cache_path(self, product_code):
+        return os.path.join(self.cache_dir, f"{product_code}.pkl")
+
+    def _validator_mode(self):
+        # 不同的校验方式读取到的数据不同，不能共用缓存
+        validator = self.dominant_loader.data_loader.validator
+        return validator.mode if validator is not None else None
+
+    def _empty_entry(self):
+        return {'version': CACHE_VERSION, 'validator': self._validator_mode(),
+                'fingerprints': {}, 'dominant': {}, 'closes': {}, 'data': None}
+
+    def _read_entry(self, product_code):
+        if not self.cache_dir:
+            return self._empty_entry()
+        try:
+            with open(self._cache_path(product_code), 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return self._empty_entry()
+        if entry.get('version') != CACHE_VERSION or entry.get('validator') != self._validator_mode():
+            return self._empty_entry()
+        return entry
+
+    def _write_entry(self, product_code, entry):
+        # 先写临时文件再替换，保证并发读取时文件完整（缓存目录在第一次写入时创建）；
+        # 临时文件名包含进程号和线程号，同一进程中多个线程（如回测服务）同时写入时互不覆盖
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(product_code)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def _series(self, product_code, start_date, end_date):
+        """读取缓存并补齐区间内缺少或数据文件有变化的日期，返回缓存条目"""
+        entry = self._read_entry(product_code)
+        fingerprints = self.dominant_loader.data_loader.daily_fingerprints(product_code, start_date, end_date)
+        stale = [date for date, fingerprint in fingerprints.items()
+                 if entry['fingerprints'].get(date) != fingerprint]
+        if not stale:
+            return entry
+
+        frames = []
+        for date in stale:
+            entry['dominant'].pop(date, None)
+            entry['closes'].pop(date, None)
+            for _, data, closes in self.dominant_loader.iter_dominant_days(product_code, date, date, closes=True):
+                entry['dominant'][date] = data['symbol'].iloc[0]
+                entry['closes'][date] = closes
+                frames.append(data.assign(**{_DATE_COLUMN: np.int32(int(date))}))
+            entry['fingerprints'][date] = fingerprints[date]
+
+        cached = entry['data']
+        if cached is not None:
+            # 有变化的日期先删除原有数据
+            changed = np.isin(cached[_DATE_COLUMN].to_numpy(), [int(date) for date in stale])
+            if changed.any():
+                cached = cached[~changed]
+        added = pd.concat(frames).sort_index() if frames else None
+
+        if cached is None or cached.empty:
+            combined = added
+        elif added is None:
+            combined = cached
+        elif added.index[0] > cached.index[-1]:
+            # 向后延伸
+            combined = pd.concat([cached, added])
+        elif added.index[-1] < cached.index[0]:
+            # 向前延伸
+            combined = pd.concat([added, cached])
+        else:
+            combined = pd.concat([cached, added]).sort_index(kind='mergesort')
+
+        if combined is not None:
+            # 合约代码按分类存储，减小缓存文件
+            combined['symbol'] = combined['symbol'].astype('category')
+        entry['data'] = combined
+        if self.cache_dir:
+            self._write_entry(product_code, entry)
+        return entry
+
+    @staticmethod
+    def _factors(entry, days):
+        """区间内各数据日期的累计复权因子（以区间第一天为1），换月日乘以前一日旧/新主力合约收盘价之比"""
+        factors = np.ones(len(days))
+        for i in range(1, len(days)):
+            factors[i] = roll_factor(factors[i - 1], entry['dominant'][days[i - 1]], entry['dominant'][days[i]],
+                                     entry['closes'][days[i - 1]])
+        return factors
+
+    @staticmethod
+    def _days(entry, start_date, end_date):
+        start, end = pd.Timestamp(start_date).strftime('%Y%m%d'), pd.Timestamp(end_date).strftime('%Y%m%d')
+        return sorted(date for date in entry['dominant'] if start <= date <= end)
+
+    def load(self, product_code, start_date, end_date, adjust=None):
+        """
+        读取主力连续数据（格式同 DominantContractLoader.load_dominant_data）
+
+        Parameters:
+        -----------
+        product_code: str
+            期货品种代码，如 'IF'
+        start_date, end_date: str
+            日期，格式：'YYYYMMDD'
+        adjust: str
+            价格复权方式：None（不复权）、'forward'（以区间最后一天的主力合约为基准）、
+            'backward'（以区间第一天的主力合约为基准）
+
+        Returns:
+        --------
+        pd.DataFrame: 连续主力合约数据，包含 symbol 列
+        """
+        if adjust not in ('forward', 'backward', None):
+            raise ValueError(f"未知的复权方式: {adjust}")
+        entry = self._series(product_code, start_date, end_date)
+        days = self._days(entry, start_date, end_date)
+        if not days:
+            raise ValueError(f"未找到{product_code}在指定日期范围内的主力合约数据")
+
+        data = entry['data']
+        row_days = data[_DATE_COLUMN].to_numpy()
+        selected = (row_days >= int(days[0])) & (row_days <= int(days[-1]))
+        data = data[selected].drop(columns=_DATE_COLUMN)
+        data['symbol'] = data['symbol'].astype(object)
+
+        if adjust is not None:
+            factors = self._factors(entry, days)
+            if adjust == 'forward':
+                factors = factors / factors[-1]
+            row_factors = factors[np.searchsorted(np.array([int(date) for date in days]), row_days[selected])]
+            data[PRICE_COLUMNS] = data[PRICE_COLUMNS].to_numpy(dtype=float) * row_factors[:, None]
+        return data
+
+    def roll_table(self, product_code, start_date, end_date):
+        """
+        区间内的换月表
+
+        Returns:
+        --------
+        pd.DataFrame: 'date'、'product'、'symbol'（主力合约）、'factor'（以区间第一天为基准的累计复权因子）、
+            'rolled'（当日是否换月）
+        """
+        entry = self._series(product_code, start_date, end_date)
+        days = self._days(entry, start_date, end_date)
+        symbols = [entry['dominant'][date] for date in days]
+        return pd.DataFrame({
+            'date': pd.to_datetime(days, format='%Y%m%d'),
+            'product': product_code,
+            'symbol': symbols,
+            'factor': self._factors(entry, days),
+            'rolled': [i > 0 and symbols[i] != symbols[i - 1] for i in range(len(days))]
+        }, columns=['date', 'product', 'symbol', 'factor', 'rolled'])
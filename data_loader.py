@@ -1,9 +1,20 @@
 import pandas as pd
+import hashlib
 import os
+import re
 
 class MinuteDataLoader:
-    def __init__(self, data_path="D:\\Quant\\Data\\TuShare\\FutureMinK"):
+    def __init__(self, data_path="D:\\Quant\\Data\\TuShare\\FutureMinK", validator=None):
+        """
+        Parameters:
+        -----------
+        data_path: str
+            分钟数据目录
+        validator: DataValidator
+            可选的数据校验器，读取每个文件时校验（见 data_validator），None表示不校验
+        """
         self.data_path = data_path
+        self.validator = validator
         
     def load_future_data(self, symbol, start_date, end_date):
         """
@@ -46,7 +57,10 @@ class MinuteDataLoader:
                     if 'datetime' not in df.columns and 'time' in df.columns:
                         df['datetime'] = pd.to_datetime(df['time'])
                     df = df.set_index('datetime')
-                    data_frames.append(df)
+                    if self.validator is not None:
+                        df = self.validator.process(file_path, df)
+                    if df is not None:
+                        data_frames.append(df)
                 except Exception as e:
                     print(f"读取文件 {file_path} 时出错: {str(e)}")
                 
@@ -89,4 +103,58 @@ class MinuteDataLoader:
             if file_name.endswith('.pkl'):
                 symbols.append(file_name[:-4])  # 移除.pkl后缀
         
-        return symbols
\ No newline at end of file
+        return symbols
+    
+    def daily_fingerprints(self, symbol, start_date, end_date):
+        """
+        逐日计算数据文件的指纹（文件名、大小、修改时间），用于判断哪些日期的数据发生了变化
+        
+        Parameters:
+        -----------
+        symbol: str
+            合约代码（如 'IF2309'，只匹配该合约）或品种代码（如 'IF'，匹配该品种的全部合约，'I' 不匹配
+            'IF2309'），None或空字符串表示全部合约
+        start_date: str
+            开始日期，格式：'YYYYMMDD'
+        end_date: str
+            结束日期，格式：'YYYYMMDD'
+        
+        Returns:
+        --------
+        dict: {日期 'YYYYMMDD': 指纹哈希值}，包含区间内的每一天（没有数据目录的日期也有指纹）
+        """
+        fingerprints = {}
+        for date in pd.date_range(pd.Timestamp(start_date), pd.Timestamp(end_date), freq='D'):
+            date_folder = date.strftime('%Y%m%d')
+            folder = os.path.join(self.data_path, date_folder)
+            digest = hashlib.sha256()
+            if os.path.isdir(folder):
+                for file_name in sorted(os.listdir(folder)):
+                    if not (file_name.endswith('.pkl') and _matches(file_name[:-4], symbol)):
+                        continue
+                    stat = os.stat(os.path.join(folder, file_name))
+                    digest.update(f"{date_folder}/{file_name}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8'))
+            fingerprints[date_folder] = digest.hexdigest()
+        return fingerprints
+
+    def fingerprint(self, symbol, start_date, end_date):
+        """
+        计算指定日期范围内数据文件的指纹，用于判断数据是否变化，参数同 daily_fingerprints
+        
+        Returns:
+        --------
+        str: 指纹哈希值
+        """
+        daily = self.daily_fingerprints(symbol, start_date, end_date)
+        return hashlib.sha256(''.join(f"{date}:{digest};" for date, digest in daily.items()).encode('utf-8')).hexdigest()
+
+
+def product_code(symbol):
+    """合约代码中的品种代码，如 'IF2309' -> 'IF'"""
+    match = re.match(r'[A-Za-z]+', symbol)
+    return match.group(0) if match else symbol
+
+
+def _matches(file_symbol, symbol):
+    """数据文件的合约是否属于 symbol（合约代码完全相同，或 symbol 为该合约的品种代码）"""
+    return not symbol or file_symbol == symbol or product_code(file_symbol) == symbol
@@ -0,0 +1,432 @@
+"""
+分钟数据快速存储和增量导入
+
+把 TuShare 分钟数据目录（每天一个 <YYYYMMDD> 文件夹，每个合约一个 pickle 文件）导入为按日期分区的
+NumPy 存储，读取时使用内存映射，不再逐个反序列化 pickle。每次导入只处理新增或有变化的日期文件夹，
+工作量只与新数据量有关：
+
+- manifest.json          已导入的日期、文件夹指纹和修改时间、分区位置、各合约的行范围、每日主力合约（换月表）
+                         和待删除的旧分区
+- partitions/<分区>/bars.npy     当日全部合约的K线（结构化数组，按合约、时间排序）
+- partitions/<分区>/summary.pkl  当日各合约的日线汇总
+
+换月表记录每个品种每天的主力合约（当日成交量最大的合约，与 DominantContractLoader 一致）和累计
+复权因子：主力合约切换时，乘以前一交易日旧主力与新主力收盘价之比。复权因子以最早的日期为基准，
+追加新数据不会改变已有日期的因子，连续合约按换月表从分区中截取，不另存一份数据。
+
+写入先生成新的分区文件，最后用 os.replace 原子替换 manifest.json；读取方只读取 manifest 中的分区，
+任何时刻都不会读到写了一半的数据。
+
+增量导入：
+    python data_store.py ingest --data-path D:\\Quant\\Data\\TuShare\\FutureMinK --store-dir D:\\Quant\\Store
+
+读取：
+    store = DataStore('D:\\Quant\\Store')
+    data = store.continuous('IF', '20240101', '20241105')
+    BacktestEngine().run_backtest(strategy, 'IF', '20240101', '20241105', data=data)
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import numpy as np
+import pandas as pd
+from data_loader import MinuteDataLoader, product_code
+from dominant_contract import roll_factor, select_dominant
+
+MANIFEST_VERSION = 1
+
+# 分区中的K线字段
+BAR_DTYPE = np.dtype([
+    ('timestamp', 'i8'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8'),
+    ('amount', 'f8')
+])
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+
+def _write_json_atomic(path, value):
+    """先写临时文件再替换，读取方不会看到写了一半的文件"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(value, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _summarize(date, symbols, bars, offsets):
+    """由当日分区数据计算各合约的日线汇总（矩阵化计算）"""
+    columns = ['date', 'symbol', 'product', 'open', 'high', 'low', 'close', 'volume', 'amount',
+               'bars', 'return', 'range']
+    if not symbols:
+        return pd.DataFrame(columns=columns)
+    starts = np.asarray(offsets[:-1])
+    ends = np.asarray(offsets[1:]) - 1
+    opens = bars['open'][starts]
+    highs = np.maximum.reduceat(bars['high'], starts)
+    lows = np.minimum.reduceat(bars['low'], starts)
+    closes = bars['close'][ends]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        summary = pd.DataFrame({
+            'date': pd.Timestamp(date),
+            'symbol': symbols,
+            'product': [product_code(symbol) for symbol in symbols],
+            'open': opens,
+            'high': highs,
+            'low': lows,
+            'close': closes,
+            'volume': np.add.reduceat(bars['volume'], starts),
+            'amount': np.add.reduceat(bars['amount'], starts),
+            'bars': ends - starts + 1,
+            'return': np.where(opens != 0, closes / opens - 1, np.nan),
+            'range': np.where(opens != 0, (highs - lows) / opens, np.nan)
+        })
+    return summary[columns]
+
+
+class DataStore:
+    """
+    按日期分区的分钟数据存储
+
+    Parameters:
+    -----------
+    store_dir: str
+        存储目录
+    """
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.manifest_path = os.path.join(store_dir, 'manifest.json')
+        self.partition_dir = os.path.join(store_dir, 'partitions')
+
+    def manifest(self):
+        """读取当前的 manifest（尚未导入任何数据时为空）"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'version': MANIFEST_VERSION, 'dates': {}}
+
+    def dates(self, start_date=None, end_date=None, manifest=None):
+        """已导入的日期（'YYYYMMDD'，升序）"""
+        manifest = manifest or self.manifest()
+        return [date for date in sorted(manifest['dates'])
+                if (start_date is None or date >= start_date) and (end_date is None or date <= end_date)]
+
+    # ------------------------------------------------------------------ 导入
+
+    def ingest(self, loader=None, start_date=None, end_date=None, rescan=False):
+        """
+        导入数据目录中新增或有变化（文件夹指纹不同）的日期
+
+        只对新增日期、已导入的最后一个日期（可能在导入时还没有写完）和文件夹修改时间与 manifest 记录不同的
+        日期计算指纹（增删文件会改变文件夹的修改时间），其余日期直接跳过；原地改写更早日期的文件不会改变
+        文件夹的修改时间，这种情况使用 rescan=True 检查全部日期。
+        有变化的日期早于已导入的最后日期时，从该日期起重新计算换月表
+
+        被替换的旧分区不立即删除（其他进程可能刚读取旧的 manifest，正在读取旧分区），记录在 manifest 中，
+        下一次导入时删除
+
+        Parameters:
+        -----------
+        loader: MinuteDataLoader
+            数据加载器（可以设置 validator 在导入时校验），默认使用默认数据目录
+        start_date, end_date: str
+            只导入该区间内的日期，None表示不限制
+        rescan: bool
+            是否对全部日期计算指纹
+
+        Returns:
+        --------
+        list: 本次导入的日期
+        """
+        loader = loader or MinuteDataLoader()
+        os.makedirs(self.partition_dir, exist_ok=True)
+        with _IngestLock(os.path.join(self.store_dir, '.ingest.lock')):
+            manifest = self.manifest()
+            retired = self._remove_retired(manifest)
+            modified = retired != manifest.get('retired', [])
+            manifest['retired'] = retired
+
+            last_date = max(manifest['dates']) if manifest['dates'] else None
+            changed = []
+            for date in sorted(os.listdir(loader.data_path)):
+                if not (re.fullmatch(r'\d{8}', date) and (start_date is None or date >= start_date)
+                        and (end_date is None or date <= end_date)):
+                    continue
+                folder = os.path.join(loader.data_path, date)
+                if not os.path.isdir(folder):
+                    continue
+                folder_mtime = os.stat(folder).st_mtime_ns
+                entry = manifest['dates'].get(date)
+                if (entry is not None and not rescan and date != last_date
+                        and entry.get('folder_mtime') == folder_mtime):
+                    continue
+                fingerprint = loader.fingerprint(None, date, date)
+                if entry is None or entry['fingerprint'] != fingerprint:
+                    changed.append((date, fingerprint, folder_mtime))
+                elif entry.get('folder_mtime') != folder_mtime:
+                    # 文件没有变化（如临时文件已删除），只更新记录的修改时间
+                    entry['folder_mtime'] = folder_mtime
+                    modified = True
+            if not changed:
+                if modified:
+                    _write_json_atomic(self.manifest_path, manifest)
+                return []
+
+            for date, fingerprint, folder_mtime in changed:
+                if date in manifest['dates']:
+                    manifest['retired'].append(manifest['dates'][date]['partition'])
+                manifest['dates'][date] = self._write_partition(loader, date, fingerprint)
+                manifest['dates'][date]['folder_mtime'] = folder_mtime
+            self._update_rolls(manifest, changed[0][0])
+            _write_json_atomic(self.manifest_path, manifest)
+            return [date for date, _, _ in changed]
+
+    def _remove_retired(self, manifest):
+        """删除以前的导入替换下来的分区，返回仍未删除的分区（Windows 上正在被读取的文件无法删除）"""
+        in_use = {entry['partition'] for entry in manifest['dates'].values()}
+        remaining = []
+        for partition in manifest.get('retired', []):
+            if partition in in_use:
+                continue
+            folder = os.path.join(self.partition_dir, partition)
+            shutil.rmtree(folder, ignore_errors=True)
+            if os.path.exists(folder):
+                remaining.append(partition)
+        return remaining
+
+    def _write_partition(self, loader, date, fingerprint):
+        """写入一个日期的分区，返回 manifest 条目"""
+        symbols = []
+        frames = []
+        for symbol in sorted(loader.get_available_symbols(date)):
+            try:
+                data = loader.load_future_data(symbol, date, date)
+            except ValueError:
+                # 文件为空或缺少必要的列
+                continue
+            if not data.empty:
+                symbols.append(symbol)
+                frames.append(data)
+
+        offsets = np.r_[0, np.cumsum([len(data) for data in frames])].astype(int)
+        bars = np.empty(offsets[-1], dtype=BAR_DTYPE)
+        for data, start, end in zip(frames, offsets[:-1], offsets[1:]):
+            bars['timestamp'][start:end] = pd.DatetimeIndex(data.index).asi8
+            for column in BAR_DTYPE.names[1:]:
+                bars[column][start:end] = data[column].to_numpy(dtype=float) if column in data.columns else np.nan
+
+        # 分区名包含指纹，重新导入有变化的日期时写入新分区，不影响正在读取旧分区的进程
+        partition = f"{date}-{fingerprint[:12]}"
+        folder = os.path.join(self.partition_dir, partition)
+        tmp_folder = os.path.join(self.partition_dir, f".{partition}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+        os.makedirs(tmp_folder)
+        np.save(os.path.join(tmp_folder, 'bars.npy'), bars)
+        _summarize(date, symbols, bars, offsets).to_pickle(os.path.join(tmp_folder, 'summary.pkl'))
+        shutil.rmtree(folder, ignore_errors=True)
+        os.replace(tmp_folder, folder)
+
+        return {'fingerprint': fingerprint, 'partition': partition, 'symbols': symbols,
+                'offsets': offsets.tolist(), 'rolls': {}}
+
+    def _update_rolls(self, manifest, from_date):
+        """从 from_date 起重新计算各日期的主力合约和累计复权因子"""
+        dates = self.dates(manifest=manifest)
+        start = dates.index(from_date)
+
+        # 各品种最近一次出现时的主力合约、复权因子和各合约收盘价
+        last = {}
+        for date in dates[:start]:
+            last.update(manifest['dates'][date]['rolls'])
+
+        for date in dates[start:]:
+            summary = self._read_summary(manifest['dates'][date])
+            rolls = {}
+            for product, group in summary.groupby('product', sort=True):
+                # 主力合约选择和复权因子与 DominantContractLoader、ContinuousSeriesCache 共用同一实现
+                symbol = select_dominant(dict(zip(group['symbol'], group['volume'].astype(float))))
+                factor = 1.0
+                previous = last.get(product)
+                if previous is not None:
+                    factor = roll_factor(previous['factor'], previous['symbol'], symbol, previous['closes'])
+                rolls[product] = {
+                    'symbol': symbol,
+                    'factor': factor,
+                    'closes': dict(zip(group['symbol'], group['close'].astype(float)))
+                }
+            manifest['dates'][date]['rolls'] = rolls
+            last.update(rolls)
+
+    # ------------------------------------------------------------------ 读取
+
+    def _read_summary(self, entry):
+        return pd.read_pickle(os.path.join(self.partition_dir, entry['partition'], 'summary.pkl'))
+
+    def _read_bars(self, entry):
+        """内存映射读取分区K线"""
+        return np.load(os.path.join(self.partition_dir, entry['partition'], 'bars.npy'), mmap_mode='r')
+
+    @staticmethod
+    def _to_frame(bars):
+        data = pd.DataFrame({column: np.asarray(bars[column]) for column in BAR_DTYPE.names[1:]},
+                            index=pd.DatetimeIndex(np.asarray(bars['timestamp']).astype('datetime64[ns]'),
+                                                   name='datetime'))
+        return data
+
+    def load(self, symbol, start_date, end_date):
+        """
+        读取单个合约的分钟数据（格式同 MinuteDataLoader.load_future_data）
+
+        Parameters:
+        -----------
+        symbol: str
+            合约代码
+        start_date, end_date: str
+            日期，格式：'YYYYMMDD'
+        """
+        manifest = self.manifest()
+        frames = []
+        for date in self.dates(start_date, end_date, manifest):
+            entry = manifest['dates'][date]
+            if symbol not in entry['symbols']:
+                continue
+            i = entry['symbols'].index(symbol)
+            frames.append(self._to_frame(self._read_bars(entry)[entry['offsets'][i]:entry['offsets'][i + 1]]))
+        if not frames:
+            raise ValueError(f"未找到{symbol}在指定日期范围内的数据")
+        return pd.concat(frames)
+
+    def daily_summary(self, start_date=None, end_date=None, products=None):
+        """
+        各合约的日线汇总（列同 UniverseScanner.daily_summary）
+
+        Parameters:
+        -----------
+        products: list
+            只返回这些品种，None表示全部
+        """
+        manifest = self.manifest()
+        frames = [self._read_summary(manifest['dates'][date]) for date in self.dates(start_date, end_date, manifest)]
+        if not frames:
+            return _summarize(None, [], None, [0])
+        summary = pd.concat(frames, ignore_index=True)
+        if products is not None:
+            summary = summary[summary['product'].isin(products)].reset_index(drop=True)
+        return summary
+
+    def roll_table(self, product=None):
+        """
+        换月表
+
+        Returns:
+        --------
+        pd.DataFrame: 'date'、'product'、'symbol'（主力合约）、'factor'（累计复权因子）、'rolled'（当日是否换月）
+        """
+        manifest = self.manifest()
+        rows = []
+        previous = {}
+        for date in self.dates(manifest=manifest):
+            for name, roll in manifest['dates'][date]['rolls'].items():
+                if product is None or name == product:
+                    rows.append({'date': pd.Timestamp(date), 'product': name, 'symbol': roll['symbol'],
+                                 'factor': roll['factor'],
+                                 'rolled': name in previous and previous[name] != roll['symbol']})
+                    previous[name] = roll['symbol']
+        return pd.DataFrame(rows, columns=['date', 'product', 'symbol', 'factor', 'rolled'])
+
+    def continuous(self, product, start_date, end_date, adjust='forward'):
+        """
+        主力连续合约分钟数据（含 symbol 列，格式同 DominantContractLoader.load_dominant_data）
+
+        Parameters:
+        -----------
+        product: str
+            品种代码，如 'IF'
+        start_date, end_date: str
+            日期，格式：'YYYYMMDD'
+        adjust: str
+            价格复权方式：'forward'（以存储中最新的主力合约为基准，价格与当前合约一致）、
+            'backward'（以最早的日期为基准，追加新数据时已有价格不变）、None（不复权）
+        """
+        if adjust not in ('forward', 'backward', None):
+            raise ValueError(f"未知的复权方式: {adjust}")
+        manifest = self.manifest()
+        base = 1.0
+        if adjust == 'forward':
+            latest = [manifest['dates'][date]['rolls'][product] for date in self.dates(manifest=manifest)
+                      if product in manifest['dates'][date]['rolls']]
+            base = latest[-1]['factor'] if latest else 1.0
+
+        frames = []
+        for date in self.dates(start_date, end_date, manifest):
+            entry = manifest['dates'][date]
+            roll = entry['rolls'].get(product)
+            if roll is None:
+                continue
+            i = entry['symbols'].index(roll['symbol'])
+            data = self._to_frame(self._read_bars(entry)[entry['offsets'][i]:entry['offsets'][i + 1]])
+            if adjust is not None:
+                data[PRICE_COLUMNS] *= roll['factor'] / base
+            data['symbol'] = roll['symbol']
+            frames.append(data)
+        if not frames:
+            raise ValueError(f"未找到{product}在指定日期范围内的主力合约数据")
+        return pd.concat(frames)
+
+    def status(self):
+        """已导入的日期数量、日期范围和品种"""
+        manifest = self.manifest()
+        dates = self.dates(manifest=manifest)
+        products = sorted({product for date in dates for product in manifest['dates'][date]['rolls']})
+        return {
+            'dates': len(dates),
+            'first_date': dates[0] if dates else None,
+            'last_date': dates[-1] if dates else None,
+            'products': products
+        }
+
+
+class _IngestLock:
+    """导入锁，同一时间只允许一个进程写入存储"""
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            raise RuntimeError(f"另一个导入进程正在运行（如确认没有，删除 {self.path}）") from None
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        os.remove(self.path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='分钟数据快速存储')
+    parser.add_argument('command', choices=['ingest', 'status'], help='ingest: 增量导入; status: 查看存储状态')
+    parser.add_argument('--store-dir', required=True, help='存储目录')
+    parser.add_argument('--data-path', default=None, help='分钟数据目录，默认与 MinuteDataLoader 一致')
+    parser.add_argument('--start', default=None, help='只导入该日期之后的数据 YYYYMMDD')
+    parser.add_argument('--end', default=None, help='只导入该日期之前的数据 YYYYMMDD')
+    parser.add_argument('--rescan', action='store_true', help='对全部日期计算指纹（检查原地改写的文件）')
+    args = parser.parse_args(argv)
+
+    store = DataStore(args.store_dir)
+    if args.command == 'ingest':
+        loader = MinuteDataLoader(args.data_path) if args.data_path else MinuteDataLoader()
+        dates = store.ingest(loader, args.start, args.end, args.rescan)
+        print(f"导入 {len(dates)} 个日期" + (f": {dates[0]} - {dates[-1]}" if dates else ''))
+    print(', '.join(f"{key}: {value}" for key, value in store.status().items()))
+
+
+if __name__ == "__main__":
+    main()
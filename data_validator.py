@@ -0,0 +1,257 @@
+"""
+分钟数据校验和清洗
+
+对每个数据文件做整列 NumPy 检查（不逐行循环），生成质量报告，可选输出修复后的数据。
+每个文件的校验结论按文件指纹（路径、大小、修改时间）记录，文件没有变化时之后的加载直接跳过校验。
+
+检查项（FATAL_CHECKS 中的问题视为不通过，其余只作提示）：
+- unsorted: 时间戳乱序
+- duplicate: 重复时间戳
+- nan: 开高低收或成交量缺失
+- non_positive_price: 价格小于等于0
+- ohlc_inconsistent: 最高价低于开/收盘价，或最低价高于开/收盘价
+- negative_volume: 成交量为负
+- zero_volume: 成交量为0
+- gap / missing_bars: 交易时段内缺失的K线（间隔超过一根K线但不超过 session_gap）
+
+在加载数据时校验：
+    loader = MinuteDataLoader(data_path, validator=DataValidator(mode='repair'))
+
+校验整个数据目录，输出报告和修复后的数据：
+    python data_validator.py --data-path D:\\data --start 20240101 --end 20241105 \\
+        --report report.csv --repair-dir D:\\data_clean
+"""
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.validation_cache', 'verdicts.jsonl')
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+# 出现即视为不通过的问题
+FATAL_CHECKS = ('unsorted', 'duplicate', 'nan', 'non_positive_price', 'ohlc_inconsistent', 'negative_volume')
+
+
+def validate_bars(data, bar_interval='1min', session_gap=30):
+    """
+    检查K线数据
+
+    Parameters:
+    -----------
+    data: pd.DataFrame
+        K线数据，索引为时间戳，包含 open、high、low、close、volume 列
+    bar_interval: str
+        K线周期，用于判断缺失的K线
+    session_gap: int
+        间隔超过该分钟数视为交易时段之间的休市，不计为缺失
+
+    Returns:
+    --------
+    dict: {检查项: 问题K线数量}，以及 'rows'（K线数量）和 'ok'（是否通过）
+    """
+    stamps = pd.DatetimeIndex(data.index).asi8
+    prices = data[PRICE_COLUMNS].to_numpy(dtype=float)
+    volume = data['volume'].to_numpy(dtype=float)
+    opens, highs, lows, closes = prices.T
+
+    deltas = np.diff(stamps)
+    sorted_deltas = np.diff(np.sort(stamps))
+    interval = pd.Timedelta(bar_interval).value
+    gaps = sorted_deltas[(sorted_deltas > interval) & (sorted_deltas <= pd.Timedelta(minutes=session_gap).value)]
+
+    report = {
+        'rows': len(stamps),
+        'unsorted': int((deltas < 0).sum()),
+        'duplicate': int((sorted_deltas == 0).sum()),
+        'nan': int((np.isnan(prices).any(axis=1) | np.isnan(volume)).sum()),
+        'non_positive_price': int((prices <= 0).any(axis=1).sum()),
+        'ohlc_inconsistent': int(((highs < np.maximum(opens, closes)) | (lows > np.minimum(opens, closes)) |
+                                  (highs < lows)).sum()),
+        'negative_volume': int((volume < 0).sum()),
+        'zero_volume': int((volume == 0).sum()),
+        'gap': len(gaps),
+        'missing_bars': int((gaps // interval - 1).sum())
+    }
+    report['ok'] = not any(report[check] for check in FATAL_CHECKS)
+    return report
+
+
+def repair_bars(data):
+    """
+    修复K线数据：按时间排序、重复时间戳保留最后一条、删除价格缺失或非正及成交量为负的K线、
+    用开收盘价修正最高/最低价；成交量为0的K线和缺失的K线保持不变
+
+    Returns:
+    --------
+    pd.DataFrame: 修复后的数据（不修改输入）
+    """
+    data = data.sort_index(kind='mergesort')
+    data = data[~data.index.duplicated(keep='last')]
+
+    prices = data[PRICE_COLUMNS].to_numpy(dtype=float)
+    volume = data['volume'].to_numpy(dtype=float)
+    valid = ~np.isnan(prices).any(axis=1) & (prices > 0).all(axis=1) & ~np.isnan(volume) & (volume >= 0)
+    data = data[valid].copy()
+
+    opens, highs, lows, closes = data[PRICE_COLUMNS].to_numpy(dtype=float).T
+    data['high'] = np.maximum(highs, np.maximum(opens, closes))
+    data['low'] = np.minimum(lows, np.minimum(opens, closes))
+    return data
+
+
+def file_fingerprint(path):
+    """文件指纹：绝对路径、大小和修改时间"""
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class DataValidator:
+    """
+    带结论缓存的数据校验
+
+    Parameters:
+    -----------
+    mode: str
+        未通过校验的文件的处理方式：'warn'（打印问题后照常使用）、'repair'（使用修复后的数据）、
+        'skip'（不使用该文件）
+    cache_path: str
+        校验结论记录文件（JSON Lines），None表示不缓存
+    bar_interval, session_gap:
+        见 validate_bars
+    """
+    def __init__(self, mode='warn', cache_path=DEFAULT_CACHE_PATH, bar_interval='1min', session_gap=30):
+        if mode not in ('warn', 'repair', 'skip'):
+            raise ValueError(f"未知的处理方式: {mode}")
+        self.mode = mode
+        self.cache_path = cache_path
+        self.bar_interval = bar_interval
+        self.session_gap = session_gap
+        self.verdicts = {}  # {文件指纹: 校验报告}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 中断时写了一半的最后一行
+                        continue
+                    self.verdicts[record['key']] = record['report']
+
+    def _record(self, key, report):
+        self.verdicts[key] = report
+        if self.cache_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            with open(self.cache_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'key': key, 'report': report}) + '\n')
+
+    def check(self, path, data):
+        """
+        校验一个数据文件（文件没有变化时直接返回记录的结论）
+
+        Parameters:
+        -----------
+        path: str
+            数据文件路径（用于计算指纹）
+        data: pd.DataFrame
+            该文件的K线数据
+
+        Returns:
+        --------
+        dict: 校验报告，见 validate_bars
+        """
+        key = file_fingerprint(path)
+        if key not in self.verdicts:
+            self._record(key, validate_bars(data, self.bar_interval, self.session_gap))
+        return self.verdicts[key]
+
+    def process(self, path, data):
+        """
+        加载数据时调用：通过校验的文件直接返回（已有结论时不再校验），否则按 mode 处理
+
+        Returns:
+        --------
+        pd.DataFrame: 使用的数据；mode 为 'skip' 且未通过校验时返回None
+        """
+        report = self.check(path, data)
+        if report['ok']:
+            return data
+
+        problems = ', '.join(f"{check}={report[check]}" for check in FATAL_CHECKS if report[check])
+        if self.mode == 'repair':
+            return repair_bars(data)
+        if self.mode == 'skip':
+            print(f"数据文件 {path} 未通过校验（{problems}），跳过")
+            return None
+        print(f"数据文件 {path} 未通过校验（{problems}）")
+        return data
+
+
+def validate_directory(loader, start_date, end_date, validator, repair_dir=None):
+    """
+    校验数据目录中日期区间内的全部文件
+
+    Parameters:
+    -----------
+    loader: MinuteDataLoader
+        数据加载器（不设置 validator）
+    start_date, end_date: str
+        日期，格式：'YYYYMMDD'
+    validator: DataValidator
+        校验器
+    repair_dir: str
+        修复后数据的输出目录（与数据目录结构相同，通过校验的文件原样复制），None表示不输出
+
+    Returns:
+    --------
+    pd.DataFrame: 每个文件一行的质量报告
+    """
+    rows = []
+    for date in pd.date_range(pd.Timestamp(start_date), pd.Timestamp(end_date), freq='D').strftime('%Y%m%d'):
+        for symbol in sorted(loader.get_available_symbols(date)):
+            path = os.path.join(loader.data_path, date, f"{symbol}.pkl")
+            report = validator.verdicts.get(file_fingerprint(path))
+            if report is None or repair_dir:
+                raw = pd.read_pickle(path)
+                data = raw
+                if 'datetime' not in data.columns and 'time' in data.columns:
+                    data = data.assign(datetime=pd.to_datetime(data['time']))
+                data = data.set_index('datetime')
+                report = validator.check(path, data)
+            rows.append({'date': date, 'symbol': symbol, **report})
+
+            if repair_dir:
+                os.makedirs(os.path.join(repair_dir, date), exist_ok=True)
+                output = raw if report['ok'] else repair_bars(data).reset_index()
+                output.to_pickle(os.path.join(repair_dir, date, f"{symbol}.pkl"))
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    from data_loader import MinuteDataLoader
+
+    parser = argparse.ArgumentParser(description='分钟数据校验')
+    parser.add_argument('--data-path', default=None, help='数据目录，默认与 MinuteDataLoader 一致')
+    parser.add_argument('--start', required=True, help='开始日期 YYYYMMDD')
+    parser.add_argument('--end', required=True, help='结束日期 YYYYMMDD')
+    parser.add_argument('--report', default=None, help='质量报告输出路径（CSV）')
+    parser.add_argument('--repair-dir', default=None, help='修复后数据的输出目录')
+    parser.add_argument('--no-cache', action='store_true', help='不读取和记录校验结论')
+    args = parser.parse_args(argv)
+
+    loader = MinuteDataLoader(args.data_path) if args.data_path else MinuteDataLoader()
+    validator = DataValidator(cache_path=None if args.no_cache else DEFAULT_CACHE_PATH)
+    report = validate_directory(loader, args.start, args.end, validator, args.repair_dir)
+    if args.report:
+        report.to_csv(args.report, index=False, encoding='utf-8-sig')
+
+    failed = report[~report['ok']] if len(report) else report
+    print(f"共 {len(report)} 个文件，未通过 {len(failed)} 个")
+    if len(failed):
+        print(failed.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,60 @@
 import pandas as pd
 import os
-from data_loader import MinuteDataLoader
+from data_loader import MinuteDataLoader, product_code as symbol_product
+
+
+def product_symbols(symbols, product_code):
+    """
+    合约列表中属于该品种的合约（按合约代码中的品种代码完全匹配，'I' 不会匹配 'IF2309'）
+    
+    主力合约加载器、主力连续缓存和数据存储的换月表共用，保证同一品种选出相同的主力合约
+    """
+    return sorted(symbol for symbol in symbols if symbol_product(symbol) == product_code)
+
+
+def select_dominant(volumes):
+    """
+    按成交量选出主力合约
+    
+    Parameters:
+    -----------
+    volumes: dict
+        {合约: 当日成交量}
+        
+    Returns:
+    --------
+    str: 成交量最大的合约，成交量相同时取合约代码较小的
+    """
+    return min(volumes, key=lambda symbol: (-volumes[symbol], symbol))
+
+
+def roll_factor(factor, old_symbol, new_symbol, closes):
+    """
+    主力合约切换后的累计复权因子
+    
+    Parameters:
+    -----------
+    factor: float
+        切换前的累计复权因子
+    old_symbol, new_symbol: str
+        前一交易日和当日的主力合约
+    closes: dict
+        前一交易日各合约的收盘价 {合约: 收盘价}
+        
+    Returns:
+    --------
+    float: 切换时乘以前一交易日旧主力与新主力收盘价之比，未切换或缺少收盘价时不变
+    """
+    old_close = closes.get(old_symbol)
+    new_close = closes.get(new_symbol)
+    if old_symbol != new_symbol and old_close and new_close:
+        return factor * old_close / new_close
+    return factor
+
 
 class DominantContractLoader:
-    def __init__(self, data_path="D:\\Quant\\Data\\TuShare\\FutureMinK"):
-        self.data_loader = MinuteDataLoader(data_path)
+    def __init__(self, data_path="D:\\Quant\\Data\\TuShare\\FutureMinK", validator=None):
+        self.data_loader = MinuteDataLoader(data_path, validator)
         
     def get_dominant_symbol(self, product_code, date):
         """
@@ -22,27 +72,66 @@ class DominantContractLoader:
         str:
             主力合约代码
         """
+        return self._load_dominant_day(product_code, date)[0]
+    
+    def _load_dominant_day(self, product_code, date):
+        """
+        读取某日该品种的全部合约，按成交量选出主力合约，直接返回已读取的主力合约数据
+        
+        Returns:
+        --------
+        tuple: (主力合约代码, 主力合约当日数据, {合约: 当日收盘价})，当日没有数据时为 (None, None, {})
+        """
         available_symbols = self.data_loader.get_available_symbols(date)
-        # 筛选出该品种的所有合约
-        product_symbols = [s for s in available_symbols if s.startswith(product_code)]
         
-        if not product_symbols:
-            return None
-            
-        # 读取每个合约的数据，比较成交量
+        # 读取该品种每个合约的数据，比较成交量
+        frames = {}
         volumes = {}
-        for symbol in product_symbols:
+        for symbol in product_symbols(available_symbols, product_code):
             try:
-                data = self.data_loader.load_future_data(symbol, date, date)
-                volumes[symbol] = data['volume'].sum()
+                frames[symbol] = self.data_loader.load_future_data(symbol, date, date)
+                volumes[symbol] = frames[symbol]['volume'].sum()
             except:
                 continue
                 
         if not volumes:
-            return None
+            return None, None, {}
             
-        # 返回成交量最大的合约作为主力合约
-        return max(volumes.items(), key=lambda x: x[1])[0]
+        # 成交量最大的合约作为主力合约
+        symbol = select_dominant(volumes)
+        data = frames[symbol]
+        if not data.empty:
+            # 添加合约信息
+            data['symbol'] = symbol
+        # 各合约收盘价（计算换月复权因子使用）
+        closes = {s: float(frames[s]['close'].iloc[-1]) for s in volumes if not frames[s].empty}
+        return symbol, data, closes
+    
+    def iter_dominant_days(self, product_code, start_date, end_date, closes=False):
+        """
+        逐日读取主力合约数据（流式回测、主力连续数据缓存使用）
+        
+        Parameters:
+        -----------
+        product_code: str
+            期货品种代码，如 'IF'
+        start_date: str
+            开始日期，格式：'YYYYMMDD'
+        end_date: str
+            结束日期，格式：'YYYYMMDD'
+        closes: bool
+            是否同时返回当日各合约的收盘价
+            
+        Yields:
+        -------
+        tuple: (日期, 当日主力合约数据)，closes 为True时为 (日期, 当日主力合约数据, {合约: 收盘价})，
+            没有数据的日期跳过
+        """
+        for date in pd.date_range(pd.Timestamp(start_date), pd.Timestamp(end_date), freq='D'):
+            date_str = date.strftime('%Y%m%d')
+            symbol, data, day_closes = self._load_dominant_day(product_code, date_str)
+            if symbol is not None and not data.empty:
+                yield (date_str, data, day_closes) if closes else (date_str, data)
     
     def load_dominant_data(self, product_code, start_date, end_date):
         """
@@ -62,49 +151,8 @@ class DominantContractLoader:
         pd.DataFrame:
             连续主力合约数据
         """
-        current_date = pd.Timestamp(start_date)
-        end_date = pd.Timestamp(end_date)
-        
-        # 存储每天的主力合约数据
-        daily_data = []
-        current_symbol = None
-        last_close = None
-        
-        while current_date <= end_date:
-            date_str = current_date.strftime('%Y%m%d')
-            
-            # 获取当日主力合约
-            new_symbol = self.get_dominant_symbol(product_code, date_str)
-            if new_symbol is None:
-                current_date += pd.Timedelta(days=1)
-                continue
-                
-            # 如果主力合约发生变化，需要处理价格跳转
-            if new_symbol != current_symbol and current_symbol is not None:
-                # 获取新旧合约的价格数据
-                try:
-                    old_data = self.data_loader.load_future_data(current_symbol, date_str, date_str)
-                    new_data = self.data_loader.load_future_data(new_symbol, date_str, date_str)
-                    
-                    # 计算价格调整因子
-                    if not old_data.empty and not new_data.empty:
-                        price_ratio = old_data['close'].iloc[-1] / new_data['close'].iloc[0]
-                        last_close = old_data['close'].iloc[-1]
-                except:
-                    price_ratio = 1.0
-            
-            # 加载当日数据
-            try:
-                data = self.data_loader.load_future_data(new_symbol, date_str, date_str)
-                if not data.empty:
-                    # 添加合约信息
-                    data['symbol'] = new_symbol
-                    daily_data.append(data)
-            except:
-                pass
-                
-            current_symbol = new_symbol
-            current_date += pd.Timedelta(days=1)
+        # 存储每天的主力合约数据（选主力时已读取当日数据，不再重复读取）
+        daily_data = [data for _, data in self.iter_dominant_days(product_code, start_date, end_date)]
             
         if not daily_data:
             raise ValueError(f"未找到{product_code}在指定日期范围内的主力合约数据")
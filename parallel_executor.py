@@ -0,0 +1,251 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import pandas as pd
+import numpy as np
+from backtest_engine import BacktestEngine
+
+
+def summarize_backtest(strategy, params, results):
+    """
+    生成参数优化使用的单次回测结果汇总（串行与并行路径共用）
+
+    Parameters:
+    -----------
+    strategy: Strategy
+        策略实例
+    params: dict
+        策略参数，None表示默认参数
+    results: dict
+        BacktestEngine.run_backtest 的返回结果
+
+    Returns:
+    --------
+    dict: 结果汇总
+    """
+    return {
+        '策略名称': strategy.name,
+        '参数': str(params) if params else 'default',
+        '参数明细': dict(params or {}),
+        '总收益率': results['总收益率'],
+        '费前收益': results['费前收益'],
+        '费后收益': results['费后收益'],
+        '总手续费': results['总手续费'],
+        '换手率': results['换手率'],
+        '交易次数': results['交易次数'],
+        '交易天数': results['交易天数'],
+        '日均交易次数': results['交易次数'] / results['交易天数'] if results['交易天数'] > 0 else 0,
+        '单笔收益': results['费后收益'] / results['交易次数'] if results['交易次数'] > 0 else 0
+    }
+
+
+def slice_dates(data, start_date=None, end_date=None):
+    """
+    按日期截取K线数据（首尾日期均包含）
+
+    Parameters:
+    -----------
+    data: pd.DataFrame
+        K线数据，索引为时间戳
+    start_date, end_date: str
+        日期，格式：'YYYYMMDD'，None表示不限制
+    """
+    index = pd.DatetimeIndex(data.index)
+    lo = 0 if start_date is None else index.searchsorted(pd.Timestamp(start_date))
+    hi = len(index) if end_date is None else index.searchsorted(pd.Timestamp(end_date) + pd.Timedelta(days=1))
+    return data.iloc[lo:hi]
+
+
+class SharedMarketData:
+    """
+    把K线数据放入共享内存，子进程按描述符挂载，避免每个任务重复加载和序列化数据
+
+    只保存数值列和合约列（symbol以整数编码保存）
+    """
+    def __init__(self, data):
+        numeric = data.select_dtypes(include=[np.number]).columns
+        self.columns = list(numeric)
+        self.symbols = []
+        self._blocks = {}
+
+        index = pd.DatetimeIndex(data.index).asi8
+        values = data[self.columns].to_numpy(dtype=np.float64).T
+        arrays = {'index': index, 'values': values}
+        if 'symbol' in data.columns:
+            codes, uniques = pd.factorize(data['symbol'])
+            self.symbols = list(uniques)
+            arrays['symbol'] = codes.astype(np.int32)
+
+        for key, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self._blocks[key] = (block, array.shape, array.dtype.str)
+
+    @property
+    def descriptor(self):
+        """子进程挂载共享内存所需的描述信息（可序列化）"""
+        return {
+            'columns': self.columns,
+            'symbols': self.symbols,
+            'blocks': {key: (block.name, shape, dtype)
+                       for key, (block, shape, dtype) in self._blocks.items()}
+        }
+
+    @staticmethod
+    def attach(descriptor):
+        """
+        在子进程中挂载共享内存并还原为DataFrame
+
+        Returns:
+        --------
+        tuple: (pd.DataFrame, 共享内存句柄列表)，句柄需在使用期间保持引用
+        """
+        handles = []
+        arrays = {}
+        for key, (name, shape, dtype) in descriptor['blocks'].items():
+            block = shared_memory.SharedMemory(name=name)
+            handles.append(block)
+            arrays[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+        # 直接使用共享内存中的二维数组（按列存储，转置后即为一个数值块），不复制数据
+        data = pd.DataFrame(
+            arrays['values'].T,
+            columns=descriptor['columns'],
+            index=pd.DatetimeIndex(arrays['index'].view('datetime64[ns]')),
+            copy=False
+        )
+        if 'symbol' in arrays:
+            data['symbol'] = np.asarray(descriptor['symbols'], dtype=object)[arrays['symbol']]
+        return data, handles
+
+    def close(self):
+        """释放并删除共享内存"""
+        for block, _, _ in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._blocks = {}
+
+
+# 子进程中挂载的行情数据
+_worker_data = None
+_worker_handles = None
+
+
+def _init_worker(descriptor):
+    """子进程初始化：挂载共享内存中的行情数据"""
+    global _worker_data, _worker_handles
+    _worker_data, _worker_handles = SharedMarketData.attach(descriptor)
+
+
+def run_task(task, data):
+    """
+    在给定数据上运行单个回测任务
+
+    Parameters:
+    -----------
+    task: dict
+        {'strategy', 'params', 'symbol', 'start_date', 'end_date', 'initial_capital', 'commission_rate'}，
+        可选 'return_equity': True 时结果中附带每日收盘总资产（'每日资产'）
+    data: pd.DataFrame
+        完整行情数据，按任务日期截取
+
+    Returns:
+    --------
+    dict: 结果汇总
+    """
+    engine = BacktestEngine(initial_capital=task['initial_capital'], commission_rate=task['commission_rate'])
+    results = engine.run_backtest(
+        strategy=task['strategy'],
+        symbol=task['symbol'],
+        start_date=task['start_date'],
+        end_date=task['end_date'],
+        show_plots=False,
+        data=slice_dates(data, task['start_date'], task['end_date']),
+        plot=False,
+        verbose=False
+    )
+    summary = summarize_backtest(task['strategy'], task['params'], results)
+    if task.get('return_equity'):
+        total_value = engine.pnl_df['total_value']
+        summary['每日资产'] = total_value.groupby(pd.DatetimeIndex(total_value.index).normalize()).last()
+    return summary
+
+
+def run_task_timed(task, data):
+    """
+    运行单个回测任务并统计耗时
+
+    Returns:
+    --------
+    tuple: (结果汇总, {'pid': 进程号, 'seconds': 耗时, 'bars': K线数量})
+    """
+    start = time.perf_counter()
+    summary = run_task(task, data)
+    stats = {
+        'pid': os.getpid(),
+        'seconds': time.perf_counter() - start,
+        'bars': len(slice_dates(data, task['start_date'], task['end_date']))
+    }
+    return summary, stats
+
+
+def _run_worker_task(task):
+    return run_task(task, _worker_data)
+
+
+def _run_worker_chunk(tasks):
+    return [run_task_timed(task, _worker_data) for task in tasks]
+
+
+class ParallelExecutor:
+    """
+    多进程回测执行器：行情数据只加载一次放入共享内存，参数任务分发到进程池，只回传结果汇总
+
+    Parameters:
+    -----------
+    data: pd.DataFrame
+        行情数据
+    n_jobs: int
+        进程数，None表示使用全部CPU核心
+    """
+    def __init__(self, data, n_jobs=None):
+        self.n_jobs = n_jobs or os.cpu_count()
+        self.shared_data = SharedMarketData(data)
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.n_jobs,
+            initializer=_init_worker,
+            initargs=(self.shared_data.descriptor,)
+        )
+
+    def map(self, tasks):
+        """并行运行任务，按任务顺序返回结果汇总"""
+        chunksize = max(1, len(tasks) // (self.n_jobs * 4))
+        return list(self.pool.map(_run_worker_task, tasks, chunksize=chunksize))
+
+    def imap_unordered(self, tasks):
+        """
+        并行运行任务，按完成顺序逐个返回
+
+        Yields:
+        -------
+        tuple: (任务下标, 结果汇总, 耗时统计)
+        """
+        chunksize = max(1, len(tasks) // (self.n_jobs * 4))
+        futures = {}
+        for start in range(0, len(tasks), chunksize):
+            futures[self.pool.submit(_run_worker_chunk, tasks[start:start + chunksize])] = start
+        for future in as_completed(futures):
+            start = futures[future]
+            for k, (summary, stats) in enumerate(future.result()):
+                yield start + k, summary, stats
+
+    def close(self):
+        self.pool.shutdown()
+        self.shared_data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
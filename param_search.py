@@ -0,0 +1,160 @@
+"""
+参数搜索方法
+
+- grid: 穷举全部参数组合
+- random: 在参数网格中无放回随机抽样
+- lhs: 拉丁超立方抽样，保证每个参数轴的取值分布均匀
+- halving: 逐轮淘汰（Successive Halving），先在较短日期区间上评估全部候选，
+  每轮保留表现最好的 1/eta 进入更长的区间，最后一轮使用完整区间
+"""
+from itertools import product
+import math
+import numpy as np
+
+SEARCH_METHODS = ('grid', 'random', 'lhs', 'halving')
+
+
+def grid_candidates(axes, constraint=None):
+    """
+    穷举参数组合
+
+    Parameters:
+    -----------
+    axes: dict
+        {参数名: 取值列表}
+    constraint: callable
+        参数约束，返回False的组合被过滤，如 lambda p: p['short_period'] < p['long_period']
+
+    Returns:
+    --------
+    list: 参数字典列表
+    """
+    names = list(axes)
+    candidates = [dict(zip(names, values)) for values in product(*(axes[name] for name in names))]
+    if constraint is not None:
+        candidates = [params for params in candidates if constraint(params)]
+    return candidates
+
+
+def random_candidates(axes, budget, constraint=None, seed=None):
+    """在参数网格中无放回随机抽取 budget 个组合"""
+    candidates = grid_candidates(axes, constraint)
+    if budget >= len(candidates):
+        return candidates
+    rng = np.random.default_rng(seed)
+    chosen = np.sort(rng.choice(len(candidates), size=budget, replace=False))
+    return [candidates[i] for i in chosen]
+
+
+def latin_hypercube_candidates(axes, budget, constraint=None, seed=None):
+    """
+    拉丁超立方抽样：每个参数轴被均分为 budget 层，每层恰好抽中一次
+
+    离散取值映射后可能出现重复或不满足约束的组合，不足部分从剩余合法组合中随机补齐
+    """
+    all_candidates = grid_candidates(axes, constraint)
+    if budget >= len(all_candidates):
+        return all_candidates
+
+    rng = np.random.default_rng(seed)
+    names = list(axes)
+    # 每个参数轴：分层随机点 -> 打乱顺序 -> 映射到离散取值下标
+    strata = (np.arange(budget)[None, :] + rng.random((len(names), budget))) / budget
+    for row in strata:
+        rng.shuffle(row)
+    indices = [np.minimum((strata[k] * len(axes[name])).astype(int), len(axes[name]) - 1)
+               for k, name in enumerate(names)]
+
+    candidates = []
+    seen = set()
+    for j in range(budget):
+        params = {name: axes[name][indices[k][j]] for k, name in enumerate(names)}
+        key = tuple(params.items())
+        if key in seen or (constraint is not None and not constraint(params)):
+            continue
+        seen.add(key)
+        candidates.append(params)
+
+    # 补齐到 budget 个
+    remaining = [params for params in all_candidates if tuple(params.items()) not in seen]
+    if len(candidates) < budget and remaining:
+        fill = rng.choice(len(remaining), size=min(budget - len(candidates), len(remaining)), replace=False)
+        candidates.extend(remaining[i] for i in np.sort(fill))
+    return candidates
+
+
+def _check_eta(eta):
+    if not eta > 1:
+        raise ValueError(f"eta 必须大于1: {eta}")
+
+
+def halving_schedule(trading_dates, n_candidates, eta=3, min_fraction=None):
+    """
+    计算逐轮淘汰的日期区间和每轮候选数量
+
+    Parameters:
+    -----------
+    trading_dates: list
+        完整区间内的交易日（'YYYYMMDD'，升序）
+    n_candidates: int
+        初始候选数量
+    eta: int
+        每轮淘汰比例，保留 1/eta，必须大于1
+    min_fraction: float
+        第一轮使用的区间比例，None表示按轮数自动确定（eta^-(轮数-1)）
+
+    Returns:
+    --------
+    list: [(开始日期, 结束日期, 本轮候选数量), ...]，最后一轮为完整区间
+    """
+    _check_eta(eta)
+    # 最少的轮数使 eta^轮数 >= 候选数量（整数运算，避免浮点对数在 27、3 等整数幂处多算一轮）
+    rounds = 0
+    capacity = 1
+    while capacity < n_candidates:
+        capacity *= eta
+        rounds += 1
+    rounds = max(1, rounds)
+    if min_fraction is None:
+        min_fraction = eta ** -(rounds - 1)
+
+    schedule = []
+    n_keep = n_candidates
+    for k in range(rounds):
+        fraction = 1.0 if k == rounds - 1 else min(1.0, min_fraction * eta ** k)
+        n_days = max(1, int(round(len(trading_dates) * fraction)))
+        schedule.append((trading_dates[0], trading_dates[n_days - 1], n_keep))
+        n_keep = max(1, math.ceil(n_keep / eta))
+    return schedule
+
+
+def successive_halving(candidates, evaluate, schedule, eta=3):
+    """
+    逐轮淘汰搜索
+
+    Parameters:
+    -----------
+    candidates: list
+        初始候选参数
+    evaluate: callable
+        evaluate(candidates, start_date, end_date, final) -> 每个候选的得分列表（越大越好）
+    schedule: list
+        halving_schedule 的返回值
+    eta: int
+        每轮保留 1/eta
+
+    Returns:
+    --------
+    list: 最后一轮（完整区间）评估的候选参数
+    """
+    _check_eta(eta)
+    survivors = list(candidates)
+    for k, (start_date, end_date, _) in enumerate(schedule):
+        final = k == len(schedule) - 1
+        scores = evaluate(survivors, start_date, end_date, final)
+        if final:
+            break
+        n_keep = max(1, math.ceil(len(survivors) / eta))
+        order = np.argsort(-np.nan_to_num(np.asarray(scores, dtype=float), nan=-np.inf), kind='stable')
+        survivors = [survivors[i] for i in np.sort(order[:n_keep])]
+    return survivors
@@ -0,0 +1,162 @@
+"""
+声明式参数空间
+
+用取值列表、数值区间和约束描述策略的可调参数，任何已注册的策略类都可以直接用于参数优化，
+不再需要为每个策略手写优化函数。例如：
+
+    ParamSpace(
+        MAStrategy,
+        {'short_period': [3, 5, 8], 'long_period': Range(10, 40, 5)},
+        constraints=[('short_period', '<', 'long_period')],
+        name_format='MA({short_period},{long_period})'
+    )
+"""
+import operator
+import numpy as np
+import param_search
+
+# 约束支持的比较运算
+_OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne
+}
+
+
+class Range:
+    """
+    数值区间，展开为等间隔取值（包含端点）
+
+    Parameters:
+    -----------
+    low, high: float
+        区间端点
+    step: float
+        步长，与 num 二选一
+    num: int
+        取值个数
+    log: bool
+        是否按对数等间隔取值（需要指定 num）
+    """
+    def __init__(self, low, high, step=None, num=None, log=False):
+        if (step is None) == (num is None):
+            raise ValueError("Range 需要指定 step 或 num 中的一个")
+        if log and num is None:
+            raise ValueError("对数区间需要指定 num")
+        self.low = low
+        self.high = high
+        self.step = step
+        self.num = num
+        self.log = log
+
+    def values(self):
+        if self.log:
+            values = np.geomspace(self.low, self.high, self.num)
+        elif self.num is not None:
+            values = np.linspace(self.low, self.high, self.num)
+        else:
+            # 多加半个步长保证包含右端点，同时避免浮点误差多出一个取值
+            values = np.arange(self.low, self.high + self.step / 2, self.step)
+
+        # 端点（和步长）都是整数时取整数值，如均线周期
+        if all(isinstance(v, (int, np.integer)) for v in (self.low, self.high, self.step or 0)):
+            return list(dict.fromkeys(int(round(v)) for v in values))
+        # 消除浮点累加误差，便于生成名称和作为表格列
+        return [float(round(v, 10)) for v in values]
+
+    def __repr__(self):
+        return f"Range({self.low}, {self.high}, step={self.step}, num={self.num}, log={self.log})"
+
+
+class ParamSpace:
+    """
+    策略参数空间
+
+    Parameters:
+    -----------
+    strategy_class: type
+        策略类，参数名与构造函数参数一致
+    params: dict
+        {参数名: 取值列表或 Range}
+    constraints: list
+        参数约束，元素为 (参数名, 运算符, 参数名或数值) 元组，或接收参数字典返回布尔值的函数
+    name_format: str
+        策略名称格式，如 'MA({short_period},{long_period})'；默认为 类名前缀(参数值,...)
+    labels: dict
+        {参数名: 显示名称}，用于热力图坐标轴
+    """
+    def __init__(self, strategy_class, params=None, constraints=None, name_format=None, labels=None):
+        self.strategy_class = strategy_class
+        self.params = {name: self._expand(values) for name, values in (params or {}).items()}
+        self.constraints = list(constraints or [])
+        self.name_format = name_format
+        self.labels = dict(labels or {})
+
+        for constraint in self.constraints:
+            if not callable(constraint) and constraint[1] not in _OPERATORS:
+                raise ValueError(f"不支持的约束运算符: {constraint[1]}")
+
+    @staticmethod
+    def _expand(values):
+        if isinstance(values, Range):
+            return values.values()
+        return list(values)
+
+    @property
+    def axes(self):
+        """{参数名: 取值列表}"""
+        return dict(self.params)
+
+    @property
+    def size(self):
+        """不考虑约束的参数组合总数"""
+        return int(np.prod([len(values) for values in self.params.values()]))
+
+    def with_values(self, params):
+        """
+        替换部分参数的取值，返回新的参数空间
+
+        参数名也可以使用复数形式（如 'short_periods'），兼容旧的配置写法
+        """
+        values = dict(self.params)
+        for key, value in params.items():
+            name = key
+            if name not in values and key.endswith('s') and key[:-1] in values:
+                name = key[:-1]
+            if name not in values:
+                raise ValueError(f"{self.strategy_class.__name__} 没有参数: {key}")
+            values[name] = value
+        return ParamSpace(self.strategy_class, values, self.constraints, self.name_format, self.labels)
+
+    def constraint(self, params):
+        """判断参数组合是否满足全部约束"""
+        for constraint in self.constraints:
+            if callable(constraint):
+                if not constraint(params):
+                    return False
+                continue
+            left, op, right = constraint
+            right_value = params[right] if isinstance(right, str) and right in params else right
+            if not _OPERATORS[op](params[left], right_value):
+                return False
+        return True
+
+    def candidates(self):
+        """全部满足约束的参数组合"""
+        return param_search.grid_candidates(self.params, self.constraint)
+
+    def strategy_name(self, params):
+        if self.name_format is not None:
+            return self.name_format.format(**params)
+        prefix = self.strategy_class.__name__.replace('Strategy', '')
+        return f"{prefix}({','.join(str(params[name]) for name in self.params)})"
+
+    def make_strategy(self, params):
+        """按参数构造策略实例并设置名称"""
+        strategy = self.strategy_class(**params)
+        if params:
+            strategy.name = self.strategy_name(params)
+        return strategy
@@ -0,0 +1,136 @@
+"""
+批量渲染回测报告图表
+
+在进程池中把交易图、净值曲线和参数热力图渲染为图片文件。工作进程使用 Agg 后端，不创建窗口；
+传给工作进程的只是降采样后的数组（见 BacktestVisualizer.trade_chart_data），不包含完整的K线
+DataFrame、交易记录和策略对象，一次生成上百个回测报告时序列化开销很小。
+
+    jobs = backtest_report_jobs('MA(5,20)', engine, strategy)
+    jobs.append(heatmap_job('MA', optimizer.heatmap_data('MA')))
+    paths = render_reports(jobs, 'reports', n_jobs=4)
+
+StrategyOptimizer.render_reports 为各策略最优的几组参数和参数热力图生成报告。
+"""
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+
+if multiprocessing.parent_process() is not None:
+    # 工作进程（spawn 方式启动时会重新导入本模块）在导入 pyplot 之前切换到 Agg 后端
+    matplotlib.use('Agg')
+
+from visualizer import BacktestVisualizer, draw_trade_chart, draw_pnl_curve, draw_heatmap
+
+# 报告类型 -> 绘图函数
+DRAWERS = {
+    'trades': draw_trade_chart,
+    'pnl': draw_pnl_curve,
+    'heatmap': draw_heatmap
+}
+
+_UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+def _file_name(name, suffix):
+    """由策略名称生成文件名（替换路径分隔符、冒号等不能用于文件名的字符）"""
+    return f"{_UNSAFE_CHARS.sub('_', name)}_{suffix}.png"
+
+
+def backtest_report_jobs(name, engine, strategy, pixels=1500, decimate='minmax'):
+    """
+    由一次回测生成交易图和净值曲线报告任务
+
+    Parameters:
+    -----------
+    name: str
+        报告名称（用于文件名），如策略名称
+    engine: BacktestEngine
+        已完成回测的引擎（使用 trades、data 和 pnl_df）
+    strategy: Strategy
+        回测使用的策略实例（用于获取指标数据）
+    pixels: int
+        折线预先降采样的宽度（像素），不小于图表宽度时不影响图表效果
+    decimate: str
+        折线降采样方式，见 BacktestVisualizer
+
+    Returns:
+    --------
+    list: 报告任务
+    """
+    visualizer = BacktestVisualizer(engine.trades, engine.data, engine.pnl_df, strategy, decimate)
+    return [
+        {'kind': 'trades', 'file_name': _file_name(name, 'trades'),
+         'chart': visualizer.trade_chart_data(pixels), 'options': {'decimate': decimate}},
+        {'kind': 'pnl', 'file_name': _file_name(name, 'pnl'),
+         'chart': visualizer.pnl_curve_data(pixels), 'options': {'decimate': decimate}}
+    ]
+
+
+def heatmap_job(name, chart):
+    """
+    参数热力图报告任务
+
+    Parameters:
+    -----------
+    name: str
+        报告名称（用于文件名）
+    chart: dict
+        热力图数据，见 StrategyOptimizer.heatmap_data
+    """
+    return {'kind': 'heatmap', 'file_name': _file_name(name, 'heatmap'), 'chart': chart}
+
+
+def _init_worker():
+    # fork 方式启动的工作进程继承了主进程的后端
+    matplotlib.use('Agg', force=True)
+
+
+def _render(job, output_dir, dpi):
+    """渲染单个报告并保存，返回文件路径"""
+    fig = DRAWERS[job['kind']](job['chart'], use_pyplot=False, **job.get('options', {}))
+    path = os.path.join(output_dir, job['file_name'])
+    fig.savefig(path, dpi=dpi)
+    return path
+
+
+def _render_chunk(jobs, output_dir, dpi):
+    return [_render(job, output_dir, dpi) for job in jobs]
+
+
+def render_reports(jobs, output_dir, n_jobs=None, dpi=100):
+    """
+    渲染报告并保存为图片文件
+
+    Parameters:
+    -----------
+    jobs: list
+        报告任务（backtest_report_jobs、heatmap_job 的返回结果）
+    output_dir: str
+        输出目录，不存在时自动创建
+    n_jobs: int
+        工作进程数量，None表示使用全部CPU核心，1表示在当前进程中渲染（不经过 pyplot，不影响当前后端）
+    dpi: int
+        图片分辨率
+
+    Returns:
+    --------
+    list: 按任务顺序排列的文件路径
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs == 1 or len(jobs) <= 1:
+        return _render_chunk(jobs, output_dir, dpi)
+
+    # 每个进程一批任务，减少进程间通信次数
+    n_chunks = min(n_jobs, len(jobs))
+    chunks = [jobs[i::n_chunks] for i in range(n_chunks)]
+    with ProcessPoolExecutor(max_workers=n_chunks, initializer=_init_worker) as executor:
+        results = list(executor.map(_render_chunk, chunks, [output_dir] * n_chunks, [dpi] * n_chunks))
+
+    # 恢复任务顺序
+    paths = [None] * len(jobs)
+    for i, chunk_paths in enumerate(results):
+        paths[i::n_chunks] = chunk_paths
+    return paths
@@ -0,0 +1,245 @@
+"""
+回测结果磁盘缓存
+
+缓存键由以下内容共同决定，任一变化都会重新计算：
+- 策略类及其源码（包括父类、回测引擎、结果汇总和数据加载的源码）
+- 策略参数、回测品种和日期区间
+- 引擎设置（initial_capital、commission_rate）
+- 输入数据文件指纹（文件名、大小、修改时间）
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.backtest_cache')
+
+
+def source_hash(strategy_class):
+    """
+    计算策略类（含父类）所在目录全部源码文件（包括指标库等依赖），以及回测引擎、结果汇总和
+    数据加载（分钟数据、主力合约、K线合成、主力连续缓存、数据校验）的源码哈希
+    """
+    import backtest_engine
+    import parallel_executor
+    import data_loader
+    import dominant_contract
+    import bar_resampler
+    import continuous_cache
+    import data_validator
+    
+    files = set()
+    for cls in strategy_class.__mro__:
+        if cls is object:
+            continue
+        module = sys.modules.get(cls.__module__)
+        module_file = getattr(module, '__file__', None)
+        if module_file:
+            folder = os.path.dirname(os.path.abspath(module_file))
+            files.update(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith('.py'))
+    for module in (backtest_engine, parallel_executor, data_loader, dominant_contract, bar_resampler,
+                   continuous_cache, data_validator):
+        files.add(os.path.abspath(module.__file__))
+    
+    digest = hashlib.sha256()
+    for path in sorted(files):
+        with open(path, 'rb') as f:
+            digest.update(os.path.basename(path).encode('utf-8'))
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def task_fields(task, source, data_fingerprint):
+    """
+    回测任务的标识字段（结果缓存键、扫描断点记录和任务队列的任务ID共用）
+
+    Parameters:
+    -----------
+    task: dict
+        回测任务，格式同 StrategyOptimizer._make_task
+    source: str
+        策略源码哈希（见 source_hash）
+    data_fingerprint: str
+        输入数据文件指纹
+
+    Returns:
+    --------
+    dict: 策略类、源码哈希、策略名称、参数、品种、日期区间、引擎设置和数据指纹
+    """
+    strategy_class = type(task['strategy'])
+    fields = {
+        'class': f"{strategy_class.__module__}.{strategy_class.__qualname__}",
+        'source': source,
+        'name': task['strategy'].name,
+        'params': task['params'],
+        'symbol': task['symbol'],
+        'start_date': task['start_date'],
+        'end_date': task['end_date'],
+        'initial_capital': task['initial_capital'],
+        'commission_rate': task['commission_rate'],
+        'return_equity': task.get('return_equity', False),
+        'data': data_fingerprint
+    }
+    if task.get('bar_size') is not None:
+        # 分钟K线任务不加入该字段，已有的缓存键不变
+        fields['bar_size'] = task['bar_size']
+    return fields
+
+
+class ResultCache:
+    """
+    回测结果缓存，按文件存储，超过容量时淘汰最久未使用的结果
+
+    Parameters:
+    -----------
+    cache_dir: str
+        缓存目录
+    max_size: int
+        缓存总大小上限（字节）
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self._source_hashes = {}
+        self._size = None  # 缓存总大小（第一次写入时统计，之后按写入累加）
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def make_key(self, task, data_fingerprint):
+        """
+        计算任务的缓存键
+
+        Parameters:
+        -----------
+        task: dict
+            回测任务，格式同 StrategyOptimizer._make_task
+        data_fingerprint: str
+            输入数据文件指纹
+        """
+        strategy_class = type(task['strategy'])
+        if strategy_class not in self._source_hashes:
+            self._source_hashes[strategy_class] = source_hash(strategy_class)
+
+        fields = task_fields(task, self._source_hashes[strategy_class], data_fingerprint)
+        content = json.dumps(fields, sort_keys=True, default=str)
+        return f"{strategy_class.__name__}-{hashlib.sha256(content.encode('utf-8')).hexdigest()}"
+    
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+    
+    def get(self, key):
+        """读取缓存，未命中返回None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        # 更新访问时间，用于LRU淘汰（文件可能刚被其他进程淘汰）
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+    
+    def put(self, key, value):
+        """
+        写入缓存（先写临时文件再替换，保证并发读取时文件完整）
+
+        总大小按写入累加，超过上限时才扫描缓存目录淘汰，一次扫描之后的多次写入不再列出目录
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f)
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        try:
+            self._size -= os.path.getsize(path)
+        except OSError:
+            pass
+        self._size += os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        if self._size > self.max_size:
+            self.evict()
+    
+    def _entries(self):
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith('.pkl'):
+                continue
+            path = os.path.join(self.cache_dir, file_name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+    
+    def evict(self):
+        """缓存超过容量上限时，按最久未使用顺序删除到上限的90%，之后一段时间的写入不必再次扫描目录"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_size:
+            self._size = total
+            return
+        for _, size, path in sorted(entries):
+            if total <= self.max_size * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._size = total
+    
+    def clear(self, strategy_class_name=None):
+        """
+        清除缓存
+
+        Parameters:
+        -----------
+        strategy_class_name: str
+            只清除指定策略类的结果，None表示全部清除
+
+        Returns:
+        --------
+        int: 删除的缓存条数
+        """
+        removed = 0
+        for _, _, path in self._entries():
+            if strategy_class_name and not os.path.basename(path).startswith(f"{strategy_class_name}-"):
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                continue
+        self._size = None
+        return removed
+    
+    def info(self):
+        """缓存统计：条数和总大小"""
+        entries = self._entries()
+        return {'条数': len(entries), '总大小': sum(size for _, size, _ in entries)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='回测结果缓存管理')
+    parser.add_argument('command', choices=['clear', 'info'], help='clear: 清除缓存; info: 查看缓存统计')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='缓存目录')
+    parser.add_argument('--strategy', default=None, help='只清除指定策略类的缓存，如 MAStrategy')
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(args.cache_dir)
+    if args.command == 'clear':
+        print(f"已删除 {cache.clear(args.strategy)} 条缓存")
+    else:
+        info = cache.info()
+        print(f"缓存条数: {info['条数']}, 总大小: {info['总大小'] / 1024 / 1024:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+参数优化结果表
+
+把回测结果汇总整理为列式表格：每个参数、每个指标各占一列并使用明确的数据类型，
+可以保存为 Parquet 文件，热力图和 Top-N 查询直接在列上计算
+"""
+import numbers
+import numpy as np
+import pandas as pd
+
+# 指标列及其数据类型
+METRIC_COLUMNS = {
+    '总收益率': 'float64',
+    '费前收益': 'float64',
+    '费后收益': 'float64',
+    '总手续费': 'float64',
+    '换手率': 'float64',
+    '交易次数': 'int64',
+    '交易天数': 'int64',
+    '日均交易次数': 'float64',
+    '单笔收益': 'float64'
+}
+
+
+def summary_strategy_type(summary):
+    """
+    结果汇总所属的策略类型：参数优化时记录的策略注册名称（'策略类型'），没有记录时（如单次回测、
+    旧版本保存的结果）取策略名称中括号之前的部分
+    """
+    return summary.get('策略类型') or summary['策略名称'].split('(')[0]
+
+
+class ResultsTable:
+    """
+    参数优化结果表
+
+    列：'策略名称'、'策略类型'、参数列（列名即参数名）、指标列（见 METRIC_COLUMNS）
+
+    Parameters:
+    -----------
+    df: pd.DataFrame
+        结果数据
+    """
+    def __init__(self, df):
+        self.df = df
+
+    @classmethod
+    def from_summaries(cls, summaries):
+        """
+        由回测结果汇总（StrategyOptimizer.results）构造结果表
+
+        汇总中的 '参数明细' 字典展开为参数列，不同策略的参数列互不相同，缺失值为空
+        """
+        param_names = []
+        for summary in summaries:
+            for name in summary.get('参数明细') or {}:
+                if name not in param_names:
+                    param_names.append(name)
+
+        data = {
+            '策略名称': pd.array([summary['策略名称'] for summary in summaries], dtype='string'),
+            '策略类型': pd.Categorical([summary_strategy_type(summary) for summary in summaries])
+        }
+        for name in param_names:
+            data[name] = _typed_column([(summary.get('参数明细') or {}).get(name) for summary in summaries])
+        for column, dtype in METRIC_COLUMNS.items():
+            values = [summary.get(column) for summary in summaries]
+            if any(value is None for value in values):
+                dtype = 'float64' if dtype == 'float64' else 'Int64'
+            data[column] = pd.array(values, dtype=dtype)
+        df = pd.DataFrame(data)
+        return cls(df)
+
+    @classmethod
+    def read_parquet(cls, path):
+        """读取 Parquet 文件（需要安装 pyarrow 或 fastparquet）"""
+        return cls(pd.read_parquet(path))
+
+    def to_parquet(self, path):
+        """保存为 Parquet 文件（需要安装 pyarrow 或 fastparquet）"""
+        self.df.to_parquet(path, index=False)
+
+    def __len__(self):
+        return len(self.df)
+
+    def strategy(self, strategy_type):
+        """筛选某一策略类型的结果，去掉该策略不使用的参数列"""
+        df = self.df[self.df['策略类型'] == strategy_type]
+        unused = [column for column in self.param_columns() if df[column].isna().all()]
+        return df.drop(columns=unused)
+
+    def param_columns(self, strategy_type=None):
+        """参数列名"""
+        df = self.df if strategy_type is None else self.strategy(strategy_type)
+        fixed = {'策略名称', '策略类型'} | set(METRIC_COLUMNS)
+        return [column for column in df.columns if column not in fixed]
+
+    def top(self, n=10, metric='总收益率', strategy_type=None):
+        """按指标取前 n 个结果"""
+        df = self.df if strategy_type is None else self.strategy(strategy_type)
+        return df.nlargest(n, metric)
+
+    def pivot(self, strategy_type, index, columns, values='总收益率'):
+        """两个参数维度上的指标透视表，用于热力图"""
+        return pd.pivot_table(self.strategy(strategy_type), values=values, index=index, columns=columns)
+
+
+def _typed_column(values):
+    """按取值推断参数列类型：整数、浮点数或字符串，有缺失值时使用可空类型"""
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, (bool, np.bool_)) for value in present):
+        return pd.array(values, dtype='boolean')
+    if present and all(isinstance(value, numbers.Integral) for value in present):
+        return pd.array(values, dtype='Int64' if len(present) < len(values) else 'int64')
+    if present and all(isinstance(value, numbers.Real) for value in present):
+        return pd.array([np.nan if value is None else value for value in values], dtype='float64')
+    return pd.array(values, dtype='string')
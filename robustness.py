@@ -0,0 +1,248 @@
+"""
+回测结果的稳健性分析（Monte Carlo / bootstrap）
+
+单条净值曲线只是一种可能的路径。本模块对回测的每日收益率和交易盈亏重新抽样，生成上万条模拟路径，
+统计总收益率、最大回撤和夏普比率的置信区间：
+- bootstrap: 每日收益率有放回独立抽样
+- block: 循环块 bootstrap，按连续 block_size 天的收益率整块抽样，保留波动聚集等序列相关性
+- permutation: 打乱交易盈亏的先后顺序（总收益不变），考察回撤对交易顺序的敏感程度
+
+模拟路径按 chunk_size 条一批用 NumPy 矩阵运算计算，内存占用与总路径数无关；n_jobs > 1 时各批分发到进程池。
+每批使用由 seed 派生的独立随机数种子，结果与进程数无关。
+
+    results = engine.run_backtest(strategy, 'IF', '20200101', '20241231', plot=False)
+    report = robustness_report(engine, n_paths=10000, n_jobs=4, seed=42)
+    print(report['block'])
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from bar_resampler import trading_days
+from trade_analytics import round_trips
+
+METHODS = ('bootstrap', 'block', 'permutation')
+
+METRICS = ['总收益率', '最大回撤', '夏普比率']
+
+
+def daily_values(pnl_df):
+    """每个交易日收盘时的总资产（pd.Series，索引为交易日，夜盘K线计入下一交易日）"""
+    total_value = pnl_df['total_value']
+    return total_value.groupby(trading_days(total_value.index)).last()
+
+
+def daily_returns(pnl_df, initial_capital):
+    """每日收益率，第一天相对于初始资金计算"""
+    values = daily_values(pnl_df)
+    return values.pct_change().fillna(values.iloc[0] / initial_capital - 1) if len(values) else values
+
+
+def trade_pnls(trades):
+    """
+    由成交记录计算每段交易的盈亏（含手续费）
+
+    按 trade_analytics.round_trips 的 netting 方式配对：从空仓开始到持仓重新归零（或反手）为一段交易，
+    主力合约切换不结束交易，换月手续费计入跨越换月的交易
+
+    Parameters:
+    -----------
+    trades: list
+        BacktestEngine.trades
+
+    Returns:
+    --------
+    np.ndarray: 按时间顺序排列的每段交易盈亏，最后未平仓的部分不计入
+    """
+    return round_trips(trades, method='netting')['net_pnl'].to_numpy(dtype=float)
+
+
+def path_metrics(equity, periods_per_year=252):
+    """
+    计算多条资产曲线的指标（矩阵运算）
+
+    Parameters:
+    -----------
+    equity: np.ndarray
+        形状为 (路径数, 期数+1) 的资产曲线（净值），第一列为期初
+    periods_per_year: float
+        每年的期数，用于年化夏普比率
+
+    Returns:
+    --------
+    dict: {指标名称: 形状为 (路径数,) 的数组}
+    """
+    returns = equity[:, 1:] / equity[:, :-1] - 1
+    std = returns.std(axis=1, ddof=1) if returns.shape[1] > 1 else np.zeros(len(equity))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0, returns.mean(axis=1) / std * np.sqrt(periods_per_year), 0.0)
+    peak = np.maximum.accumulate(equity, axis=1)
+    return {
+        '总收益率': equity[:, -1] / equity[:, 0] - 1,
+        '最大回撤': (equity / peak - 1).min(axis=1),
+        '夏普比率': sharpe
+    }
+
+
+def _resample_indices(rng, method, n, n_paths, block_size):
+    """抽样位置矩阵，形状为 (n_paths, n)"""
+    if method == 'bootstrap':
+        return rng.integers(0, n, size=(n_paths, n))
+    if method == 'block':
+        # 循环块 bootstrap：随机选择块的起点，块内连续，超出末尾时从头接续
+        n_blocks = -(-n // block_size)
+        starts = rng.integers(0, n, size=(n_paths, n_blocks, 1))
+        return ((starts + np.arange(block_size)) % n).reshape(n_paths, -1)[:, :n]
+    return rng.permuted(np.broadcast_to(np.arange(n), (n_paths, n)), axis=1)
+
+
+def _simulate_chunk(values, method, n_paths, seed, block_size, initial_capital, periods_per_year):
+    """
+    模拟一批路径
+
+    Parameters:
+    -----------
+    values: np.ndarray
+        每日收益率（bootstrap、block）或每段交易盈亏（permutation）
+
+    Returns:
+    --------
+    dict: {指标名称: 形状为 (n_paths,) 的数组}
+    """
+    rng = np.random.default_rng(seed)
+    idx = _resample_indices(rng, method, len(values), n_paths, block_size)
+    equity = np.empty((n_paths, len(values) + 1))
+    if method == 'permutation':
+        equity[:, 0] = initial_capital
+        np.cumsum(values[idx], axis=1, out=equity[:, 1:])
+        equity[:, 1:] += initial_capital
+    else:
+        equity[:, 0] = 1.0
+        np.cumprod(1 + values[idx], axis=1, out=equity[:, 1:])
+    return path_metrics(equity, periods_per_year)
+
+
+def simulate(values, method='block', n_paths=10000, block_size=20, initial_capital=1.0, periods_per_year=252,
+             chunk_size=1000, n_jobs=1, seed=None):
+    """
+    Monte Carlo 模拟
+
+    Parameters:
+    -----------
+    values: array-like
+        method 为 'bootstrap'、'block' 时为每日收益率，为 'permutation' 时为每段交易盈亏（见 trade_pnls）
+    method: str
+        抽样方式，见模块说明
+    n_paths: int
+        模拟路径数
+    block_size: int
+        block 方式的块长度（天）
+    initial_capital: float
+        初始资金（permutation 方式由盈亏计算资产曲线使用）
+    periods_per_year: float
+        每年的期数（每日收益率为252，permutation 方式为每年的交易段数）
+    chunk_size: int
+        每批计算的路径数，单批内存约为 chunk_size * len(values) * 24 字节
+    n_jobs: int
+        进程数，1表示在当前进程中计算，None表示使用全部CPU核心
+    seed: int
+        随机数种子，None表示不固定
+
+    Returns:
+    --------
+    pd.DataFrame: 每行一条模拟路径，列为 METRICS
+    """
+    if method not in METHODS:
+        raise ValueError(f"未知的抽样方式: {method}")
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return pd.DataFrame(columns=METRICS, dtype=float)
+    block_size = max(1, min(block_size, len(values)))
+
+    sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    n = len(sizes)
+    args = ([values] * n, [method] * n, sizes, seeds, [block_size] * n, [initial_capital] * n,
+            [periods_per_year] * n)
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs == 1 or n <= 1:
+        chunks = list(map(_simulate_chunk, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, n)) as executor:
+            chunks = list(executor.map(_simulate_chunk, *args))
+    return pd.DataFrame({metric: np.concatenate([chunk[metric] for chunk in chunks]) for metric in METRICS})
+
+
+def confidence_intervals(samples, actual=None, level=0.95):
+    """
+    由模拟结果计算置信区间
+
+    Parameters:
+    -----------
+    samples: pd.DataFrame
+        simulate 的返回结果
+    actual: dict
+        实际回测的指标值，None表示不列出
+    level: float
+        置信水平
+
+    Returns:
+    --------
+    pd.DataFrame: 每行一个指标，列为 '实际'（给出 actual 时）、'均值'、'下限'、'中位数'、'上限'、
+        '低于实际比例'（模拟结果低于实际值的比例，给出 actual 时）
+    """
+    tail = (1 - level) / 2
+    table = pd.DataFrame({
+        '均值': samples.mean(),
+        '下限': samples.quantile(tail),
+        '中位数': samples.median(),
+        '上限': samples.quantile(1 - tail)
+    })
+    if actual is not None:
+        actual = pd.Series(actual)[table.index]
+        table.insert(0, '实际', actual)
+        # 与实际值相等（浮点误差以内）的不计为低于
+        table['低于实际比例'] = ((samples < actual) & ~np.isclose(samples, actual)).mean()
+    return table
+
+
+def robustness_report(engine, n_paths=10000, methods=METHODS, block_size=20, level=0.95,
+                      chunk_size=1000, n_jobs=1, seed=None):
+    """
+    对已完成回测的引擎做稳健性分析
+
+    Parameters:
+    -----------
+    engine: BacktestEngine
+        已完成回测的引擎（使用 pnl_df、trades 和 initial_capital）
+    methods: tuple
+        抽样方式，见 METHODS
+    其余参数见 simulate 和 confidence_intervals
+
+    Returns:
+    --------
+    dict: {抽样方式: 置信区间表}，没有完整交易段时不包含 'permutation'
+    """
+    returns = daily_returns(engine.pnl_df, engine.initial_capital).to_numpy()
+    daily_equity = np.r_[1.0, np.cumprod(1 + returns)][None, :]
+    actual = {metric: values[0] for metric, values in path_metrics(daily_equity).items()}
+
+    pnls = trade_pnls(engine.trades)
+    years = max(len(returns) / 252, 1 / 252)
+    report = {}
+    for i, method in enumerate(methods):
+        # 各抽样方式使用不同的随机数种子
+        method_seed = None if seed is None else [seed, i]
+        if method == 'permutation':
+            if len(pnls) == 0:
+                continue
+            trade_equity = engine.initial_capital + np.r_[0.0, np.cumsum(pnls)]
+            trade_actual = path_metrics(trade_equity[None, :], len(pnls) / years)
+            samples = simulate(pnls, method, n_paths, block_size, engine.initial_capital, len(pnls) / years,
+                               chunk_size, n_jobs, method_seed)
+            report[method] = confidence_intervals(samples, {k: v[0] for k, v in trade_actual.items()}, level)
+        else:
+            samples = simulate(returns, method, n_paths, block_size, 1.0, 252, chunk_size, n_jobs, method_seed)
+            report[method] = confidence_intervals(samples, actual, level)
+    return report
@@ -114,6 +114,25 @@ class BaseStrategy:
         """
         return amount / price
     
+    def generate_signal_arrays(self, data):
+        """
+        向量化生成与 on_bar 逐K线运行结果一致的交易信号（可选实现，供向量化回测使用）
+        
+        Parameters:
+        -----------
+        data: pd.DataFrame
+            K线数据，索引为时间戳
+            
+        Returns:
+        --------
+        dict: {
+            'bar_index': np.ndarray,  # 信号所在K线的位置，按发出顺序排列
+            'direction': np.ndarray,  # 1买入，-1卖出
+            'volume': np.ndarray      # 交易数量
+        }
+        """
+        raise NotImplementedError("generate_signal_arrays method is not implemented")
+    
     def get_indicator_data(self):
         """
         获取策略指标数据，用于图表展示
@@ -1,9 +1,10 @@
 from .base_strategy import BaseStrategy
+from .indicators import SessionReturn, IndicatorHistory
 import pandas as pd
 import numpy as np
 
 class DailyReturnStrategy(BaseStrategy):
-    def __init__(self, return_threshold=0.02, entry_time='14:50:00'):
+    def __init__(self, return_threshold=0.02, entry_time='14:50:00', history_capacity=4096):
         """
         基于日内涨幅的策略
         
@@ -13,21 +14,23 @@ class DailyReturnStrategy(BaseStrategy):
             涨跌幅阈值，默认2%
         entry_time: str
             入场时间，默认14:50
+        history_capacity: int
+            指标历史数组的初始容量
         """
         super().__init__()
         self.name = "Daily Return Strategy"
         self.return_threshold = return_threshold
         self.entry_time = pd.Timestamp(entry_time).time()
         self.current_date = None
-        self.daily_open = None
         self.position_taken = False  # 标记当天是否已经判断过
-        self.return_history = []
+        self.session_return = SessionReturn()
+        self.return_history = IndicatorHistory(['daily_return'], history_capacity)
         
     def calculate_daily_return(self, current_price):
         """计算日内涨跌幅"""
-        if self.daily_open is None:
+        if self.session_return.session_open is None:
             return 0
-        return (current_price - self.daily_open) / self.daily_open
+        return (current_price - self.session_return.session_open) / self.session_return.session_open
         
     def on_bar(self, timestamp, bar):
         signals = []
@@ -37,20 +40,15 @@ class DailyReturnStrategy(BaseStrategy):
         # 新的交易日
         if self.current_date != current_date:
             self.current_date = current_date
-            self.daily_open = bar['open']
             self.position_taken = False
             
-        # 记录涨跌幅
-        daily_return = self.calculate_daily_return(bar['close'])
-        self.return_history.append({
-            'timestamp': timestamp,
-            'daily_return': daily_return
-        })
+        # 记录涨跌幅（交易日切换时以首根K线开盘价为基准）
+        daily_return = self.session_return.update(bar, timestamp)
+        self.return_history.append(timestamp, daily_return=daily_return)
         
         # 在指定时间判断仓位
         if current_time >= self.entry_time and not self.position_taken:
             volume = self.calculate_position_volume(bar['close'])
-            daily_return = self.calculate_daily_return(bar['close'])
             
             # 先平掉现有仓位
             if self.current_position != 0:
@@ -92,22 +90,75 @@ class DailyReturnStrategy(BaseStrategy):
             
         return signals
         
+    def _decision_bars(self, data):
+        """
+        找到每个交易日首根时间不早于入场时间的K线
+        
+        Returns:
+        --------
+        tuple: (决策K线位置数组, 对应的日内涨跌幅数组)
+        """
+        index = pd.DatetimeIndex(data.index)
+        day_codes, _ = pd.factorize(index.date)
+        seconds = (index - index.normalize()).total_seconds().values
+        entry_seconds = (self.entry_time.hour * 3600 + self.entry_time.minute * 60 +
+                         self.entry_time.second + self.entry_time.microsecond / 1e6)
+        
+        # 交易日序号 × 一天秒数 + 日内秒数 单调递增，可一次二分查找所有交易日的决策K线
+        day_starts = np.flatnonzero(np.r_[True, day_codes[1:] != day_codes[:-1]])
+        day_ends = np.r_[day_starts[1:], len(index)]
+        keys = day_codes * 86400.0 + seconds
+        decision = np.searchsorted(keys, day_codes[day_starts] * 86400.0 + entry_seconds, side='left')
+        has_decision = decision < day_ends
+        
+        decision = decision[has_decision]
+        daily_open = data['open'].values[day_starts[has_decision]]
+        daily_return = (data['close'].values[decision] - daily_open) / daily_open
+        return decision, daily_return
+    
+    def generate_signal_arrays(self, data):
+        """向量化生成与 on_bar 一致的交易信号：决策K线先平旧仓，再按新方向开仓"""
+        decision, daily_return = self._decision_bars(data)
+        targets = np.where(daily_return > self.return_threshold, -1,
+                           np.where(daily_return < -self.return_threshold, 1, 0))
+        previous = np.zeros_like(targets)
+        previous[1:] = targets[:-1]
+        volume = self.calculate_position_volume(data['close'].values[decision])
+        
+        # 每个决策K线最多两个信号：平仓（先）与开仓（后）
+        bar_index = np.column_stack([decision, decision]).ravel()
+        direction = np.column_stack([-previous, targets]).ravel()
+        volumes = np.column_stack([volume, volume]).ravel()
+        emitted = direction != 0
+        
+        # 记录日内涨跌幅，供图表展示
+        self.return_history.extend(data.index, daily_return=SessionReturn().compute(data))
+        if len(targets):
+            self.current_position = int(targets[-1])
+        
+        return {
+            'bar_index': bar_index[emitted],
+            'direction': direction[emitted],
+            'volume': volumes[emitted]
+        }
+        
     def get_indicator_data(self):
         """返回涨跌幅数据用于图表展示"""
-        if not self.return_history:
+        if len(self.return_history) == 0:
             return None
             
         # 添加阈值线
-        threshold_data = [{
-            'timestamp': record['timestamp'],
-            'upper_threshold': self.return_threshold,
-            'lower_threshold': -self.return_threshold
-        } for record in self.return_history]
+        return_data = self.return_history.to_dict()
+        threshold_data = {
+            'timestamp': return_data['timestamp'],
+            'upper_threshold': np.full(len(self.return_history), self.return_threshold),
+            'lower_threshold': np.full(len(self.return_history), -self.return_threshold)
+        }
         
         return [
             {
                 'name': 'Daily Return',
-                'data': self.return_history,
+                'data': return_data,
                 'value_key': 'daily_return',
                 'color': 'orange',
                 'alpha': 0.6
@@ -1,22 +1,26 @@
 from .base_strategy import BaseStrategy
+from .indicators import IndicatorHistory
 import pandas as pd
 import numpy as np
 
 class GridStrategy(BaseStrategy):
-    def __init__(self, grid_num=10, price_range_ratio=0.02):
+    def __init__(self, grid_num=10, price_range_ratio=0.02, history_capacity=4096):
         super().__init__()
         self.name = "Grid Strategy"
         self.grid_num = grid_num
         self.price_range_ratio = price_range_ratio
         self.grids = None
         self.base_price = None  # 基准价格（每日开盘价）
-        self.grid_positions = {}  # 记录每个网格的持仓状态
-        self.grid_history = []    # 记录网格线历史数据
+        self.grid_positions = np.zeros(grid_num, dtype=np.int8)  # 每个网格的持仓状态，按网格序号索引
+        self.grid_history = []    # 网格线变化记录，仅在网格重置时追加
         self.current_date = None
         self.last_price = None
         self.target_position = 0.5  # 目标仓位比例
         
-    def initialize_grids(self, price):
+        # 预分配的K线时间戳数组，用于展开网格线历史
+        self.bar_history = IndicatorHistory(capacity=history_capacity)
+        
+    def initialize_grids(self, price, timestamp):
         """初始化网格"""
         self.base_price = price
         price_range = price * self.price_range_ratio
@@ -29,12 +33,11 @@ class GridStrategy(BaseStrategy):
         )
         
         # 初始化网格持仓状态
-        for grid_price in self.grids:
-            self.grid_positions[grid_price] = 0
+        self.grid_positions[:] = 0
             
-        # 记录网格线
+        # 记录网格线变化
         self.grid_history.append({
-            'timestamp': pd.Timestamp.now(),
+            'timestamp': timestamp,
             'grids': self.grids.copy()
         })
         
@@ -46,27 +49,32 @@ class GridStrategy(BaseStrategy):
         signals = []
         volume = self.calculate_position_volume(price)
         
-        # 检查是否触及网格线
-        for grid_price in self.grids:
-            # 价格上穿网格线，做空
-            if self.last_price < grid_price <= price and self.grid_positions[grid_price] >= 0:
-                signals.append({
-                    'direction': -1,
-                    'volume': volume,
-                    'price': price,
-                    'grid_price': grid_price
-                })
-                self.grid_positions[grid_price] = -1
-                
-            # 价格下穿网格线，做多
-            elif price <= grid_price < self.last_price and self.grid_positions[grid_price] <= 0:
-                signals.append({
-                    'direction': 1,
-                    'volume': volume,
-                    'price': price,
-                    'grid_price': grid_price
-                })
-                self.grid_positions[grid_price] = 1
+        # 二分查找价格区间内被穿越的网格线
+        if price > self.last_price:
+            # 价格上穿网格线（last_price < grid <= price），做空
+            lo = np.searchsorted(self.grids, self.last_price, side='right')
+            hi = np.searchsorted(self.grids, price, side='right')
+            crossed = np.arange(lo, hi)
+            crossed = crossed[self.grid_positions[crossed] >= 0]
+            direction = -1
+        elif price < self.last_price:
+            # 价格下穿网格线（price <= grid < last_price），做多
+            lo = np.searchsorted(self.grids, price, side='left')
+            hi = np.searchsorted(self.grids, self.last_price, side='left')
+            crossed = np.arange(lo, hi)
+            crossed = crossed[self.grid_positions[crossed] <= 0]
+            direction = 1
+        else:
+            return signals
+            
+        for i in crossed:
+            signals.append({
+                'direction': direction,
+                'volume': volume,
+                'price': price,
+                'grid_price': self.grids[i]
+            })
+        self.grid_positions[crossed] = direction
                 
         return signals
         
@@ -112,7 +120,7 @@ class GridStrategy(BaseStrategy):
         if self.current_date != current_date:
             self.current_date = current_date
             # 使用开盘价初始化网格
-            self.initialize_grids(bar['open'])
+            self.initialize_grids(bar['open'], timestamp)
             self.last_price = bar['open']
             
         # 收盘前调整仓位
@@ -127,34 +135,33 @@ class GridStrategy(BaseStrategy):
         # 更新上一次价格
         self.last_price = price
         
-        # 记录网格线
+        # 记录K线时间戳，网格线数值在取指标数据时再展开
         if self.grids is not None:
-            self.grid_history.append({
-                'timestamp': timestamp,
-                'grids': self.grids.copy()
-            })
+            self.bar_history.append(timestamp)
             
         return signals
         
     def get_indicator_data(self):
         """返回网格线数据用于图表展示"""
-        if not self.grid_history:
+        if not self.grid_history or len(self.bar_history) == 0:
             return None
             
-        # 为每个网格线创建一个指标
-        indicators = []
-        for i, grid_price in enumerate(self.grids):
-            grid_data = [{
-                'timestamp': record['timestamp'],
-                f'grid_{i}': record['grids'][i]
-            } for record in self.grid_history]
-            
-            indicators.append({
-                'name': f'Grid {i+1}',
-                'data': grid_data,
-                'value_key': f'grid_{i}',
-                'color': 'gray',
-                'alpha': 0.3
-            })
+        # 按时间戳找到每根K线对应的网格版本，一次性展开网格线数值
+        timestamps = self.bar_history.to_dict()['timestamp']
+        change_times = np.array([np.datetime64(pd.Timestamp(record['timestamp']).value, 'ns')
+                                 for record in self.grid_history])
+        versions = np.searchsorted(change_times, timestamps, side='right') - 1
+        grid_values = np.vstack([record['grids'] for record in self.grid_history])[versions]
+        
+        grid_data = {'timestamp': timestamps}
+        for i in range(grid_values.shape[1]):
+            grid_data[f'grid_{i}'] = grid_values[:, i]
             
-        return indicators 
\ No newline at end of file
+        # 为每个网格线创建一个指标
+        return [{
+            'name': f'Grid {i+1}',
+            'data': grid_data,
+            'value_key': f'grid_{i}',
+            'color': 'gray',
+            'alpha': 0.3
+        } for i in range(grid_values.shape[1])]
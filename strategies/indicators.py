@@ -0,0 +1,455 @@
+"""
+策略指标库
+
+每个指标提供两种等价的计算方式：
+- update(bar): 逐K线增量更新，单次O(1)，供事件驱动回测使用
+- compute(data): 对整段数据一次性向量化计算，返回与data同长度的数组
+
+两种方式在相同输入下结果一致（浮点误差范围内），预热期内均为NaN。
+"""
+from collections import deque
+import pandas as pd
+import numpy as np
+
+
+def _bar_timestamp(bar, timestamp):
+    """获取K线时间戳（默认取iterrows得到的bar.name，dict格式的K线没有时间戳，必须传入timestamp）"""
+    if timestamp is None:
+        timestamp = getattr(bar, 'name', None)
+        if timestamp is None:
+            raise ValueError("K线没有时间戳（dict格式的K线需要传入timestamp参数）")
+    return pd.Timestamp(timestamp)
+
+
+def _session_keys(index):
+    """按自然日划分交易时段"""
+    return pd.DatetimeIndex(index).date
+
+
+class IndicatorHistory:
+    """
+    预分配数组形式的指标历史记录，容量不足时按倍数扩容
+
+    Parameters:
+    -----------
+    columns: list
+        需要记录的指标字段名
+    capacity: int
+        初始容量
+    """
+    def __init__(self, columns=(), capacity=4096):
+        self.columns = list(columns)
+        self.count = 0
+        self.timestamps = np.empty(capacity, dtype='datetime64[ns]')
+        self.values = {column: np.empty(capacity) for column in self.columns}
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, **values):
+        """追加一条记录"""
+        if self.count == len(self.timestamps):
+            capacity = len(self.timestamps) * 2
+            self.timestamps = np.resize(self.timestamps, capacity)
+            for column in self.columns:
+                self.values[column] = np.resize(self.values[column], capacity)
+        self.timestamps[self.count] = np.datetime64(pd.Timestamp(timestamp).value, 'ns')
+        for column in self.columns:
+            self.values[column][self.count] = values[column]
+        self.count += 1
+
+    def extend(self, timestamps, **values):
+        """批量追加记录（向量化计算路径使用）"""
+        timestamps = np.asarray(pd.DatetimeIndex(timestamps).values, dtype='datetime64[ns]')
+        needed = self.count + len(timestamps)
+        if needed > len(self.timestamps):
+            capacity = max(needed, len(self.timestamps) * 2)
+            self.timestamps = np.resize(self.timestamps, capacity)
+            for column in self.columns:
+                self.values[column] = np.resize(self.values[column], capacity)
+        self.timestamps[self.count:needed] = timestamps
+        for column in self.columns:
+            self.values[column][self.count:needed] = values[column]
+        self.count = needed
+
+    def to_dict(self):
+        """返回 {'timestamp': 数组, 字段名: 数组} 格式的数据，可直接用于 get_indicator_data"""
+        data = {'timestamp': self.timestamps[:self.count]}
+        for column in self.columns:
+            data[column] = self.values[column][:self.count]
+        return data
+
+
+class Indicator:
+    """指标基类"""
+    def __init__(self):
+        self.value = np.nan
+
+    @property
+    def ready(self):
+        """是否已完成预热"""
+        return not np.isnan(self.value)
+
+    def reset(self):
+        """清空内部状态"""
+        self.__init__(**self._params())
+
+    def _params(self):
+        return {}
+
+    def update(self, bar, timestamp=None):
+        """
+        增量更新指标
+
+        Parameters:
+        -----------
+        bar: pd.Series or dict
+            当前K线数据
+        timestamp: datetime
+            当前K线时间戳，默认使用bar.name；按交易日重置的指标（VWAP、SessionReturn）在bar为dict时必须传入
+
+        Returns:
+        --------
+        float: 当前指标值，预热期内为NaN
+        """
+        raise NotImplementedError("update method must be implemented")
+
+    def compute(self, data):
+        """
+        向量化计算整段数据的指标值
+
+        Parameters:
+        -----------
+        data: pd.DataFrame
+            K线数据，索引为时间戳
+
+        Returns:
+        --------
+        np.ndarray: 与data等长的指标数组
+        """
+        raise NotImplementedError("compute method must be implemented")
+
+
+class SMA(Indicator):
+    """简单移动平均（环形缓冲区 + 滚动和）"""
+    def __init__(self, period, field='close'):
+        super().__init__()
+        self.period = period
+        self.field = field
+        self.buffer = np.zeros(period)
+        self.count = 0
+        self.total = 0.0
+
+    def _params(self):
+        return {'period': self.period, 'field': self.field}
+
+    def update(self, bar, timestamp=None):
+        price = bar[self.field]
+        pos = self.count % self.period
+        if self.count >= self.period:
+            self.total -= self.buffer[pos]
+        self.buffer[pos] = price
+        self.total += price
+        self.count += 1
+
+        # 缓冲区每写满一轮重新求和，避免累计舍入误差
+        if pos == self.period - 1:
+            self.total = self.buffer.sum()
+
+        if self.count >= self.period:
+            self.value = self.total / self.period
+        return self.value
+
+    def compute(self, data):
+        prices = np.asarray(data[self.field], dtype=float)
+        result = np.full(len(prices), np.nan)
+        if len(prices) < self.period:
+            return result
+        # 减去首个价格后再累加，降低大数相减的精度损失
+        offset = prices[0]
+        cumsum = np.concatenate([[0.0], np.cumsum(prices - offset)])
+        result[self.period - 1:] = (cumsum[self.period:] - cumsum[:-self.period]) / self.period + offset
+        return result
+
+
+class EMA(Indicator):
+    """指数移动平均，alpha = 2 / (period + 1)"""
+    def __init__(self, period, field='close'):
+        super().__init__()
+        self.period = period
+        self.field = field
+        self.alpha = 2.0 / (period + 1)
+
+    def _params(self):
+        return {'period': self.period, 'field': self.field}
+
+    def update(self, bar, timestamp=None):
+        price = bar[self.field]
+        if np.isnan(self.value):
+            self.value = price
+        else:
+            self.value += self.alpha * (price - self.value)
+        return self.value
+
+    def compute(self, data):
+        prices = pd.Series(np.asarray(data[self.field], dtype=float))
+        return prices.ewm(alpha=self.alpha, adjust=False).mean().values
+
+
+class RollingStd(Indicator):
+    """滚动标准差"""
+    def __init__(self, period, field='close', ddof=0):
+        super().__init__()
+        self.period = period
+        self.field = field
+        self.ddof = ddof
+        self.buffer = np.zeros(period)
+        self.count = 0
+        self.offset = None  # 以首个价格为基准去中心化，减小相消误差
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def _params(self):
+        return {'period': self.period, 'field': self.field, 'ddof': self.ddof}
+
+    def update(self, bar, timestamp=None):
+        price = bar[self.field]
+        if self.offset is None:
+            self.offset = price
+        x = price - self.offset
+        pos = self.count % self.period
+        if self.count >= self.period:
+            old = self.buffer[pos]
+            self.total -= old
+            self.total_sq -= old * old
+        self.buffer[pos] = x
+        self.total += x
+        self.total_sq += x * x
+        self.count += 1
+
+        if pos == self.period - 1:
+            self.total = self.buffer.sum()
+            self.total_sq = (self.buffer * self.buffer).sum()
+
+        if self.count >= self.period and self.period > self.ddof:
+            mean = self.total / self.period
+            variance = (self.total_sq - self.period * mean * mean) / (self.period - self.ddof)
+            self.value = np.sqrt(max(variance, 0.0))
+        return self.value
+
+    def compute(self, data):
+        prices = np.asarray(data[self.field], dtype=float)
+        if len(prices) == 0:
+            return prices
+        # 与增量计算相同，以首个价格为基准去中心化
+        offsets = pd.Series(prices - prices[0])
+        return offsets.rolling(self.period).std(ddof=self.ddof).values
+
+
+class VWAP(Indicator):
+    """
+    日内成交量加权均价，交易日切换时重置
+
+    同时维护成交量加权标准差（std属性），用于绘制VWAP通道
+    """
+    def __init__(self, price='typical'):
+        super().__init__()
+        self.price = price
+        self.session = None
+        self.cum_pv = 0.0
+        self.cum_volume = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.std = np.nan
+
+    def _params(self):
+        return {'price': self.price}
+
+    def _bar_price(self, bar):
+        if self.price == 'typical':
+            return (bar['high'] + bar['low'] + bar['close']) / 3
+        return bar[self.price]
+
+    def _price_array(self, data):
+        if self.price == 'typical':
+            return (np.asarray(data['high'], dtype=float) + np.asarray(data['low'], dtype=float) +
+                    np.asarray(data['close'], dtype=float)) / 3
+        return np.asarray(data[self.price], dtype=float)
+
+    def update(self, bar, timestamp=None, volume=None):
+        session = _bar_timestamp(bar, timestamp).date()
+        if session != self.session:
+            self.session = session
+            self.cum_pv = 0.0
+            self.cum_volume = 0.0
+            self.mean = 0.0
+            self.m2 = 0.0
+
+        price = self._bar_price(bar)
+        volume = bar['volume'] if volume is None else volume
+        self.cum_pv += price * volume
+        self.cum_volume += volume
+        # 加权Welford算法增量更新方差
+        if self.cum_volume == volume:
+            self.mean = price
+        elif self.cum_volume > 0:
+            delta = price - self.mean
+            self.mean += delta * volume / self.cum_volume
+            self.m2 += volume * delta * (price - self.mean)
+
+        if self.cum_volume > 0:
+            self.value = self.cum_pv / self.cum_volume
+            self.std = np.sqrt(max(self.m2, 0.0) / self.cum_volume)
+        else:
+            self.value = np.nan
+            self.std = np.nan
+        return self.value
+
+    def compute(self, data, volume=None):
+        return self.compute_with_std(data, volume)[0]
+
+    def compute_with_std(self, data, volume=None):
+        """
+        向量化计算VWAP及成交量加权标准差
+
+        Parameters:
+        -----------
+        data: pd.DataFrame
+            K线数据
+        volume: np.ndarray
+            参与累计的成交量，默认取data['volume']；置0的K线不参与累计
+
+        Returns:
+        --------
+        tuple: (vwap数组, 标准差数组)
+        """
+        price = self._price_array(data)
+        volume = np.asarray(data['volume'] if volume is None else volume, dtype=float)
+        sessions = _session_keys(data.index)
+
+        # 方差按当日首个价格去中心化后累计，减小相消误差
+        offset = price - pd.Series(price).groupby(sessions).transform('first').values
+        frame = pd.DataFrame({
+            'pv': price * volume,
+            'dv': offset * volume,
+            'd2v': offset * offset * volume,
+            'volume': volume
+        })
+        cum = frame.groupby(sessions).cumsum()
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vwap = cum['pv'].values / cum['volume'].values
+            mean_offset = cum['dv'].values / cum['volume'].values
+            variance = cum['d2v'].values / cum['volume'].values - mean_offset * mean_offset
+        vwap[cum['volume'].values <= 0] = np.nan
+        std = np.where(cum['volume'].values > 0, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+        return vwap, std
+
+
+class ATR(Indicator):
+    """平均真实波幅（Wilder平滑，alpha = 1 / period）"""
+    def __init__(self, period=14):
+        super().__init__()
+        self.period = period
+        self.prev_close = None
+
+    def _params(self):
+        return {'period': self.period}
+
+    def update(self, bar, timestamp=None):
+        high, low = bar['high'], bar['low']
+        if self.prev_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = bar['close']
+
+        if np.isnan(self.value):
+            self.value = true_range
+        else:
+            self.value += (true_range - self.value) / self.period
+        return self.value
+
+    def compute(self, data):
+        high = np.asarray(data['high'], dtype=float)
+        low = np.asarray(data['low'], dtype=float)
+        close = np.asarray(data['close'], dtype=float)
+        true_range = high - low
+        if len(close) > 1:
+            prev_close = close[:-1]
+            true_range[1:] = np.maximum.reduce([
+                true_range[1:],
+                np.abs(high[1:] - prev_close),
+                np.abs(low[1:] - prev_close)
+            ])
+        return pd.Series(true_range).ewm(alpha=1.0 / self.period, adjust=False).mean().values
+
+
+class SessionReturn(Indicator):
+    """日内涨跌幅：相对当日首根K线开盘价的收益率"""
+    def __init__(self, field='close'):
+        super().__init__()
+        self.field = field
+        self.session = None
+        self.session_open = None
+
+    def _params(self):
+        return {'field': self.field}
+
+    def update(self, bar, timestamp=None):
+        session = _bar_timestamp(bar, timestamp).date()
+        if session != self.session:
+            self.session = session
+            self.session_open = bar['open']
+        self.value = (bar[self.field] - self.session_open) / self.session_open
+        return self.value
+
+    def compute(self, data):
+        opens = pd.Series(np.asarray(data['open'], dtype=float))
+        session_open = opens.groupby(_session_keys(data.index)).transform('first').values
+        return (np.asarray(data[self.field], dtype=float) - session_open) / session_open
+
+
+class RollingHigh(Indicator):
+    """滚动最高价（单调队列，均摊O(1)）"""
+    def __init__(self, period, field='high'):
+        super().__init__()
+        self.period = period
+        self.field = field
+        self.count = 0
+        self.window = deque()  # (序号, 价格)，价格单调递减
+
+    def _params(self):
+        return {'period': self.period, 'field': self.field}
+
+    def _dominates(self, new, old):
+        return new >= old
+
+    def update(self, bar, timestamp=None):
+        price = bar[self.field]
+        while self.window and self._dominates(price, self.window[-1][1]):
+            self.window.pop()
+        self.window.append((self.count, price))
+        if self.window[0][0] <= self.count - self.period:
+            self.window.popleft()
+        self.count += 1
+        if self.count >= self.period:
+            self.value = self.window[0][1]
+        return self.value
+
+    def compute(self, data):
+        prices = pd.Series(np.asarray(data[self.field], dtype=float))
+        return prices.rolling(self.period).max().values
+
+
+class RollingLow(RollingHigh):
+    """滚动最低价（单调队列，均摊O(1)）"""
+    def __init__(self, period, field='low'):
+        super().__init__(period, field)
+
+    def _dominates(self, new, old):
+        return new <= old
+
+    def compute(self, data):
+        prices = pd.Series(np.asarray(data[self.field], dtype=float))
+        return prices.rolling(self.period).min().values
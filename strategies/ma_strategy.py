@@ -1,44 +1,45 @@
 from .base_strategy import BaseStrategy
+from .indicators import SMA, IndicatorHistory
 import pandas as pd
 import numpy as np
 
 class MAStrategy(BaseStrategy):
-    def __init__(self, short_period=5, long_period=20):
+    def __init__(self, short_period=5, long_period=20, history_capacity=4096):
         super().__init__()
         self.name = "MA Strategy"
         self.short_period = short_period
         self.long_period = long_period
-        self.prices = []
         self.current_position = 0
-        self.ma_history = []
+        
+        # 增量均线，各自只保留周期长度的收盘价
+        self.smas = {
+            short_period: SMA(short_period),
+            long_period: SMA(long_period)
+        }
+        
+        # 预分配的均线历史数组
+        self.ma_history = IndicatorHistory(['short_ma', 'long_ma'], history_capacity)
         
     def calculate_ma(self, period):
-        if len(self.prices) < period:
+        sma = self.smas[period]
+        if not sma.ready:
             return None
-        return np.mean(self.prices[-period:])
+        return sma.value
         
     def on_bar(self, timestamp, bar):
-        self.prices.append(bar['close'])
+        for sma in self.smas.values():
+            sma.update(bar)
         
-        # 计算并记录均线
+        # 计算短期和长期均线（每根K线各计算一次）
         short_ma = self.calculate_ma(self.short_period)
         long_ma = self.calculate_ma(self.long_period)
         
-        if short_ma is not None and long_ma is not None:
-            self.ma_history.append({
-                'timestamp': timestamp,
-                'short_ma': short_ma,
-                'long_ma': long_ma
-            })
-            
         signals = []
         
-        # 计算短期和长期均线
-        short_ma = self.calculate_ma(self.short_period)
-        long_ma = self.calculate_ma(self.long_period)
-        
         if short_ma is None or long_ma is None:
             return signals
+        
+        self.ma_history.append(timestamp, short_ma=short_ma, long_ma=long_ma)
             
         price = bar['close']
         volume = 1000000 / price
@@ -78,21 +79,22 @@ class MAStrategy(BaseStrategy):
         return signals 
     
     def get_indicator_data(self):
-        if not self.ma_history:
+        if len(self.ma_history) == 0:
             return None
+        ma_data = self.ma_history.to_dict()
         return [
             {
                 'name': f'MA{self.short_period}',
-                'data': self.ma_history,
+                'data': ma_data,
                 'value_key': 'short_ma',
                 'color': 'red',
                 'alpha': 0.8
             },
             {
                 'name': f'MA{self.long_period}',
-                'data': self.ma_history,
+                'data': ma_data,
                 'value_key': 'long_ma',
                 'color': 'blue',
                 'alpha': 0.8
             }
-        ]
\ No newline at end of file
+        ]
@@ -1,21 +1,39 @@
 from .base_strategy import BaseStrategy
+from .indicators import VWAP, IndicatorHistory
 import pandas as pd
+import numpy as np
 
 class VWAPStrategy(BaseStrategy):
-    def __init__(self):
+    def __init__(self, band_multiplier=None, history_capacity=4096):
+        """
+        VWAP策略
+        
+        Parameters:
+        -----------
+        band_multiplier: float
+            VWAP通道宽度（成交量加权标准差的倍数），None表示不绘制通道
+        history_capacity: int
+            指标历史数组的初始容量
+        """
         super().__init__()
         self.name = "VWAP Strategy"
-        self.daily_data = []
+        self.band_multiplier = band_multiplier
         self.current_date = None
         self.current_vwap = None
-        self.vwap_history = []
         self.first_bar_of_day = True
         
+        # 增量VWAP，交易日切换时自动重置
+        self.vwap = VWAP()
+        
+        # 预分配的VWAP历史数组
+        self.vwap_history = IndicatorHistory(['vwap', 'vwap_std'], history_capacity)
+        
     def calculate_vwap(self):
-        if not self.daily_data:
-            return None
-        df = pd.DataFrame(self.daily_data)
-        return (df['price'] * df['volume']).sum() / df['volume'].sum()
+        return self.vwap.value
+    
+    def calculate_vwap_std(self):
+        """当日成交量加权标准差"""
+        return self.vwap.std
         
     def on_bar(self, timestamp, bar):
         current_date = pd.Timestamp(timestamp).date()
@@ -24,7 +42,6 @@ class VWAPStrategy(BaseStrategy):
         # 处理新交易日
         if self.current_date != current_date:
             self.current_date = current_date
-            self.daily_data = []
             self.first_bar_of_day = True
             self.current_position = 0
         
@@ -32,19 +49,9 @@ class VWAPStrategy(BaseStrategy):
         if self.should_close_position(timestamp):
             return self.generate_close_signals(bar)
         
-        # 添加数据计算VWAP
-        self.daily_data.append({
-            'price': (bar['high'] + bar['low'] + bar['close']) / 3,
-            'volume': bar['volume']
-        })
-        
-        # 计算并记录VWAP
-        self.current_vwap = self.calculate_vwap()
-        if self.current_vwap is not None:
-            self.vwap_history.append({
-                'timestamp': timestamp,
-                'vwap': self.current_vwap
-            })
+        # 增量更新并记录VWAP
+        self.current_vwap = self.vwap.update(bar, timestamp)
+        self.vwap_history.append(timestamp, vwap=self.current_vwap, vwap_std=self.vwap.std)
         
         # 跳过每天第一根K线
         if self.first_bar_of_day:
@@ -71,14 +78,61 @@ class VWAPStrategy(BaseStrategy):
                 self.current_position = -1
                 
         return [s for s in signals if s is not None]
+    
+    def compute_vwap(self, data):
+        """
+        向量化计算整段数据的VWAP，与逐K线计算结果一致
+        
+        Parameters:
+        -----------
+        data: pd.DataFrame
+            分钟数据，索引为时间戳，包含 ['high', 'low', 'close', 'volume']
+            
+        Returns:
+        --------
+        pd.DataFrame: 与data同索引，包含 ['vwap', 'vwap_std'] 两列
+        """
+        # 收盘平仓时段的K线不参与VWAP累计
+        included = pd.DatetimeIndex(data.index).time < self.trading_times['close_time']
+        volume = np.where(included, data['volume'].values, 0.0)
+        vwap, vwap_std = VWAP().compute_with_std(data, volume)
+        
+        return pd.DataFrame({
+            'vwap': vwap,
+            'vwap_std': vwap_std
+        }, index=data.index)
         
     def get_indicator_data(self):
-        if not self.vwap_history:
+        if len(self.vwap_history) == 0:
             return None
-        return {
+        vwap_data = self.vwap_history.to_dict()
+        vwap_indicator = {
             'name': 'VWAP',
-            'data': self.vwap_history,
+            'data': vwap_data,
             'value_key': 'vwap',  # 数据中的值字段名
             'color': 'purple',
             'alpha': 0.8
-        }
\ No newline at end of file
+        }
+        if self.band_multiplier is None:
+            return vwap_indicator
+        
+        band_width = self.band_multiplier * vwap_data['vwap_std']
+        vwap_data['upper_band'] = vwap_data['vwap'] + band_width
+        vwap_data['lower_band'] = vwap_data['vwap'] - band_width
+        return [
+            vwap_indicator,
+            {
+                'name': f'VWAP +{self.band_multiplier}σ',
+                'data': vwap_data,
+                'value_key': 'upper_band',
+                'color': 'purple',
+                'alpha': 0.3
+            },
+            {
+                'name': f'VWAP -{self.band_multiplier}σ',
+                'data': vwap_data,
+                'value_key': 'lower_band',
+                'color': 'purple',
+                'alpha': 0.3
+            }
+        ]
@@ -1,237 +1,592 @@
 import pandas as pd
 import numpy as np
 from backtest_engine import BacktestEngine
+from data_loader import MinuteDataLoader
 from strategies.vwap_strategy import VWAPStrategy
 from strategies.ma_strategy import MAStrategy
 from strategies.grid_strategy import GridStrategy
 from strategies.daily_return_strategy import DailyReturnStrategy
-from itertools import product
+from sweep_kernels import ma_crossover_sweep
+from parallel_executor import ParallelExecutor, run_task_timed, summarize_backtest
+from result_cache import ResultCache
+from sweep_journal import SweepJournal, SweepProgress
+from task_queue import TaskQueue
+import param_search
+from param_space import ParamSpace
+from results_store import ResultsTable, summary_strategy_type
+from walk_forward import walk_forward_folds, stitch_equity, max_drawdown
+from visualizer import draw_heatmap
+import report_renderer
 import time
 from tabulate import tabulate
 import matplotlib.pyplot as plt
-import seaborn as sns
 
 class StrategyOptimizer:
-    def __init__(self, symbol, start_date, end_date, initial_capital=1000000, show_plots=False):
+    def __init__(self, symbol, start_date, end_date, initial_capital=1000000, show_plots=False,
+                 use_sweep_kernels=False, n_jobs=1, cache_dir=None, journal_path=None, progress_interval=5.0,
+                 queue_dir=None, stale_timeout=600, bar_size=None):
         self.symbol = symbol
         self.start_date = start_date
         self.end_date = end_date
         self.initial_capital = initial_capital
+        self.commission_rate = 0.00005
         self.results = []
         self.show_plots = show_plots
+        self.use_sweep_kernels = use_sweep_kernels  # 是否使用矩阵化参数扫描内核（目前支持MA策略）
+        self.n_jobs = n_jobs  # 并行进程数，1为串行，None为全部CPU核心
+        self.market_data = None  # 只加载一次的行情数据
+        self.executor = None
+        self._in_sweep = False
+        self.cache = ResultCache(cache_dir) if cache_dir else None  # 回测结果磁盘缓存
+        self._data_fingerprint = None
+        self.journal = SweepJournal(journal_path) if journal_path else None  # 断点记录，重新运行时跳过已完成的组合
+        self.progress_interval = progress_interval  # 打印运行进度的间隔（秒）
+        # 共享目录任务队列：任务交给 task_queue.py 工作进程（可在多台机器上）运行
+        self.queue = TaskQueue(queue_dir, stale_timeout) if queue_dir else None
+        self.bar_size = bar_size  # K线周期（如 '15min'），None为分钟K线
         
-        # 策略注册表
-        self.strategy_registry = {
-            'VWAP': {
-                'class': VWAPStrategy,
-                'optimizer': self._optimize_vwap_strategy,
-                'default_params': None
-            },
-            'MA': {
-                'class': MAStrategy,
-                'optimizer': self._optimize_ma_strategy,
-                'default_params': {
-                    'short_periods': [3, 5, 8, 10, 12, 15],
-                    'long_periods': [10, 15, 20, 25, 30, 40]
-                }
-            },
-            'Grid': {
-                'class': GridStrategy,
-                'optimizer': self._optimize_grid_strategy,
-                'default_params': {
-                    'grid_nums': [5, 8, 10, 12, 15, 20],
-                    'price_range_ratios': [0.005, 0.01, 0.015, 0.02, 0.025, 0.03]
-                }
-            },
-            'DailyReturn': {
-                'class': DailyReturnStrategy,
-                'optimizer': self._optimize_daily_return_strategy,
-                'default_params': {
-                    'return_thresholds': [0.01, 0.015, 0.02, 0.025, 0.03],
-                    'entry_times': ['14:45:00', '14:50:00', '14:55:00']
-                }
-            }
-        }
+        # 策略注册表：label 为显示名称，space 为参数空间，kernel 为可选的矩阵化参数扫描内核
+        self.strategy_registry = {}
+        self.strategy_configs = {}
+        self.register_strategy('VWAP', VWAPStrategy, ParamSpace(VWAPStrategy))
+        self.register_strategy('MA', MAStrategy, ParamSpace(
+            MAStrategy,
+            {'short_period': [3, 5, 8, 10, 12, 15], 'long_period': [10, 15, 20, 25, 30, 40]},
+            constraints=[('short_period', '<', 'long_period')],
+            name_format='MA({short_period},{long_period})',
+            labels={'short_period': '短期均线周期', 'long_period': '长期均线周期'}
+        ), kernel=self._ma_sweep_kernel)
+        self.register_strategy('Grid', GridStrategy, ParamSpace(
+            GridStrategy,
+            {'grid_num': [5, 8, 10, 12, 15, 20], 'price_range_ratio': [0.005, 0.01, 0.015, 0.02, 0.025, 0.03]},
+            name_format='Grid({grid_num},{price_range_ratio:.3f})',
+            labels={'grid_num': '网格数量', 'price_range_ratio': '价格区间比例'}
+        ), label='网格')
+        self.register_strategy('DailyReturn', DailyReturnStrategy, ParamSpace(
+            DailyReturnStrategy,
+            {'return_threshold': [0.01, 0.015, 0.02, 0.025, 0.03], 'entry_time': ['14:45:00', '14:50:00', '14:55:00']},
+            name_format='DailyReturn({return_threshold:.1%},{entry_time})',
+            labels={'return_threshold': '涨跌幅阈值', 'entry_time': '入场时间'}
+        ), label='日内涨跌幅')
         
-        # 策略配置
-        self.strategy_configs = {
-            name: {'enabled': False, 'params': info['default_params']} 
-            for name, info in self.strategy_registry.items()
-        }
+    def register_strategy(self, name, strategy_class, space=None, label=None, kernel=None, optimizer_func=None):
+        """
+        注册新策略
+        
+        第三个参数是参数空间（旧版本为自定义优化函数），自定义优化函数使用 optimizer_func 传入
         
-    def register_strategy(self, name, strategy_class, optimizer_func, default_params=None):
-        """注册新策略"""
+        Parameters:
+        -----------
+        name: str
+            策略名称
+        strategy_class: type
+            策略类
+        space: ParamSpace or dict
+            参数空间，也可以直接传入 {参数名: 取值列表}；None表示只使用默认参数
+        label: str
+            显示名称，默认与 name 相同
+        kernel: callable
+            可选的矩阵化参数扫描内核，kernel(space) 返回结果汇总列表，穷举搜索且 use_sweep_kernels 时使用
+        optimizer_func: callable
+            自定义优化函数，指定后代替按参数空间的通用优化
+        """
+        if callable(space) and not isinstance(space, ParamSpace):
+            raise TypeError(f"register_strategy 的第三个参数是参数空间，自定义优化函数请使用 optimizer_func=... 传入: {name}")
+        if not isinstance(space, ParamSpace):
+            space = ParamSpace(strategy_class, space)
         self.strategy_registry[name] = {
             'class': strategy_class,
-            'optimizer': optimizer_func,
-            'default_params': default_params
+            'label': label or name,
+            'space': space,
+            'kernel': kernel,
+            'optimizer': optimizer_func
         }
         self.strategy_configs[name] = {
             'enabled': False,
-            'params': default_params
+            'space': space
         }
         
-    def set_strategy_config(self, strategy_name, enabled=False, params=None):
-        """设置策略配置"""
+    def set_strategy_config(self, strategy_name, enabled=False, params=None, search=None):
+        """
+        设置策略配置
+        
+        Parameters:
+        -----------
+        strategy_name: str
+            策略名称
+        enabled: bool
+            是否启用
+        params: dict
+            替换参数取值，{参数名: 取值列表或 Range}，参数名也可以使用复数形式（如 'short_periods'）
+        search: dict
+            搜索设置，默认穷举搜索，例如：
+            {'method': 'random', 'budget': 20, 'seed': 0}
+            {'method': 'lhs', 'budget': 20}
+            {'method': 'halving', 'eta': 3, 'min_fraction': 0.1, 'metric': '总收益率'}
+            halving 可同时指定 budget 和 sampler（'random' 或 'lhs'）先抽样再逐轮淘汰
+        """
         if strategy_name not in self.strategy_configs:
             raise ValueError(f"未知策略: {strategy_name}")
+        if search is not None and search.get('method', 'grid') not in param_search.SEARCH_METHODS:
+            raise ValueError(f"未知搜索方法: {search.get('method')}")
             
         self.strategy_configs[strategy_name]['enabled'] = enabled
         if params is not None:
-            self.strategy_configs[strategy_name]['params'] = params
+            self.strategy_configs[strategy_name]['space'] = self.strategy_registry[strategy_name]['space'].with_values(params)
+        if search is not None:
+            self.strategy_configs[strategy_name]['search'] = search
+            
+    def load_market_data(self):
+        """加载行情数据（只加载一次，所有回测共用）"""
+        if self.market_data is None:
+            engine = BacktestEngine(initial_capital=self.initial_capital, commission_rate=self.commission_rate)
+            self.market_data = engine.load_data(self.symbol, self.start_date, self.end_date, self.bar_size)
+        return self.market_data
+    
+    def trading_dates(self):
+        """行情数据中的交易日列表（'YYYYMMDD'，升序）"""
+        index = pd.DatetimeIndex(self.load_market_data().index)
+        return list(pd.unique(index.strftime('%Y%m%d')))
+    
+    def _make_task(self, strategy, params=None, start_date=None, end_date=None):
+        """构造单个回测任务，默认使用完整日期区间"""
+        return {
+            'strategy': strategy,
+            'params': params,
+            'symbol': self.symbol,
+            'start_date': start_date or self.start_date,
+            'end_date': end_date or self.end_date,
+            'initial_capital': self.initial_capital,
+            'commission_rate': self.commission_rate,
+            'bar_size': self.bar_size
+        }
+            
+    def data_fingerprint(self):
+        """输入数据文件指纹（只计算一次，包含K线周期）"""
+        if self._data_fingerprint is None:
+            self._data_fingerprint = MinuteDataLoader().fingerprint(self.symbol, self.start_date, self.end_date)
+            if self.bar_size is not None:
+                self._data_fingerprint += f"@{self.bar_size}"
+        return self._data_fingerprint
             
     def run_single_test(self, strategy, params=None):
-        """运行单次回测"""
-        engine = BacktestEngine(initial_capital=self.initial_capital, commission_rate=0.00005)
+        """运行单次回测，结果汇总记入 self.results，返回完整的回测结果（同 BacktestEngine.run_backtest）"""
+        engine = BacktestEngine(initial_capital=self.initial_capital, commission_rate=self.commission_rate)
         results = engine.run_backtest(
             strategy=strategy,
             symbol=self.symbol,
             start_date=self.start_date,
             end_date=self.end_date,
-            show_plots=False
+            show_plots=False,
+            data=self.load_market_data()
         )
-        
-        summary = {
-            '策略名称': strategy.name,
-            '参数': str(params) if params else 'default',
-            '总收益率': results['总收益率'],
-            '费前收益': results['费前收益'],
-            '费后收益': results['费后收益'],
-            '总手续费': results['总手续费'],
-            '换手率': results['换手率'],
-            '交易次数': results['交易次数'],
-            '日均交易次数': results['交易次数'] / 5,
-            '单笔收益': results['费后收益'] / results['交易次数'] if results['交易次数'] > 0 else 0
-        }
-        self.results.append(summary)
+        self.results.append(summarize_backtest(strategy, params, results))
         return results
+    
+    def _run_batch(self, tasks, start_date=None, end_date=None, record=True):
+        """
+        运行一批回测任务：已缓存的直接读取，其余在 n_jobs > 1 时分发到进程池并行执行
         
-    def _optimize_vwap_strategy(self):
-        """VWAP策略优化"""
-        strategy = VWAPStrategy()
-        self.run_single_test(strategy)
+        Parameters:
+        -----------
+        tasks: list
+            (strategy, params) 列表
+        start_date, end_date: str
+            回测区间，默认使用完整区间
+        record: bool
+            是否把结果记入 self.results
+            
+        Returns:
+        --------
+        list: 按任务顺序排列的结果汇总
+        """
+        tasks = [self._make_task(strategy, params, start_date, end_date) for strategy, params in tasks]
+        return self._run_tasks(tasks, record)
+    
+    def _run_tasks(self, tasks, record=True):
+        """
+        运行 _make_task 构造的回测任务（各任务可以使用不同的日期区间）
         
-    def _optimize_ma_strategy(self):
-        """MA策略优化"""
-        params = self.strategy_configs['MA']['params']
-        short_periods = params['short_periods']
-        long_periods = params['long_periods']
+        Returns:
+        --------
+        list: 按任务顺序排列的结果汇总
+        """
+        summaries = [None] * len(tasks)
+        keys = [None] * len(tasks)
         
-        print(f"MA策略参数组合数: {len(short_periods) * len(long_periods)}")
+        # 读取断点记录
+        if self.journal is not None:
+            for i, task in enumerate(tasks):
+                summaries[i] = self.journal.get(task, self.data_fingerprint())
+            resumed = sum(summary is not None for summary in summaries)
+            if resumed:
+                print(f"断点记录中已完成 {resumed}/{len(tasks)}")
         
-        for short_period, long_period in product(short_periods, long_periods):
-            if short_period >= long_period:
-                continue
-                
-            strategy_params = {'short_period': short_period, 'long_period': long_period}
-            strategy = MAStrategy(short_period=short_period, long_period=long_period)
-            strategy.name = f"MA({short_period},{long_period})"
-            self.run_single_test(strategy, strategy_params)
+        # 读取缓存
+        if self.cache is not None:
+            for i, task in enumerate(tasks):
+                if summaries[i] is None:
+                    keys[i] = self.cache.make_key(task, self.data_fingerprint())
+                    summaries[i] = self.cache.get(keys[i])
+                    if summaries[i] is not None and self.journal is not None:
+                        self.journal.append(task, summaries[i], self.data_fingerprint())
+        pending = [i for i, summary in enumerate(summaries) if summary is None]
+        if self.cache is not None and len(pending) < len(tasks):
+            print(f"缓存命中 {len(tasks) - len(pending)}/{len(tasks)}")
+        
+        # 计算未命中的任务，每完成一个就写入缓存和断点记录
+        progress = SweepProgress(len(pending), self.progress_interval)
+        
+        def finish(i, summary, stats):
+            summaries[i] = summary
+            if self.cache is not None:
+                self.cache.put(keys[i], summary)
+            if self.journal is not None:
+                self.journal.append(tasks[i], summary, self.data_fingerprint())
+            progress.update(stats, tasks[i]['strategy'].name)
+        
+        if self.queue is not None and pending:
+            task_ids = {}
+            data_range = (self.symbol, self.start_date, self.end_date, self.bar_size)
+            for i in pending:
+                task_ids.setdefault(self.queue.submit(tasks[i], data_range, self.data_fingerprint()), []).append(i)
+            print(f"已提交 {len(task_ids)} 个任务到队列 {self.queue.queue_dir}，等待工作进程运行")
             
-    def _optimize_grid_strategy(self):
-        """网格策略优化"""
-        params = self.strategy_configs['Grid']['params']
-        grid_nums = params['grid_nums']
-        price_range_ratios = params['price_range_ratios']
-        
-        print(f"网格策略参数组合数: {len(grid_nums) * len(price_range_ratios)}")
-        
-        for grid_num, ratio in product(grid_nums, price_range_ratios):
-            strategy_params = {'grid_num': grid_num, 'price_range_ratio': ratio}
-            strategy = GridStrategy(grid_num=grid_num, price_range_ratio=ratio)
-            strategy.name = f"Grid({grid_num},{ratio:.3f})"
-            self.run_single_test(strategy, strategy_params)
+            def on_result(task_id, summary, stats):
+                for i in task_ids[task_id]:
+                    finish(i, summary, stats)
+            
+            self.queue.collect(list(task_ids), on_result)
+        elif self._parallel_enabled() and len(pending) > 1:
+            for k, summary, stats in self._get_executor().imap_unordered([tasks[i] for i in pending]):
+                finish(pending[k], summary, stats)
+        else:
+            for i in pending:
+                finish(i, *run_task_timed(tasks[i], self.load_market_data()))
+        progress.finish()
+        if not self._in_sweep:
+            self.close()
             
-    def _optimize_daily_return_strategy(self):
-        """日内涨跌幅策略优化"""
-        params = self.strategy_configs['DailyReturn']['params']
-        thresholds = params['return_thresholds']
-        entry_times = params['entry_times']
-        
-        print(f"日内涨跌幅策略参数组合数: {len(thresholds) * len(entry_times)}")
-        
-        for threshold, entry_time in product(thresholds, entry_times):
-            strategy_params = {
-                'return_threshold': threshold,
-                'entry_time': entry_time
-            }
-            strategy = DailyReturnStrategy(
-                return_threshold=threshold,
-                entry_time=entry_time
+        if record:
+            self.results.extend(summaries)
+        return summaries
+    
+    def _parallel_enabled(self):
+        return self.n_jobs is None or self.n_jobs > 1
+    
+    def _get_executor(self):
+        """按需创建进程池，整个测试过程共用一个进程池和共享内存数据"""
+        if self.executor is None:
+            self.executor = ParallelExecutor(self.load_market_data(), self.n_jobs)
+            print(f"并行进程数: {self.executor.n_jobs}")
+        return self.executor
+    
+    def close_executor(self):
+        """关闭进程池并释放共享内存"""
+        if self.executor is not None:
+            self.executor.close()
+            self.executor = None
+    
+    def close(self):
+        """关闭进程池和断点记录文件（一次扫描结束时调用，之后仍可继续运行，需要时重新打开）"""
+        self.close_executor()
+        if self.journal is not None:
+            self.journal.close()
+        
+    def _optimize(self, strategy_name):
+        """按参数空间和搜索设置优化策略"""
+        space = self.strategy_configs[strategy_name]['space']
+        kernel = self.strategy_registry[strategy_name]['kernel']
+        
+        if space.params:
+            print(f"{self.strategy_registry[strategy_name]['label']}策略参数组合数: {space.size}")
+        
+        if kernel is not None and self.use_sweep_kernels and self._search_config(strategy_name)['method'] == 'grid':
+            # 所有参数组合一起计算
+            self.results.extend(kernel(space))
+            return
+        
+        self._search(strategy_name)
+        
+    def _ma_sweep_kernel(self, space):
+        """MA策略矩阵化参数扫描（内核自带 short_period < long_period 约束，参数空间的其他约束在结果上筛选）"""
+        summaries = ma_crossover_sweep(
+            self.load_market_data(), space.params['short_period'], space.params['long_period'],
+            initial_capital=self.initial_capital,
+            commission_rate=self.commission_rate
+        )
+        return [summary for summary in summaries if space.constraint(summary['参数明细'])]
+        
+    def _search_config(self, strategy_name):
+        """读取策略的搜索设置，未设置时为穷举搜索"""
+        search = dict(self.strategy_configs[strategy_name].get('search') or {})
+        search.setdefault('method', 'grid')
+        return search
+    
+    def _candidates(self, search, axes, constraint=None):
+        """按搜索设置生成候选参数，halving 先按 sampler 抽样（未指定 budget 时使用全部组合）"""
+        method = search['method']
+        budget = search.get('budget')
+        seed = search.get('seed')
+        sampler = search.get('sampler', 'random') if method == 'halving' else method
+        if sampler == 'random' and budget:
+            return param_search.random_candidates(axes, budget, constraint, seed)
+        if sampler == 'lhs' and budget:
+            return param_search.latin_hypercube_candidates(axes, budget, constraint, seed)
+        return param_search.grid_candidates(axes, constraint)
+    
+    def _search(self, strategy_name):
+        """按策略的参数空间和搜索设置生成候选参数并运行回测"""
+        space = self.strategy_configs[strategy_name]['space']
+        factory = space.make_strategy
+        search = self._search_config(strategy_name)
+        method = search['method']
+        candidates = self._candidates(search, space.axes, space.constraint)
+        
+        if method != 'halving':
+            if method != 'grid':
+                print(f"{method}搜索: 评估 {len(candidates)} 个参数组合")
+            self._run_batch([(factory(params), params) for params in candidates])
+            return
+        
+        # 逐轮淘汰：短区间评估全部候选，只把表现最好的推进到更长区间
+        eta = search.get('eta', 3)
+        metric = search.get('metric', '总收益率')
+        schedule = param_search.halving_schedule(self.trading_dates(), len(candidates), eta, search.get('min_fraction'))
+        
+        def evaluate(round_candidates, start_date, end_date, final):
+            print(f"逐轮淘汰: {len(round_candidates)} 个参数组合, 区间 {start_date}-{end_date}")
+            summaries = self._run_batch(
+                [(factory(params), params) for params in round_candidates],
+                start_date=start_date, end_date=end_date, record=final
             )
-            strategy.name = f"DailyReturn({threshold:.1%},{entry_time})"
-            self.run_single_test(strategy, strategy_params)
+            return [summary[metric] for summary in summaries]
+        
+        param_search.successive_halving(candidates, evaluate, schedule, eta)
             
     def run_all_tests(self):
         """运行所有启用的策略测试"""
         print("\n=== 开始策略测试 ===")
         start_time = time.time()
         
-        # 运行所有启用的策略
-        for strategy_name, config in self.strategy_configs.items():
-            if config['enabled']:
-                print(f"\n测试 {strategy_name} 策略...")
-                optimizer_func = self.strategy_registry[strategy_name]['optimizer']
-                optimizer_func()
+        self._in_sweep = True
+        try:
+            # 运行所有启用的策略
+            for strategy_name, config in self.strategy_configs.items():
+                if config['enabled']:
+                    print(f"\n测试 {strategy_name} 策略...")
+                    optimizer_func = self.strategy_registry[strategy_name]['optimizer']
+                    start = len(self.results)
+                    if optimizer_func is not None:
+                        optimizer_func()
+                    else:
+                        self._optimize(strategy_name)
+                    # 记录注册名称，结果表按注册名称分组（策略实例名称不一定以注册名称开头，如 'VWAP Strategy'）
+                    self.results[start:] = [{**summary, '策略类型': summary.get('策略类型') or strategy_name}
+                                            for summary in self.results[start:]]
+        finally:
+            self._in_sweep = False
+            self.close()
         
         print(f"\n策略测试完成! 总耗时: {time.time() - start_time:.2f}秒")
         
-    def plot_parameter_heatmap(self, strategy_type, save_fig=False):
-        """绘制参数热力图"""
-        results_df = pd.DataFrame(self.results)
+    def run_walk_forward(self, strategy_name, train_days, test_days, step_days=None, anchored=False,
+                         metric='总收益率'):
+        """
+        滚动前进分析：每个训练区间做参数扫描，最优参数在随后的测试区间回测，拼接样本外净值
         
-        # 检查是否有该策略的数据
-        strategy_results = results_df[results_df['策略名称'].str.startswith(strategy_type)]
-        if strategy_results.empty:
-            print(f"没有{strategy_type}策略的测试数据，跳过绘图")
-            return
+        所有fold的训练任务作为一批分发到进程池（n_jobs > 1 时），共用只加载一次的行情数据；
+        候选参数按策略的搜索设置生成（halving 只使用其抽样结果，在训练区间上完整评估）
         
-        if strategy_type == 'MA':
-            # 提取MA策略的参数
-            params = strategy_results['参数'].apply(eval)
+        Parameters:
+        -----------
+        strategy_name: str
+            策略名称
+        train_days: int
+            训练区间交易日数
+        test_days: int
+            测试区间交易日数
+        step_days: int
+            相邻fold的间隔交易日数，默认等于 test_days
+        anchored: bool
+            True为锚定窗口（训练区间起点固定），False为滚动窗口
+        metric: str
+            训练区间选择最优参数的指标（越大越好）
             
-            # 创建热力图数据
-            heatmap_data = pd.pivot_table(
-                strategy_results,
-                values='总收益率',
-                index=params.apply(lambda x: x['short_period']),
-                columns=params.apply(lambda x: x['long_period'])
-            )
+        Returns:
+        --------
+        dict: {'folds': 每个fold的结果表, 'equity': 样本外每日总资产, '总收益率', '最大回撤'}
+        """
+        space = self.strategy_configs[strategy_name]['space']
+        factory = space.make_strategy
+        candidates = self._candidates(self._search_config(strategy_name), space.axes, space.constraint)
+        
+        folds = walk_forward_folds(self.trading_dates(), train_days, test_days, step_days, anchored)
+        if not folds:
+            raise ValueError(f"交易日数量不足: 需要多于 {train_days} 个交易日")
+        print(f"\n=== {strategy_name} 滚动前进分析: {len(folds)} 个fold, 每个fold {len(candidates)} 个参数组合 ===")
+        start_time = time.time()
+        
+        in_sweep = self._in_sweep
+        self._in_sweep = True
+        try:
+            # 训练区间：全部fold的全部参数组合一起分发
+            train_tasks = [
+                self._make_task(factory(params), params, fold['train_start'], fold['train_end'])
+                for fold in folds for params in candidates
+            ]
+            train_summaries = self._run_tasks(train_tasks, record=False)
             
-            plt.figure(figsize=(10, 8))
-            sns.heatmap(heatmap_data, annot=True, fmt='.2%', cmap='RdYlGn')
-            plt.title('MA策略参数优化热力图')
-            plt.xlabel('长期均线周期')
-            plt.ylabel('短期均线周期')
+            # 每个fold选出训练区间表现最好的参数
+            scores = np.array([summary[metric] for summary in train_summaries], dtype=float)
+            scores = np.nan_to_num(scores, nan=-np.inf).reshape(len(folds), len(candidates))
+            best = scores.argmax(axis=1)
             
-            if save_fig:
-                plt.savefig(f'MA_heatmap_{self.start_date}_{self.end_date}.png')
+            # 测试区间：用最优参数回测，附带每日资产用于拼接
+            test_tasks = []
+            for fold, k in zip(folds, best):
+                task = self._make_task(factory(candidates[k]), candidates[k], fold['test_start'], fold['test_end'])
+                task['return_equity'] = True
+                test_tasks.append(task)
+            test_summaries = self._run_tasks(test_tasks, record=False)
+        finally:
+            self._in_sweep = in_sweep
+            if not in_sweep:
+                self.close()
+        
+        report = pd.DataFrame([{
+            'fold': fold['fold'],
+            '训练区间': f"{fold['train_start']}-{fold['train_end']}",
+            '测试区间': f"{fold['test_start']}-{fold['test_end']}",
+            '最优参数': summary['参数'],
+            f'训练{metric}': scores[i, best[i]],
+            '测试总收益率': summary['总收益率'],
+            '测试交易次数': summary['交易次数'],
+            '测试总手续费': summary['总手续费']
+        } for i, (fold, summary) in enumerate(zip(folds, test_summaries))])
+        equity = stitch_equity([summary['每日资产'] for summary in test_summaries], self.initial_capital)
+        total_return = equity.iloc[-1] / self.initial_capital - 1 if not equity.empty else 0.0
+        
+        print(tabulate(report, headers='keys', tablefmt='grid', showindex=False, floatfmt='.4f'))
+        print(f"样本外总收益率: {total_return:.2%}, 最大回撤: {max_drawdown(equity.values):.2%}")
+        print(f"滚动前进分析完成! 总耗时: {time.time() - start_time:.2f}秒")
+        
+        return {
+            'folds': report,
+            'equity': equity,
+            '总收益率': total_return,
+            '最大回撤': max_drawdown(equity.values)
+        }
+        
+    def results_table(self):
+        """把全部测试结果整理为列式结果表"""
+        return ResultsTable.from_summaries(self.results)
+    
+    def save_results(self, path):
+        """保存测试结果为 Parquet 文件"""
+        self.results_table().to_parquet(path)
+        
+    def heatmap_data(self, strategy_type, table=None):
+        """
+        整理参数热力图数据（参数空间的前两个参数分别作为行和列）
+        
+        Returns:
+        --------
+        dict: 见 visualizer.draw_heatmap；没有数据或参数少于两个时返回None
+        """
+        table = table if table is not None else self.results_table()
+        
+        # 检查是否有该策略的数据
+        if not len(table) or table.strategy(strategy_type).empty:
+            print(f"没有{strategy_type}策略的测试数据，跳过绘图")
+            return None
+        
+        param_columns = table.param_columns(strategy_type)
+        if len(param_columns) < 2:
+            print(f"{strategy_type}策略参数少于两个，跳过绘图")
+            return None
+        
+        registry = self.strategy_registry.get(strategy_type, {})
+        labels = registry['space'].labels if registry else {}
+        index, columns = param_columns[:2]
+        heatmap_data = table.pivot(strategy_type, index=index, columns=columns)
+        return {
+            'values': heatmap_data.to_numpy(dtype=float),
+            'index': list(heatmap_data.index),
+            'columns': list(heatmap_data.columns),
+            'title': f"{registry.get('label', strategy_type)}策略参数优化热力图",
+            'xlabel': labels.get(columns, columns),
+            'ylabel': labels.get(index, index)
+        }
+        
+    def plot_parameter_heatmap(self, strategy_type, save_fig=False, table=None):
+        """绘制参数热力图（参数空间的前两个参数分别作为行和列）"""
+        chart = self.heatmap_data(strategy_type, table)
+        if chart is None:
+            return
+        
+        fig = draw_heatmap(chart)
+        
+        if save_fig:
+            fig.savefig(f'{strategy_type}_heatmap_{self.start_date}_{self.end_date}.png')
             
-        elif strategy_type == 'Grid':
-            # 提取网格策略的参数
-            params = strategy_results['参数'].apply(eval)
+        if self.show_plots:
+            plt.show()
+        else:
+            plt.close(fig)
             
-            # 创建热力图数据
-            heatmap_data = pd.pivot_table(
-                strategy_results,
-                values='总收益率',
-                index=params.apply(lambda x: x['grid_num']),
-                columns=params.apply(lambda x: x['price_range_ratio'])
-            )
+    def render_reports(self, output_dir, top_n=3, n_jobs=None, dpi=100):
+        """
+        在进程池中批量生成报告图片：各策略收益最高的 top_n 组参数的交易图和净值曲线，以及参数热力图
+        
+        参数优化时不保留交易记录，最优参数在当前进程中重新回测一次（不绘图），
+        只有降采样后的图表数组传给绘图进程，见 report_renderer
+        
+        Parameters:
+        -----------
+        output_dir: str
+            输出目录
+        top_n: int
+            每个策略生成交易图和净值曲线的参数组数，0表示只生成热力图
+        n_jobs: int
+            绘图进程数量，None表示使用全部CPU核心
+        dpi: int
+            图片分辨率
             
-            plt.figure(figsize=(10, 8))
-            sns.heatmap(heatmap_data, annot=True, fmt='.2%', cmap='RdYlGn')
-            plt.title('网格策略参数优化热力图')
-            plt.xlabel('价格区间比例')
-            plt.ylabel('网格数量')
+        Returns:
+        --------
+        list: 生成的图片文件路径
+        """
+        if not self.results:
+            print("没有测试结果!")
+            return []
             
-            if save_fig:
-                plt.savefig(f'Grid_heatmap_{self.start_date}_{self.end_date}.png')
+        table = self.results_table()
+        jobs = []
+        for strategy_type in table.df['策略类型'].cat.categories:
+            if len(table.param_columns(strategy_type)) >= 2:
+                chart = self.heatmap_data(strategy_type, table)
+                jobs.append(report_renderer.heatmap_job(strategy_type, chart))
             
-        if self.show_plots:
-            plt.show()
-        else:
-            plt.close()
+            registry = self.strategy_registry.get(strategy_type)
+            if registry is None or top_n <= 0:
+                continue
+            summaries = [summary for summary in self.results if summary_strategy_type(summary) == strategy_type]
+            best = {}
+            for summary in sorted(summaries, key=lambda summary: summary['总收益率'], reverse=True):
+                best.setdefault(summary['策略名称'], summary)
+            for summary in list(best.values())[:top_n]:
+                params = summary.get('参数明细') or {}
+                strategy = registry['space'].make_strategy(params)
+                engine = BacktestEngine(initial_capital=self.initial_capital, commission_rate=self.commission_rate)
+                engine.run_backtest(strategy, self.symbol, self.start_date, self.end_date,
+                                    data=self.load_market_data(), plot=False, verbose=False)
+                if engine.trades:
+                    jobs.extend(report_renderer.backtest_report_jobs(strategy.name, engine, strategy))
+        
+        paths = report_renderer.render_reports(jobs, output_dir, n_jobs, dpi)
+        print(f"已生成 {len(paths)} 张报告图片: {output_dir}")
+        return paths
         
     def print_results(self, top_n=10, save_plots=False):
         """打印测试结果"""
@@ -239,10 +594,11 @@ class StrategyOptimizer:
             print("没有测试结果!")
             return
             
-        results_df = pd.DataFrame(self.results)
+        table = self.results_table()
+        results_df = table.df
         
         # 按策略类型分组统计
-        strategy_stats = results_df.groupby(results_df['策略名称'].str.split('(').str[0]).agg({
+        strategy_stats = results_df.groupby('策略类型', observed=True).agg({
             '总收益率': ['mean', 'max', 'min', 'std'],
             '交易次数': 'mean',
             '单笔收益': 'mean'
@@ -253,24 +609,22 @@ class StrategyOptimizer:
         
         # 打印每种策略的最优参数组合
         print("\n=== 各策略最优参数 ===")
-        for strategy_type in ['MA', 'Grid', 'VWAP']:
-            strategy_results = results_df[results_df['策略名称'].str.startswith(strategy_type)]
-            if not strategy_results.empty:
-                best_result = strategy_results.loc[strategy_results['总收益率'].idxmax()]
-                print(f"\n{strategy_type}策略最优结果:")
-                for key, value in best_result.items():
-                    if isinstance(value, float):
-                        print(f"{key}: {value:.4f}")
-                    else:
-                        print(f"{key}: {value}")
+        strategy_types = list(results_df['策略类型'].cat.categories)
+        for strategy_type in strategy_types:
+            best_result = table.top(1, strategy_type=strategy_type).iloc[0]
+            print(f"\n{strategy_type}策略最优结果:")
+            for key, value in best_result.items():
+                if isinstance(value, float):
+                    print(f"{key}: {value:.4f}")
+                else:
+                    print(f"{key}: {value}")
         
         # 根据设置决定是否显示或保存图表
         if self.show_plots or save_plots:
-            # 只为有数据的策略绘制热力图
-            for strategy_type in ['MA', 'Grid']:
-                if results_df[results_df['策略名称'].str.startswith(strategy_type)].empty:
-                    continue
-                self.plot_parameter_heatmap(strategy_type, save_fig=save_plots)
+            # 只为有两个以上参数的策略绘制热力图
+            for strategy_type in strategy_types:
+                if len(table.param_columns(strategy_type)) >= 2:
+                    self.plot_parameter_heatmap(strategy_type, save_fig=save_plots, table=table)
 
 if __name__ == "__main__":
     # 测试参数
@@ -0,0 +1,169 @@
+"""
+参数扫描断点记录和进度统计
+
+- SweepJournal: 每完成一个参数组合就追加一行 JSON 到记录文件，中断后重新运行时跳过已完成的组合
+- SweepProgress: 运行过程中定期打印进度、组合/秒、K线/秒、预计剩余时间和各进程利用率，
+  结束时列出耗时最长的参数组合
+"""
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from result_cache import source_hash, task_fields
+
+# {策略类: 源码哈希}，每个进程中每个策略类只计算一次
+_source_hashes = {}
+
+
+def task_key(task, data_fingerprint=None):
+    """
+    回测任务的标识，字段与结果缓存键相同（见 result_cache.task_fields）：策略类及源码哈希、参数、品种、
+    日期区间、引擎设置和输入数据指纹，修改策略代码或数据文件后不会续用修改前的结果
+
+    Parameters:
+    -----------
+    task: dict
+        回测任务，格式同 StrategyOptimizer._make_task
+    data_fingerprint: str
+        输入数据文件指纹（包含K线周期，见 StrategyOptimizer.data_fingerprint）
+    """
+    strategy_class = type(task['strategy'])
+    if strategy_class not in _source_hashes:
+        _source_hashes[strategy_class] = source_hash(strategy_class)
+    content = json.dumps(task_fields(task, _source_hashes[strategy_class], data_fingerprint),
+                         sort_keys=True, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def _encode(value):
+    """结果汇总中的 numpy 标量和 pd.Series（每日资产）转换为 JSON 可保存的格式"""
+    if isinstance(value, pd.Series):
+        return {'__series__': {str(k.date()) if hasattr(k, 'date') else str(k): float(v)
+                               for k, v in value.items()}}
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"无法保存的类型: {type(value)}")
+
+
+def _decode(summary):
+    for key, value in summary.items():
+        if isinstance(value, dict) and '__series__' in value:
+            series = pd.Series(value['__series__'], dtype=float)
+            series.index = pd.DatetimeIndex(series.index)
+            summary[key] = series
+    return summary
+
+
+class SweepJournal:
+    """
+    参数扫描断点记录（JSON Lines，每行一个已完成的参数组合）
+
+    Parameters:
+    -----------
+    path: str
+        记录文件路径，不存在时自动创建
+
+    记录文件在第一次写入时打开，close() 后再写入会重新打开；也可以用作上下文管理器
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 中断时写了一半的最后一行
+                        continue
+                    self.entries[record['key']] = record['summary']
+        self._file = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, task, data_fingerprint=None):
+        """读取已完成任务的结果汇总，未完成返回None（data_fingerprint 见 task_key）"""
+        summary = self.entries.get(task_key(task, data_fingerprint))
+        return _decode(dict(summary)) if summary is not None else None
+
+    def append(self, task, summary, data_fingerprint=None):
+        """记录一个已完成的任务（立即写入磁盘）"""
+        key = task_key(task, data_fingerprint)
+        record = json.dumps({'key': key, 'summary': summary}, ensure_ascii=False, default=_encode)
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(record + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.entries[key] = json.loads(record)['summary']
+
+    def close(self):
+        """关闭记录文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SweepProgress:
+    """
+    参数扫描进度统计
+
+    Parameters:
+    -----------
+    total: int
+        待运行的任务数量
+    interval: float
+        打印进度的最小间隔（秒）
+    slowest: int
+        结束时列出耗时最长的任务数量
+    """
+    def __init__(self, total, interval=5.0, slowest=3):
+        self.total = total
+        self.interval = interval
+        self.slowest = slowest
+        self.done = 0
+        self.bars = 0
+        self.busy = {}  # {进程号: 累计运行时间}
+        self.durations = []  # [(耗时, 策略名称)]
+        self.start_time = time.time()
+        self._last_report = self.start_time
+
+    def update(self, stats, name=None):
+        """记录一个完成的任务，距上次打印超过 interval 时打印进度"""
+        self.done += 1
+        self.bars += stats['bars']
+        self.busy[stats['pid']] = self.busy.get(stats['pid'], 0.0) + stats['seconds']
+        self.durations.append((stats['seconds'], name))
+
+        now = time.time()
+        if now - self._last_report >= self.interval and self.done < self.total:
+            self._last_report = now
+            print(self.status())
+
+    def status(self):
+        """当前进度描述"""
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        combo_rate = self.done / elapsed
+        eta = (self.total - self.done) / combo_rate if combo_rate > 0 else float('nan')
+        utilization = ', '.join(f"{pid}: {busy / elapsed:.0%}" for pid, busy in sorted(self.busy.items()))
+        return (f"进度 {self.done}/{self.total} ({self.done / self.total:.0%}) | "
+                f"{combo_rate:.2f} 组合/秒 | {self.bars / elapsed:,.0f} K线/秒 | "
+                f"预计剩余 {eta:.0f}秒 | 进程利用率 {utilization}")
+
+    def finish(self):
+        """打印最终统计和耗时最长的任务"""
+        if self.total <= 1 or self.done == 0:
+            return
+        print(self.status())
+        slowest = sorted(self.durations, key=lambda item: item[0], reverse=True)[:self.slowest]
+        print("耗时最长: " + ', '.join(f"{name} {seconds:.2f}秒" for seconds, name in slowest))
@@ -0,0 +1,195 @@
+import pandas as pd
+import numpy as np
+
+
+def moving_average_matrix(close, periods):
+    """
+    一次累计求和计算多个周期的简单移动平均
+
+    Parameters:
+    -----------
+    close: np.ndarray
+        收盘价序列
+    periods: list
+        均线周期列表
+
+    Returns:
+    --------
+    np.ndarray: 形状为 (len(periods), len(close)) 的均线矩阵，预热期为NaN
+    """
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    result = np.full((len(periods), n), np.nan)
+    if n == 0:
+        return result
+
+    # 减去首个价格后再累加，降低大数相减的精度损失
+    offset = close[0]
+    cumsum = np.concatenate([[0.0], np.cumsum(close - offset)])
+    for k, period in enumerate(periods):
+        if period <= n:
+            result[k, period - 1:] = (cumsum[period:] - cumsum[:-period]) / period + offset
+    return result
+
+
+def crossover_states(short_ma, long_ma):
+    """
+    计算均线交叉策略每根K线结束后的持仓方向
+
+    与 MAStrategy 一致：短均线高于长均线为多头，低于为空头，相等时保持原方向，
+    均线未完成预热前为空仓
+
+    Parameters:
+    -----------
+    short_ma, long_ma: np.ndarray
+        形状为 (组合数, K线数) 的均线矩阵
+
+    Returns:
+    --------
+    np.ndarray: 同形状的持仓方向矩阵（1、-1、0）
+    """
+    with np.errstate(invalid='ignore'):
+        raw = np.sign(short_ma - long_ma)
+    raw[np.isnan(raw)] = 0
+
+    # 向前填充最近一次非零方向
+    n = raw.shape[1]
+    last = np.where(raw != 0, np.arange(n), 0)
+    np.maximum.accumulate(last, axis=1, out=last)
+    return np.take_along_axis(raw, last, axis=1).astype(np.int8)
+
+
+def _fill_legs(bars, directions, legs, close, fill_prices, initial_capital,
+               commission_rate, trade_amount):
+    """
+    按 BacktestEngine._process_signals 的规则逐笔撮合（买入受当前资金约束）
+
+    只遍历信号事件本身，单个参数组合通常只有数千笔
+    """
+    n_legs = int(legs.sum())
+    leg_bars = np.repeat(bars, legs)
+    leg_directions = np.repeat(directions, legs).astype(float)
+    prices = fill_prices[leg_bars]
+    volumes = trade_amount / close[leg_bars]
+
+    capital = initial_capital
+    for k in range(n_legs):
+        price = prices[k]
+        volume = volumes[k]
+        if leg_directions[k] == 1:
+            volume = min(volume, capital / price)
+            volumes[k] = volume
+        capital -= leg_directions[k] * price * volume + price * volume * commission_rate
+
+    cost = prices * volumes
+    return leg_bars, leg_directions * volumes, cost, cost * commission_rate
+
+
+def ma_crossover_sweep(data, short_periods, long_periods, initial_capital=1000000,
+                       commission_rate=0.00005, trade_amount=1000000):
+    """
+    均线交叉策略参数扫描内核：一次计算全部周期的均线，矩阵化生成所有参数组合的信号和收益
+
+    成交规则与事件驱动回测一致：信号在下一根K线开盘价成交（最后一根K线用收盘价），
+    买入数量受当前资金约束，主力合约切换时按切换K线收盘价平旧开新并收取手续费
+
+    Parameters:
+    -----------
+    data: pd.DataFrame
+        K线数据，包含 ['open', 'close', 'symbol']
+    short_periods: list
+        短期均线周期
+    long_periods: list
+        长期均线周期
+    initial_capital: float
+        初始资金
+    commission_rate: float
+        手续费率
+    trade_amount: float
+        每次开平仓的目标交易金额（与 MAStrategy 一致）
+
+    Returns:
+    --------
+    list: 每个参数组合的结果汇总，字段与 StrategyOptimizer.run_single_test 一致
+    """
+    close = data['close'].values.astype(float)
+    opens = data['open'].values.astype(float)
+    n = len(close)
+    fill_prices = np.empty(n)
+    fill_prices[:-1] = opens[1:]
+    fill_prices[-1:] = close[-1:]
+
+    # 主力合约切换K线
+    if 'symbol' in data.columns and n > 1:
+        symbols = data['symbol'].values
+        switch_bars = np.flatnonzero(symbols[1:] != symbols[:-1]) + 1
+    else:
+        switch_bars = np.array([], dtype=int)
+
+    trading_days = pd.DatetimeIndex(data.index).normalize().nunique()
+
+    periods = sorted(set(short_periods) | set(long_periods))
+    ma = moving_average_matrix(close, periods)
+    row = {period: k for k, period in enumerate(periods)}
+
+    summaries = []
+    for short_period in short_periods:
+        valid_longs = [p for p in long_periods if short_period < p]
+        if not valid_longs:
+            continue
+
+        # 同一短周期的所有长周期组合一起计算
+        states = crossover_states(
+            np.broadcast_to(ma[row[short_period]], (len(valid_longs), n)),
+            ma[[row[p] for p in valid_longs]]
+        )
+        previous = np.zeros_like(states)
+        previous[:, 1:] = states[:, :-1]
+        changed = states != previous
+
+        for k, long_period in enumerate(valid_longs):
+            bars = np.flatnonzero(changed[k])
+            directions = states[k, bars]
+            legs = np.where(previous[k, bars] == 0, 1, 2)
+            leg_bars, units, cost, commission = _fill_legs(
+                bars, directions, legs, close, fill_prices,
+                initial_capital, commission_rate, trade_amount
+            )
+
+            # 逐K线累计持仓与现金
+            position = np.zeros(n)
+            cash_change = np.zeros(n)
+            commission_by_bar = np.zeros(n)
+            np.add.at(position, leg_bars, units)
+            np.add.at(cash_change, leg_bars, -(units * fill_prices[leg_bars] + commission))
+            np.add.at(commission_by_bar, leg_bars, commission)
+            position = np.cumsum(position)
+
+            # 合约切换：按切换K线收盘价平旧开新，持仓不变，只产生双边手续费
+            held = np.abs(position[switch_bars - 1])
+            switch_cost = 2 * held * close[switch_bars]
+            np.add.at(cash_change, switch_bars, -switch_cost * commission_rate)
+            np.add.at(commission_by_bar, switch_bars, switch_cost * commission_rate)
+
+            total_value = initial_capital + np.cumsum(cash_change) + position * close
+            final_pnl = total_value[-1] - initial_capital
+            total_commission = commission_by_bar.sum()
+            trade_count = len(leg_bars)
+            params = {'short_period': short_period, 'long_period': long_period}
+
+            summaries.append({
+                '策略名称': f"MA({short_period},{long_period})",
+                '参数': str(params),
+                '参数明细': params,
+                '总收益率': total_value[-1] / initial_capital - 1,
+                '费前收益': final_pnl + total_commission,
+                '费后收益': final_pnl,
+                '总手续费': total_commission,
+                '换手率': (cost.sum() + switch_cost.sum()) / total_value.mean(),
+                '交易次数': trade_count,
+                '交易天数': trading_days,
+                '日均交易次数': trade_count / trading_days if trading_days > 0 else 0,
+                '单笔收益': final_pnl / trade_count if trade_count > 0 else 0
+            })
+
+    return summaries
@@ -0,0 +1,305 @@
+"""
+基于共享目录的回测任务队列
+
+协调进程把参数任务写入共享目录，任意数量的工作进程（本机或挂载同一目录的其他机器）领取任务、
+运行回测并写回结果文件，协调进程汇总结果。不依赖任何外部服务。
+
+目录结构：
+- tasks/<任务ID>.pkl             等待领取的任务
+- claims/<任务ID>@<工作进程>.pkl  已领取的任务（通过原子重命名领取，只有一个进程能成功）
+- results/<任务ID>.pkl           运行结果
+- errors/<任务ID>.txt            运行出错的任务
+
+工作进程运行期间定期更新领取文件的修改时间作为心跳，超过 stale_timeout 没有心跳的任务
+（如工作进程被杀掉）会被放回 tasks/ 重新领取。
+
+启动工作进程：
+    python task_queue.py worker --queue-dir /shared/queue
+查看队列状态：
+    python task_queue.py status --queue-dir /shared/queue
+"""
+import argparse
+import os
+import pickle
+import socket
+import threading
+import time
+import traceback
+from backtest_engine import BacktestEngine
+from parallel_executor import run_task_timed
+from sweep_journal import task_key
+
+
+def _write_atomic(path, value):
+    """先写临时文件再重命名，读取方不会看到写了一半的文件；value 为字符串时写入文本，否则写入 pickle"""
+    tmp_path = f"{path}.{socket.gethostname()}.{os.getpid()}.tmp"
+    if isinstance(value, str):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(value)
+    else:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f)
+    os.replace(tmp_path, path)
+
+
+class TaskQueue:
+    """
+    共享目录任务队列
+
+    Parameters:
+    -----------
+    queue_dir: str
+        队列目录（所有机器上挂载到同一位置）
+    stale_timeout: float
+        领取后超过该时间（秒）没有心跳的任务重新放回队列
+    """
+    def __init__(self, queue_dir, stale_timeout=600):
+        self.queue_dir = queue_dir
+        self.stale_timeout = stale_timeout
+        self.dirs = {name: os.path.join(queue_dir, name) for name in ('tasks', 'claims', 'results', 'errors')}
+        for folder in self.dirs.values():
+            os.makedirs(folder, exist_ok=True)
+
+    def _path(self, kind, task_id, suffix='.pkl'):
+        return os.path.join(self.dirs[kind], f"{task_id}{suffix}")
+
+    def _claims(self):
+        """[(任务ID, 领取文件路径)]"""
+        claims = []
+        for file_name in os.listdir(self.dirs['claims']):
+            if file_name.endswith('.pkl') and '@' in file_name:
+                claims.append((file_name.split('@', 1)[0], os.path.join(self.dirs['claims'], file_name)))
+        return claims
+
+    def submit(self, task, data_range, data_fingerprint=None):
+        """
+        提交一个回测任务，已在运行或已有结果的任务不重复提交
+
+        Parameters:
+        -----------
+        task: dict
+            回测任务，格式同 StrategyOptimizer._make_task
+        data_range: tuple
+            (品种, 开始日期, 结束日期[, K线周期])，工作进程按此加载行情数据（同一范围只加载一次）
+        data_fingerprint: str
+            输入数据文件指纹，计入任务ID（见 sweep_journal.task_key），数据变化后不会使用旧的结果
+
+        Returns:
+        --------
+        str: 任务ID
+        """
+        task_id = task_key(task, data_fingerprint)
+        # 清除上一次运行留下的错误记录
+        self._remove(self._path('errors', task_id, '.txt'))
+        claimed = any(claimed_id == task_id for claimed_id, _ in self._claims())
+        if not claimed and not os.path.exists(self._path('results', task_id)):
+            _write_atomic(self._path('tasks', task_id), {'task': task, 'data_range': data_range})
+        return task_id
+
+    def claim(self, worker_id):
+        """
+        领取一个任务
+
+        Returns:
+        --------
+        tuple: (任务ID, 领取文件路径, 任务内容)，队列为空时返回None
+        """
+        for file_name in sorted(os.listdir(self.dirs['tasks'])):
+            if not file_name.endswith('.pkl'):
+                continue
+            task_id = file_name[:-4]
+            task_path = os.path.join(self.dirs['tasks'], file_name)
+            claim_path = os.path.join(self.dirs['claims'], f"{task_id}@{worker_id}.pkl")
+            try:
+                # 先更新修改时间作为第一次心跳再重命名，领取文件出现时就不会被判定为超时
+                os.utime(task_path)
+                os.rename(task_path, claim_path)
+                with open(claim_path, 'rb') as f:
+                    return task_id, claim_path, pickle.load(f)
+            except FileNotFoundError:
+                # 已被其他工作进程领取，或领取后被放回队列
+                continue
+        return None
+
+    def heartbeat(self, claim_path):
+        try:
+            os.utime(claim_path)
+        except FileNotFoundError:
+            pass
+
+    def complete(self, task_id, claim_path, summary, stats):
+        """写入结果并删除领取文件"""
+        _write_atomic(self._path('results', task_id), {'summary': summary, 'stats': stats})
+        self._remove(claim_path)
+
+    def fail(self, task_id, claim_path, message):
+        """记录错误并删除领取文件"""
+        _write_atomic(self._path('errors', task_id, '.txt'), message)
+        self._remove(claim_path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def requeue_stale(self):
+        """把超时没有心跳的任务放回队列，返回放回的数量"""
+        requeued = 0
+        now = time.time()
+        for task_id, claim_path in self._claims():
+            try:
+                if now - os.path.getmtime(claim_path) < self.stale_timeout:
+                    continue
+                os.rename(claim_path, self._path('tasks', task_id))
+                requeued += 1
+            except FileNotFoundError:
+                continue
+        return requeued
+
+    def collect(self, task_ids, on_result=None, poll_interval=1.0):
+        """
+        等待并汇总结果（读取后删除结果文件），等待期间把超时的任务放回队列
+
+        Parameters:
+        -----------
+        task_ids: list
+            任务ID
+        on_result: callable
+            on_result(任务ID, 结果汇总, 耗时统计)，每收到一个结果调用一次
+        poll_interval: float
+            检查结果的间隔（秒）
+
+        Returns:
+        --------
+        dict: {任务ID: 结果汇总}
+        """
+        remaining = set(task_ids)
+        summaries = {}
+        while remaining:
+            found = False
+            for task_id in sorted(remaining):
+                error_path = self._path('errors', task_id, '.txt')
+                if os.path.exists(error_path):
+                    with open(error_path, 'r', encoding='utf-8') as f:
+                        raise RuntimeError(f"任务 {task_id} 运行失败:\n{f.read()}")
+
+                result_path = self._path('results', task_id)
+                try:
+                    with open(result_path, 'rb') as f:
+                        result = pickle.load(f)
+                except FileNotFoundError:
+                    continue
+                self._remove(result_path)
+                # 超时放回后又被原工作进程完成时，删除重复的待领取任务
+                self._remove(self._path('tasks', task_id))
+                remaining.discard(task_id)
+                summaries[task_id] = result['summary']
+                found = True
+                if on_result is not None:
+                    on_result(task_id, result['summary'], result['stats'])
+            if remaining and not found:
+                self.requeue_stale()
+                time.sleep(poll_interval)
+        return summaries
+
+    def status(self):
+        """各状态的任务数量"""
+        count = lambda kind, suffix: sum(name.endswith(suffix) for name in os.listdir(self.dirs[kind]))
+        return {
+            '待领取': count('tasks', '.pkl'),
+            '运行中': count('claims', '.pkl'),
+            '已完成': count('results', '.pkl'),
+            '出错': count('errors', '.txt')
+        }
+
+
+def _load_data(data_range, cache):
+    """按 (品种, 开始日期, 结束日期[, K线周期]) 加载行情数据，同一范围只加载一次"""
+    if data_range not in cache:
+        symbol, start_date, end_date, *bar_size = data_range
+        data = BacktestEngine().load_data(symbol, start_date, end_date, bar_size[0] if bar_size else None)
+        cache.clear()
+        cache[data_range] = data
+    return cache[data_range]
+
+
+def run_worker(queue_dir, worker_id=None, poll_interval=1.0, exit_when_empty=False, stale_timeout=600):
+    """
+    工作进程主循环：领取任务、运行回测、写回结果
+
+    Parameters:
+    -----------
+    queue_dir: str
+        队列目录
+    worker_id: str
+        工作进程标识，默认为 主机名-进程号
+    poll_interval: float
+        队列为空时的等待间隔（秒）
+    exit_when_empty: bool
+        队列为空时退出，否则持续等待新任务
+    stale_timeout: float
+        与协调进程一致的心跳超时，心跳间隔为其四分之一
+
+    Returns:
+    --------
+    int: 完成的任务数量
+    """
+    queue = TaskQueue(queue_dir, stale_timeout)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    data_cache = {}
+    completed = 0
+
+    while True:
+        claimed = queue.claim(worker_id)
+        if claimed is None:
+            if exit_when_empty:
+                return completed
+            time.sleep(poll_interval)
+            continue
+
+        task_id, claim_path, item = claimed
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(stale_timeout / 4):
+                queue.heartbeat(claim_path)
+
+        heartbeat = threading.Thread(target=beat, daemon=True)
+        heartbeat.start()
+        try:
+            summary, stats = run_task_timed(item['task'], _load_data(item['data_range'], data_cache))
+            stats['pid'] = worker_id
+            queue.complete(task_id, claim_path, summary, stats)
+            completed += 1
+        except Exception:
+            queue.fail(task_id, claim_path, traceback.format_exc())
+        finally:
+            stop.set()
+            heartbeat.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='共享目录回测任务队列')
+    parser.add_argument('command', choices=['worker', 'status', 'requeue'],
+                        help='worker: 启动工作进程; status: 查看队列状态; requeue: 放回超时任务')
+    parser.add_argument('--queue-dir', required=True, help='队列目录')
+    parser.add_argument('--worker-id', default=None, help='工作进程标识')
+    parser.add_argument('--poll', type=float, default=1.0, help='队列为空时的等待间隔（秒）')
+    parser.add_argument('--stale-timeout', type=float, default=600, help='心跳超时（秒）')
+    parser.add_argument('--exit-when-empty', action='store_true', help='队列为空时退出')
+    args = parser.parse_args(argv)
+
+    if args.command == 'worker':
+        completed = run_worker(args.queue_dir, args.worker_id, args.poll, args.exit_when_empty, args.stale_timeout)
+        print(f"完成任务 {completed} 个")
+    elif args.command == 'status':
+        queue = TaskQueue(args.queue_dir, args.stale_timeout)
+        print(', '.join(f"{key}: {value}" for key, value in queue.status().items()))
+    else:
+        print(f"放回 {TaskQueue(args.queue_dir, args.stale_timeout).requeue_stale()} 个超时任务")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# 测试直接导入仓库根目录下的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _minute_bars(n_days=30, seed=0, switch_day=None):
+    """合成多日分钟K线（上午、下午两个时段），switch_day 之后换为下一个合约"""
+    rng = np.random.default_rng(seed)
+    times = (list(pd.date_range('09:30', '11:30', freq='min').time) +
+             list(pd.date_range('13:01', '15:00', freq='min').time))
+    frames = []
+    price = 3500.0
+    for k, day in enumerate(pd.bdate_range('2024-01-02', periods=n_days)):
+        # 每日设定一个趋势，使涨跌幅在阈值两侧都有分布
+        close = price * np.exp(np.cumsum(rng.normal(rng.normal(0, 0.00004), 0.0008, len(times))))
+        open_ = np.r_[price, close[:-1]]
+        frames.append(pd.DataFrame({
+            'open': open_,
+            'high': np.maximum(open_, close) * 1.0002,
+            'low': np.minimum(open_, close) * 0.9998,
+            'close': close,
+            'volume': rng.integers(1, 100, len(times)) * 1000.0,
+            'symbol': 'IF2402' if switch_day is not None and k >= switch_day else 'IF2401'
+        }, index=pd.DatetimeIndex([pd.Timestamp.combine(day.date(), t) for t in times])))
+        price = close[-1]
+    return pd.concat(frames)
+
+
+@pytest.fixture(scope='session')
+def minute_bars():
+    """合成分钟K线的构造函数：minute_bars(n_days=30, seed=0, switch_day=None)"""
+    return _minute_bars
+
+
+def _write_day(root, date, contracts, rng):
+    """写入一天的分钟数据文件，contracts: {合约: (价格, 成交量权重)}"""
+    folder = os.path.join(root, date)
+    os.makedirs(folder, exist_ok=True)
+    times = pd.date_range(pd.Timestamp(date) + pd.Timedelta('09:30:00'), periods=30, freq='min')
+    for symbol, (price, weight) in contracts.items():
+        close = price * np.exp(np.cumsum(rng.normal(0, 0.001, len(times))))
+        open_ = np.r_[price, close[:-1]]
+        volume = rng.integers(1, 100, len(times)) * 100.0 * weight
+        pd.DataFrame({'time': times, 'open': open_, 'high': np.maximum(open_, close) * 1.001,
+                      'low': np.minimum(open_, close) * 0.999, 'close': close, 'volume': volume,
+                      'amount': volume * close}
+                     ).to_pickle(os.path.join(folder, f"{symbol}.pkl"))
+
+
+def _make_tree(root):
+    """
+    合成按日期分目录的分钟数据文件（12个交易日），返回日期列表
+
+    'I'（铁矿石）与 'IF'、'IC' 同时存在，IF 的成交量远大于 I，按前缀匹配会把 IF 选为 I 的主力合约；
+    I 在第6日、IF 在第4日切换主力合约
+    """
+    rng = np.random.default_rng(0)
+    dates = [day.strftime('%Y%m%d') for day in pd.bdate_range('2024-01-02', periods=12)]
+    for k, date in enumerate(dates):
+        _write_day(root, date, {
+            'I2405': (800.0, 10 if k < 6 else 1),
+            'I2409': (780.0, 1 if k < 6 else 10),
+            'IF2401': (3500.0, 1000 if k < 4 else 1),
+            'IF2402': (3510.0, 1 if k < 4 else 1000),
+            'IC2402': (5000.0, 500)
+        }, rng)
+    return dates
+
+
+@pytest.fixture
+def minute_tree(tmp_path):
+    """tmp_path 下的合成分钟数据目录：(数据目录, 日期列表)"""
+    data_path = str(tmp_path / 'minute')
+    return data_path, _make_tree(data_path)
+
+
+@pytest.fixture
+def tree_engine(minute_tree):
+    """读取 minute_tree 数据目录的回测引擎构造函数（不使用主力连续缓存目录）"""
+    from backtest_engine import BacktestEngine
+    from continuous_cache import ContinuousSeriesCache
+    from data_loader import MinuteDataLoader
+    from dominant_contract import DominantContractLoader
+
+    def make(**kwargs):
+        engine = BacktestEngine(continuous_cache_dir=None, **kwargs)
+        engine.data_loader = MinuteDataLoader(minute_tree[0])
+        engine.dominant_loader = DominantContractLoader(minute_tree[0])
+        engine.continuous_cache = ContinuousSeriesCache(engine.dominant_loader, None)
+        return engine
+    return make
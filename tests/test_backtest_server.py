@@ -0,0 +1,95 @@
+"""常驻回测服务：HTTP 往返、进程池复用，以及淘汰/清空时正在使用的进程池延迟关闭"""
+import threading
+from http.server import ThreadingHTTPServer
+import pytest
+import backtest_server
+from backtest_server import BacktestClient, BacktestService, MarketDataCache, _Handler
+from parallel_executor import run_task
+from strategies import ma_strategy
+
+SPACE = {'short_period': [3, 5], 'long_period': [10, 20]}
+
+
+@pytest.fixture
+def service(monkeypatch, tree_engine):
+    # 服务加载数据时读取合成的数据目录
+    monkeypatch.setattr(backtest_server, 'BacktestEngine', tree_engine)
+    service = BacktestService()
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def client(service):
+    handler = type('Handler', (_Handler,), {'service': service})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield BacktestClient(port=server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+def _closed(executor):
+    return executor.shared_data._blocks == {}
+
+
+def test_sweep_and_evict_over_http(client, service, minute_tree):
+    _, dates = minute_tree
+    serial = client.sweep('MA', SPACE, 'IF', dates[0], dates[-1])
+    parallel = client.sweep('MA', SPACE, 'IF', dates[0], dates[-1], n_jobs=2)
+    assert [row['参数'] for row in parallel] == [row['参数'] for row in serial]
+    assert [row['总收益率'] for row in parallel] == [row['总收益率'] for row in serial]
+    assert len(serial) == 4
+
+    # 区间内的请求使用已缓存的数据集和进程池
+    executor, = service.data.executors.values()
+    client.sweep('MA', SPACE, 'IF', dates[2], dates[-3], n_jobs=2)
+    assert list(service.data.executors.values()) == [executor]
+    assert [d['symbol'] for d in client.status()['datasets']] == ['IF']
+
+    assert client.evict() == {'ok': True}
+    assert client.status()['datasets'] == []
+    assert service.data.executors == {} and _closed(executor)
+
+    with pytest.raises(RuntimeError, match='strategies'):
+        client.backtest('os.path.join', {}, 'IF', dates[0], dates[-1])
+
+
+def test_reload_recycles_executors(monkeypatch, client, service, minute_tree):
+    # 测试结束后恢复重新加载前的策略类，其他测试中已导入的类仍可序列化
+    monkeypatch.setattr(ma_strategy, 'MAStrategy', ma_strategy.MAStrategy)
+    _, dates = minute_tree
+    client.sweep('MA', SPACE, 'IF', dates[0], dates[-1], n_jobs=2)
+    old, = service.data.executors.values()
+    client.sweep('MA', SPACE, 'IF', dates[0], dates[-1], n_jobs=2, reload=True)
+    new, = service.data.executors.values()
+    assert new is not old and _closed(old) and not _closed(new)
+
+
+@pytest.mark.parametrize('remove', ['clear', 'evict'])
+def test_executor_in_use_is_closed_after_last_user(monkeypatch, tree_engine, minute_tree, remove):
+    monkeypatch.setattr(backtest_server, 'BacktestEngine', tree_engine)
+    _, dates = minute_tree
+    cache = MarketDataCache(max_datasets=1)
+    key, data = cache.acquire('IF', dates[0], dates[-1])
+    task = BacktestService()._task({'symbol': 'IF', 'start_date': dates[0], 'end_date': dates[-1]},
+                                   backtest_server.resolve_strategy('MA')(3, 10), {})
+
+    with cache.executor(key, data, 2) as executor:
+        with cache.executor(key, data, 2) as shared:
+            assert shared is executor
+        if remove == 'clear':
+            cache.clear()
+        else:
+            # 加载新的数据集，超出数量上限淘汰正在使用的数据集
+            cache.acquire('IC', dates[0], dates[-1])
+        assert cache.executors == {} and not _closed(executor)
+        # 移除后仍可继续完成正在进行的扫描
+        assert executor.map([task, task])[0]['总收益率'] == run_task(task, data)['总收益率']
+    assert _closed(executor)
+
+    # 数据集已被移除时不再创建进程池
+    with cache.executor(key, data, 2) as executor:
+        assert executor is None
+    cache.clear()
@@ -0,0 +1,116 @@
+"""多周期K线合成：按交易时段开盘对齐、不跨时段和合约切换，夜盘K线属于下一个交易日"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from bar_resampler import BarResampler, parse_bar_size, resample_bars, trading_days
+from data_loader import MinuteDataLoader
+from dominant_contract import DominantContractLoader
+
+
+def _commodity_bars():
+    """商品期货交易时段：夜盘 21:00-23:00，日盘 09:00-10:15、10:30-11:30、13:30-15:00（周四到下周一）"""
+    sessions = [('21:01', '23:00'), ('09:01', '10:15'), ('10:31', '11:30'), ('13:31', '15:00')]
+    times = []
+    for day in pd.DatetimeIndex(['2024-01-04', '2024-01-05', '2024-01-08']):
+        for start, end in sessions[1:]:
+            times.extend(pd.date_range(day + pd.Timedelta(start + ':00'), day + pd.Timedelta(end + ':00'), freq='min'))
+        # 当晚夜盘（周五夜盘属于下周一）
+        start, end = sessions[0]
+        times.extend(pd.date_range(day + pd.Timedelta(start + ':00'), day + pd.Timedelta(end + ':00'), freq='min'))
+    index = pd.DatetimeIndex(times)
+    close = 3000 + np.cumsum(np.random.default_rng(1).normal(0, 1, len(index)))
+    return pd.DataFrame({'open': close - 0.5, 'high': close + 1, 'low': close - 1, 'close': close,
+                         'volume': np.arange(len(index), dtype=float) + 1, 'symbol': 'RB2405'}, index=index)
+
+
+def _check_aggregation(bars, data, groups):
+    """合成K线的开高低收和成交量与按组聚合的结果一致"""
+    expected = data.groupby(groups).agg(open=('open', 'first'), high=('high', 'max'), low=('low', 'min'),
+                                        close=('close', 'last'), volume=('volume', 'sum'))
+    np.testing.assert_allclose(bars[['open', 'high', 'low', 'close', 'volume']].to_numpy(), expected.to_numpy())
+
+
+def test_index_futures_bars_align_to_session_open(minute_bars):
+    data = minute_bars(n_days=2)
+    hourly = resample_bars(data, '60min')
+    assert [t.strftime('%H:%M') for t in hourly.index[:4]] == ['10:30', '11:30', '14:00', '15:00']
+    assert len(hourly) == 8
+
+    quarter = resample_bars(data, '15min')
+    # 开盘集合竞价的 09:30 K线并入第一根15分钟K线
+    first = data.between_time('09:30', '09:45').loc['2024-01-02']
+    assert quarter.index[0] == pd.Timestamp('2024-01-02 09:45')
+    assert quarter['volume'].iloc[0] == first['volume'].sum() and quarter['open'].iloc[0] == first['open'].iloc[0]
+    # 午休不跨时段：上午最后一根为 11:30，下午第一根为 13:15
+    day = quarter.loc['2024-01-02']
+    assert pd.Timestamp('2024-01-02 11:30') in day.index and day.index[day.index > '2024-01-02 11:30'][0].strftime('%H:%M') == '13:15'
+    groups = np.searchsorted(quarter.index.asi8, pd.DatetimeIndex(data.index).asi8)
+    _check_aggregation(quarter, data, groups)
+
+
+def test_bars_do_not_cross_contract_switch(minute_bars):
+    data = minute_bars(n_days=4, switch_day=2)
+    daily = resample_bars(data, 'D')
+    assert list(daily['symbol']) == ['IF2401', 'IF2401', 'IF2402', 'IF2402']
+    # 不足一个周期的K线在换月处截断
+    bars = resample_bars(data.iloc[30:], '60min')
+    assert (bars.groupby('symbol').size() > 0).all()
+    switch = pd.DatetimeIndex(data.index)[data['symbol'].to_numpy() == 'IF2402'][0]
+    assert bars.loc[bars.index < switch, 'symbol'].eq('IF2401').all()
+    assert bars.loc[bars.index >= switch, 'symbol'].eq('IF2402').all()
+
+
+def test_night_session_belongs_to_next_trading_day():
+    data = _commodity_bars()
+    days = trading_days(data.index)
+    # 周四夜盘属于周五，周五夜盘属于下周一，数据末尾周一夜盘按下一个工作日（周二）
+    night = pd.DatetimeIndex(data.index).hour >= 21
+    assert set(days[night & (data.index.date == pd.Timestamp('2024-01-04').date())]) == {pd.Timestamp('2024-01-05')}
+    assert set(days[night & (data.index.date == pd.Timestamp('2024-01-05').date())]) == {pd.Timestamp('2024-01-08')}
+    assert set(days[night & (data.index.date == pd.Timestamp('2024-01-08').date())]) == {pd.Timestamp('2024-01-09')}
+
+    daily = resample_bars(data, 'D')
+    # 日线时间戳为该交易日最后一根分钟K线，周一夜盘单独成为周二的日线
+    assert list(daily.index) == list(pd.DatetimeIndex(['2024-01-04 15:00', '2024-01-05 15:00',
+                                                       '2024-01-08 15:00', '2024-01-08 23:00']))
+    _check_aggregation(daily, data, days)
+    # 周五的日线从周四 21:01 的夜盘开盘
+    friday = daily.index[1]
+    assert daily.loc[friday, 'open'] == data.loc['2024-01-04 21:01', 'open']
+
+
+def test_commodity_session_alignment():
+    data = _commodity_bars()
+    hourly = resample_bars(data, '60min')
+    friday = hourly.loc['2024-01-05']
+    # 夜盘 21:00 开盘，10:15-10:30 休息不足 session_gap，与上午连续为一个时段
+    assert [t.strftime('%H:%M') for t in hourly.loc['2024-01-04 21:00':'2024-01-04 23:59'].index] == ['22:00', '23:00']
+    assert [t.strftime('%H:%M') for t in friday.index if t.hour < 12] == ['10:00', '11:00', '11:30']
+    groups = np.searchsorted(hourly.index.asi8, pd.DatetimeIndex(data.index).asi8)
+    _check_aggregation(hourly, data, groups)
+
+
+@pytest.mark.parametrize('bar_size', ['30s', '90s', '5h'])
+def test_unsupported_bar_size(bar_size):
+    with pytest.raises(ValueError):
+        parse_bar_size(bar_size)
+
+
+def test_resampler_cache_follows_data_files(tmp_path, minute_tree):
+    data_path, dates = minute_tree
+    loader = MinuteDataLoader(data_path)
+    resampler = BarResampler(loader, DominantContractLoader(data_path), cache_dir=str(tmp_path / 'bars'))
+    bars = resampler.load('IF', dates[0], dates[-1], '15min')
+    assert len(os.listdir(tmp_path / 'bars')) == 1
+    pd.testing.assert_frame_equal(resampler.load('IF', dates[0], dates[-1], '15min'), bars)
+
+    # 数据文件变化后重新合成
+    path = os.path.join(data_path, dates[5], 'IF2402.pkl')
+    minutes = pd.read_pickle(path)
+    minutes['volume'] *= 2
+    minutes.to_pickle(path)
+    changed = resampler.load('IF', dates[0], dates[-1], '15min')
+    assert len(os.listdir(tmp_path / 'bars')) == 2
+    assert changed['volume'].sum() > bars['volume'].sum()
+    assert len(resampler.load('IF2401', dates[0], dates[-1], '1min')) == 30 * len(dates)
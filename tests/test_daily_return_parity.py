@@ -0,0 +1,50 @@
+"""DailyReturnStrategy 向量化回测与逐K线回测结果一致"""
+import numpy as np
+import pandas as pd
+import pytest
+from backtest_engine import BacktestEngine
+from strategies.daily_return_strategy import DailyReturnStrategy
+
+
+def _run(method, symbol, data, **params):
+    engine = BacktestEngine()
+    results = getattr(engine, method)(DailyReturnStrategy(**params), symbol, '20240101', '20241231',
+                                      data=data, plot=False, verbose=False)
+    return engine, results
+
+
+@pytest.mark.parametrize('symbol, switch_day', [('IF2401', None), ('IF', 15)])
+@pytest.mark.parametrize('params', [
+    {'return_threshold': 0.003, 'entry_time': '14:50:00'},
+    {'return_threshold': 0.001, 'entry_time': '10:00:30'},
+    {'return_threshold': 0.0, 'entry_time': '14:59:00'},
+])
+def test_vectorized_matches_event_loop(minute_bars, symbol, switch_day, params):
+    data = minute_bars(switch_day=switch_day)
+    loop_engine, loop_results = _run('run_backtest', symbol, data, **params)
+    vector_engine, vector_results = _run('run_vectorized_backtest', symbol, data, **params)
+
+    assert len(loop_engine.trades) > 0
+    assert pd.DataFrame(vector_engine.trades).equals(pd.DataFrame(loop_engine.trades))
+    assert vector_results['总收益率'] == loop_results['总收益率']
+    assert vector_results['交易次数'] == loop_results['交易次数']
+    assert vector_results['合约切换次数'] == loop_results['合约切换次数']
+    np.testing.assert_array_equal(vector_engine.pnl_df['total_value'], loop_engine.pnl_df['total_value'])
+
+
+def test_calculate_pnl_matches_per_bar_accumulation(minute_bars):
+    """向量化的 _calculate_pnl 与逐K线累加成交的持仓、现金一致"""
+    data = minute_bars(switch_day=15)
+    engine, _ = _run('run_backtest', 'IF', data, return_threshold=0.001, entry_time='10:00:30')
+    trades = pd.DataFrame(engine.trades).groupby('timestamp')
+
+    position, cash = 0.0, engine.initial_capital
+    expected = []
+    for timestamp, close in data['close'].items():
+        if timestamp in trades.groups:
+            bar_trades = trades.get_group(timestamp)
+            position += (bar_trades['direction'] * bar_trades['volume']).sum()
+            cash -= (bar_trades['direction'] * bar_trades['cost'] + bar_trades['commission']).sum()
+        expected.append(cash + position * close)
+
+    np.testing.assert_allclose(engine.pnl_df['total_value'], expected, rtol=1e-12)
@@ -0,0 +1,124 @@
+"""分钟数据存储：导入后读取结果与逐个读取 pickle 一致，增量导入只处理有变化的日期，换月表与主力合约加载一致"""
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from data_loader import MinuteDataLoader
+from data_store import DataStore
+from dominant_contract import DominantContractLoader
+from universe_scanner import UniverseScanner
+
+COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'amount']
+
+
+@pytest.fixture
+def store(tmp_path, minute_tree):
+    data_path, dates = minute_tree
+    store = DataStore(str(tmp_path / 'store'))
+    assert store.ingest(MinuteDataLoader(data_path)) == dates
+    return store
+
+
+def _rewrite(path, scale=2.0):
+    """原地改写数据文件（文件夹修改时间不变）"""
+    folder = os.path.dirname(path)
+    folder_stat = os.stat(folder)
+    minutes = pd.read_pickle(path)
+    minutes['volume'] *= scale
+    minutes.to_pickle(path)
+    os.utime(folder, ns=(folder_stat.st_atime_ns, folder_stat.st_mtime_ns))
+
+
+def test_reads_match_pickle_files(store, minute_tree):
+    data_path, dates = minute_tree
+    loader = MinuteDataLoader(data_path)
+    for symbol in ['IF2401', 'I2409', 'IC2402']:
+        expected = loader.load_future_data(symbol, dates[1], dates[8])[COLUMNS]
+        pd.testing.assert_frame_equal(store.load(symbol, dates[1], dates[8]), expected, check_names=False)
+    with pytest.raises(ValueError):
+        store.load('IH2401', dates[0], dates[-1])
+
+    scanner = UniverseScanner(data_path, n_jobs=1, cache_dir=None)
+    pd.testing.assert_frame_equal(store.daily_summary(dates[2], dates[5], products=['I', 'IC']),
+                                  scanner.daily_summary(dates[2], dates[5], products=['I', 'IC']), check_dtype=False)
+    assert store.status() == {'dates': 12, 'first_date': dates[0], 'last_date': dates[-1],
+                              'products': ['I', 'IC', 'IF']}
+
+
+def test_roll_table_matches_dominant_loader(store, minute_tree):
+    data_path, dates = minute_tree
+    rolls = store.roll_table('I')
+    assert list(rolls['symbol']) == ['I2405'] * 6 + ['I2409'] * 6
+    assert list(rolls['rolled']) == [False] * 6 + [True] + [False] * 5
+    assert list(store.roll_table('IF')['date'][store.roll_table('IF')['rolled']]) == [pd.Timestamp(dates[4])]
+
+    # 不复权的连续合约与按日选择主力合约加载的数据一致
+    expected = DominantContractLoader(data_path).load_dominant_data('I', dates[0], dates[-1])
+    continuous = store.continuous('I', dates[0], dates[-1], adjust=None)
+    np.testing.assert_array_equal(continuous['symbol'], expected['symbol'])
+    np.testing.assert_allclose(continuous[COLUMNS].to_numpy(), expected[COLUMNS].to_numpy())
+
+    # 后复权以最早的日期为基准，前复权以最新的主力合约为基准
+    backward = store.continuous('I', dates[0], dates[-1], adjust='backward')
+    forward = store.continuous('I', dates[0], dates[-1], adjust='forward')
+    factor = rolls['factor'].iloc[-1]
+    assert rolls['factor'].iloc[0] == 1.0 and factor != 1.0
+    first_day = continuous.index.normalize() == pd.Timestamp(dates[0])
+    np.testing.assert_allclose(backward.loc[first_day, 'close'], continuous.loc[first_day, 'close'])
+    np.testing.assert_allclose(forward['close'].iloc[-30:], continuous['close'].iloc[-30:])
+    np.testing.assert_allclose(forward['close'] * factor, backward['close'])
+    with pytest.raises(ValueError):
+        store.continuous('I', dates[0], dates[-1], adjust='ratio')
+
+
+def test_incremental_ingest(tmp_path, minute_tree):
+    data_path, dates = minute_tree
+    loader = MinuteDataLoader(data_path)
+    store = DataStore(str(tmp_path / 'store'))
+    assert store.ingest(loader, end_date=dates[5]) == dates[:6]
+    factors = store.roll_table()
+
+    # 追加新日期：已导入的日期（最后一个日期重新计算指纹，没有变化）不再导入，已有的复权因子不变
+    assert store.ingest(loader) == dates[6:]
+    pd.testing.assert_frame_equal(store.roll_table()[store.roll_table()['date'] <= pd.Timestamp(dates[5])], factors)
+    assert store.ingest(loader) == []
+
+    # 最后一个日期的文件改写后重新导入，替换下来的旧分区在下一次导入时删除
+    old_partition = store.manifest()['dates'][dates[-1]]['partition']
+    _rewrite(os.path.join(data_path, dates[-1], 'IC2402.pkl'))
+    assert store.ingest(loader) == [dates[-1]]
+    manifest = store.manifest()
+    assert manifest['retired'] == [old_partition]
+    assert manifest['dates'][dates[-1]]['partition'] != old_partition
+    assert os.path.isdir(os.path.join(store.partition_dir, old_partition))
+    assert store.ingest(loader) == []
+    assert store.manifest()['retired'] == [] and not os.path.exists(os.path.join(store.partition_dir, old_partition))
+    pd.testing.assert_frame_equal(store.load('IC2402', dates[-1], dates[-1]),
+                                  loader.load_future_data('IC2402', dates[-1], dates[-1])[COLUMNS], check_names=False)
+
+
+def test_rescan_detects_rewritten_earlier_dates(store, minute_tree):
+    data_path, dates = minute_tree
+    loader = MinuteDataLoader(data_path)
+    # 第2日 I2409 的成交量放大使其成为主力合约，从该日起重新计算换月表
+    _rewrite(os.path.join(data_path, dates[1], 'I2409.pkl'), scale=100.0)
+    assert store.ingest(loader) == []
+    assert store.ingest(loader, rescan=True) == [dates[1]]
+    assert list(store.roll_table('I')['symbol'][:3]) == ['I2405', 'I2409', 'I2405']
+
+    # 新增文件改变文件夹修改时间，不需要 rescan
+    _rewrite(os.path.join(data_path, dates[3], 'IC2402.pkl'))
+    pd.read_pickle(os.path.join(data_path, dates[3], 'IC2402.pkl')).to_pickle(os.path.join(data_path, dates[3], 'IH2402.pkl'))
+    assert store.ingest(loader) == [dates[3]]
+    assert 'IH' in store.status()['products']
+
+
+def test_manifest_is_json_and_ingest_is_exclusive(store):
+    with open(store.manifest_path, encoding='utf-8') as f:
+        assert json.load(f) == store.manifest()
+    assert not any(name.endswith('.tmp') for name in os.listdir(store.store_dir))
+
+    open(os.path.join(store.store_dir, '.ingest.lock'), 'w').close()
+    with pytest.raises(RuntimeError, match='导入'):
+        store.ingest(MinuteDataLoader(os.path.dirname(store.store_dir)))
@@ -0,0 +1,130 @@
+"""分钟数据校验：各检查项计数、修复后通过校验、加载时按 mode 处理，校验结论按文件指纹缓存"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import data_validator
+from data_loader import MinuteDataLoader
+from data_validator import DataValidator, repair_bars, validate_bars, validate_directory
+
+
+def _bars(n=20):
+    index = pd.date_range('2024-01-02 09:30', periods=n, freq='min')
+    close = 3500 + np.arange(n, dtype=float)
+    return pd.DataFrame({'open': close - 1, 'high': close + 1, 'low': close - 2, 'close': close,
+                         'volume': np.full(n, 100.0)}, index=index)
+
+
+def _corrupt(data):
+    """打乱顺序、重复时间戳、缺失和非正价格、最高价过低、负成交量和零成交量，并删除两根K线"""
+    data = data.copy()
+    data.iloc[3, data.columns.get_loc('close')] = np.nan
+    data.iloc[5, data.columns.get_loc('low')] = -1.0
+    data.iloc[7, data.columns.get_loc('high')] = data['close'].iloc[7] - 5
+    data.iloc[9, data.columns.get_loc('volume')] = -10.0
+    data.iloc[11, data.columns.get_loc('volume')] = 0.0
+    data = data.drop(data.index[[14, 15]])
+    data = pd.concat([data, data.iloc[[2]]])
+    return data.iloc[np.r_[1, 0, 2:len(data)]]
+
+
+def test_validate_bars_counts_each_problem():
+    assert validate_bars(_bars()) == {'rows': 20, 'unsorted': 0, 'duplicate': 0, 'nan': 0, 'non_positive_price': 0,
+                                      'ohlc_inconsistent': 0, 'negative_volume': 0, 'zero_volume': 0, 'gap': 0,
+                                      'missing_bars': 0, 'ok': True}
+
+    report = validate_bars(_corrupt(_bars()))
+    assert report['rows'] == 19 and not report['ok']
+    assert report['unsorted'] == 2 and report['duplicate'] == 1
+    assert report['nan'] == 1 and report['non_positive_price'] == 1
+    assert report['negative_volume'] == 1 and report['zero_volume'] == 1
+    # 最低价为负的K线计入非正价格，最高价低于收盘价的一根计入高低价不一致
+    assert report['ohlc_inconsistent'] == 1
+    assert report['gap'] == 1 and report['missing_bars'] == 2
+
+    # 超过 session_gap 的间隔是休市，不计为缺失
+    lunch = pd.concat([_bars(5), _bars(5).set_axis(pd.date_range('2024-01-02 13:01', periods=5, freq='min'))])
+    assert validate_bars(lunch)['gap'] == 0
+
+
+def test_repaired_bars_pass_validation():
+    data = _corrupt(_bars())
+    repaired = repair_bars(data)
+    report = validate_bars(repaired)
+    # 删除缺失价格、非正价格和负成交量的K线（计为缺失），不修改输入
+    assert report['ok'] and report['zero_volume'] == 1 and report['missing_bars'] == 2 + 3
+    assert len(repaired) == 15 and repaired.index.is_monotonic_increasing
+    assert len(data) == 19
+
+
+@pytest.fixture
+def corrupted_tree(minute_tree):
+    """第3个交易日的 IC2402 最高价低于收盘价"""
+    data_path, dates = minute_tree
+    path = os.path.join(data_path, dates[2], 'IC2402.pkl')
+    raw = pd.read_pickle(path)
+    raw.loc[5, 'high'] = raw.loc[5, 'close'] - 10
+    raw.to_pickle(path)
+    return data_path, dates, path
+
+
+@pytest.mark.parametrize('mode', ['warn', 'repair', 'skip'])
+def test_loader_handles_failed_files_by_mode(tmp_path, corrupted_tree, mode):
+    data_path, dates, _ = corrupted_tree
+    raw = MinuteDataLoader(data_path).load_future_data('IC2402', dates[0], dates[4])
+    validator = DataValidator(mode=mode, cache_path=str(tmp_path / 'verdicts.jsonl'))
+    data = MinuteDataLoader(data_path, validator=validator).load_future_data('IC2402', dates[0], dates[4])
+
+    day = data.index.normalize() == pd.Timestamp(dates[2])
+    if mode == 'warn':
+        pd.testing.assert_frame_equal(data, raw)
+    elif mode == 'repair':
+        assert len(data) == len(raw) and validate_bars(data)['ok']
+        assert (data.loc[day, 'high'] >= data.loc[day, 'close']).all()
+    else:
+        assert not day.any() and len(data) == len(raw) - 30
+
+
+def test_verdicts_cached_by_file_fingerprint(monkeypatch, tmp_path, corrupted_tree):
+    data_path, dates, path = corrupted_tree
+    cache_path = str(tmp_path / 'verdicts.jsonl')
+    MinuteDataLoader(data_path, validator=DataValidator(cache_path=cache_path)).load_future_data(
+        'IC2402', dates[0], dates[4])
+
+    # 记录文件末尾写了一半的行被忽略
+    with open(cache_path, 'a', encoding='utf-8') as f:
+        f.write('{"key": "x", "rep')
+    calls = []
+    monkeypatch.setattr(data_validator, 'validate_bars', lambda *args: calls.append(1) or {'ok': True})
+    validator = DataValidator(mode='skip', cache_path=cache_path)
+    assert len(validator.verdicts) == 5
+    data = MinuteDataLoader(data_path, validator=validator).load_future_data('IC2402', dates[0], dates[4])
+    # 已有结论的文件不再校验，未通过的文件仍被跳过
+    assert calls == [] and len(data) == 4 * 30
+
+    # 文件变化后重新校验
+    raw = pd.read_pickle(path)
+    raw.to_pickle(path)
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+    data = MinuteDataLoader(data_path, validator=validator).load_future_data('IC2402', dates[0], dates[4])
+    assert calls == [1] and len(data) == 5 * 30
+
+
+def test_validate_directory_writes_repaired_tree(tmp_path, corrupted_tree):
+    data_path, dates, _ = corrupted_tree
+    validator = DataValidator(cache_path=None)
+    report = validate_directory(MinuteDataLoader(data_path), dates[0], dates[3], validator,
+                                repair_dir=str(tmp_path / 'clean'))
+    assert len(report) == 4 * 5
+    failed = report[~report['ok']]
+    assert list(zip(failed['date'], failed['symbol'])) == [(dates[2], 'IC2402')]
+
+    clean = MinuteDataLoader(str(tmp_path / 'clean'))
+    assert validate_directory(clean, dates[0], dates[3], DataValidator(cache_path=None))['ok'].all()
+    pd.testing.assert_frame_equal(clean.load_future_data('IF2401', dates[0], dates[3]),
+                                  MinuteDataLoader(data_path).load_future_data('IF2401', dates[0], dates[3]))
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        DataValidator(mode='drop', cache_path=None)
@@ -0,0 +1,76 @@
+"""主力合约选择和换月复权：主力合约加载器、主力连续缓存和数据存储结果一致"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from backtest_engine import BacktestEngine
+from continuous_cache import ContinuousSeriesCache
+from data_loader import MinuteDataLoader
+from data_store import DataStore
+from dominant_contract import DominantContractLoader, product_symbols, roll_factor, select_dominant
+
+
+def test_product_symbols_match_whole_product_code():
+    symbols = ['IF2402', 'I2405', 'IC2402', 'I2409', 'IH2402']
+    assert product_symbols(symbols, 'I') == ['I2405', 'I2409']
+    assert product_symbols(symbols, 'IF') == ['IF2402']
+
+
+def test_select_dominant_and_roll_factor():
+    assert select_dominant({'IF2402': 10.0, 'IF2401': 10.0, 'IF2403': 5.0}) == 'IF2401'
+    closes = {'IF2401': 3500.0, 'IF2402': 3520.0}
+    assert roll_factor(2.0, 'IF2401', 'IF2402', closes) == 2.0 * 3500.0 / 3520.0
+    assert roll_factor(2.0, 'IF2401', 'IF2401', closes) == 2.0
+    assert roll_factor(2.0, 'IF2401', 'IF2403', closes) == 2.0
+
+
+def test_continuous_cache_matches_data_store(tmp_path, minute_tree):
+    data_path, dates = minute_tree
+    store = DataStore(str(tmp_path / 'store'))
+    store.ingest(MinuteDataLoader(data_path))
+    cache = ContinuousSeriesCache(DominantContractLoader(data_path), cache_dir=None)
+
+    for product in ['I', 'IF', 'IC']:
+        cached = cache.roll_table(product, dates[0], dates[-1])
+        stored = store.roll_table(product)
+        assert list(cached['symbol']) == list(stored['symbol'])
+        assert list(cached['rolled']) == list(stored['rolled'])
+        np.testing.assert_allclose(cached['factor'], stored['factor'] / stored['factor'].iloc[0], rtol=1e-12)
+    assert set(cache.roll_table('I', dates[0], dates[-1])['symbol']) == {'I2405', 'I2409'}
+
+
+def test_fingerprint_matches_whole_product_code(minute_tree):
+    data_path, dates = minute_tree
+    loader = MinuteDataLoader(data_path)
+    before = {symbol: loader.fingerprint(symbol, dates[0], dates[-1]) for symbol in ['I', 'IF', 'IF2401', None]}
+    daily = loader.daily_fingerprints('I', dates[0], dates[-1])
+
+    # 修改 I2405 的数据文件：只影响 'I' 和全部合约的指纹，不影响 'IF'
+    path = os.path.join(data_path, dates[3], 'I2405.pkl')
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+    after = {symbol: loader.fingerprint(symbol, dates[0], dates[-1]) for symbol in before}
+    assert [symbol for symbol in before if before[symbol] != after[symbol]] == ['I', None]
+    changed = loader.daily_fingerprints('I', dates[0], dates[-1])
+    assert [date for date in daily if daily[date] != changed[date]] == [dates[3]]
+
+
+def test_continuous_cache_concurrent_writers(tmp_path, minute_tree):
+    data_path, dates = minute_tree
+    cache_dir = str(tmp_path / 'continuous')
+    expected = ContinuousSeriesCache(DominantContractLoader(data_path)).load('IF', dates[0], dates[-1])
+
+    # 同一进程的多个线程同时补齐并写入同一品种的缓存
+    caches = [ContinuousSeriesCache(DominantContractLoader(data_path), cache_dir) for _ in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda cache: cache.load('IF', dates[0], dates[-1]), caches))
+    for result in results + [caches[0].load('IF', dates[0], dates[-1])]:
+        pd.testing.assert_frame_equal(result, expected)
+    assert os.listdir(cache_dir) == ['IF.pkl']
+
+
+def test_engine_continuous_cache_is_opt_in(tmp_path):
+    assert BacktestEngine().continuous_cache.cache_dir is None
+    cache_dir = str(tmp_path / 'continuous')
+    assert BacktestEngine(continuous_cache_dir=cache_dir).continuous_cache.cache_dir == cache_dir
+    assert not os.path.exists(cache_dir)
+    assert BacktestEngine(continuous_cache_dir=None).continuous_cache.cache_dir is None
@@ -0,0 +1,55 @@
+"""指标增量更新与向量化计算结果一致"""
+import numpy as np
+import pandas as pd
+import pytest
+from strategies.indicators import ATR, EMA, SMA, VWAP, RollingHigh, RollingLow, RollingStd, SessionReturn
+
+INDICATORS = [
+    ('SMA', lambda: SMA(20)),
+    ('SMA-open', lambda: SMA(7, field='open')),
+    ('EMA', lambda: EMA(12)),
+    ('RollingStd', lambda: RollingStd(20)),
+    ('RollingStd-ddof1', lambda: RollingStd(10, ddof=1)),
+    ('VWAP', lambda: VWAP()),
+    ('VWAP-close', lambda: VWAP(price='close')),
+    ('ATR', lambda: ATR(14)),
+    ('SessionReturn', lambda: SessionReturn()),
+    ('RollingHigh', lambda: RollingHigh(30)),
+    ('RollingLow', lambda: RollingLow(30)),
+]
+
+
+@pytest.fixture(scope='module')
+def bars(minute_bars):
+    return minute_bars(n_days=5, seed=1)
+
+
+@pytest.mark.parametrize('name, make', INDICATORS, ids=[name for name, _ in INDICATORS])
+def test_update_matches_compute(bars, name, make):
+    indicator = make()
+    incremental = np.array([indicator.update(bar) for _, bar in bars.iterrows()])
+    vectorized = make().compute(bars)
+
+    assert len(vectorized) == len(bars)
+    np.testing.assert_array_equal(np.isnan(incremental), np.isnan(vectorized))
+    np.testing.assert_allclose(incremental, vectorized, rtol=1e-12, atol=1e-12, equal_nan=True)
+
+
+@pytest.mark.parametrize('make', [VWAP, SessionReturn])
+def test_session_indicators_require_timestamp_for_dict_bars(bars, make):
+    timestamp, row = next(bars.iterrows())
+    bar = row.to_dict()
+    with pytest.raises(ValueError, match='timestamp'):
+        make().update(bar)
+    assert make().update(bar, timestamp) == make().update(row)
+
+
+def test_vwap_std_matches_compute_with_std(bars):
+    # 增量计算使用加权 Welford 算法，向量化计算使用去中心化的累计和，两者的舍入误差不同
+    indicator = VWAP()
+    incremental = []
+    for _, bar in bars.iterrows():
+        indicator.update(bar)
+        incremental.append(indicator.std)
+    _, vectorized = VWAP().compute_with_std(bars)
+    np.testing.assert_allclose(incremental, vectorized, rtol=1e-10, atol=1e-12)
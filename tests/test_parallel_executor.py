@@ -0,0 +1,48 @@
+"""共享内存行情数据和多进程回测执行器"""
+import numpy as np
+from parallel_executor import ParallelExecutor, SharedMarketData, run_task
+from strategies.ma_strategy import MAStrategy
+
+
+def _task(short_period, long_period):
+    return {
+        'strategy': MAStrategy(short_period, long_period),
+        'params': {'short_period': short_period, 'long_period': long_period},
+        'symbol': 'IF',
+        'start_date': '20240101',
+        'end_date': '20241231',
+        'initial_capital': 1000000,
+        'commission_rate': 0.00005
+    }
+
+
+def test_attach_uses_shared_memory_without_copying(minute_bars):
+    data = minute_bars(n_days=3, switch_day=1)
+    shared = SharedMarketData(data)
+    try:
+        attached, handles = SharedMarketData.attach(shared.descriptor)
+        name, shape, dtype = shared.descriptor['blocks']['values']
+        block = next(handle for handle in handles if handle.name == name)
+        values = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+        # 数值列直接引用共享内存中的数组（加入 symbol 列之后仍然如此）
+        for column in shared.columns:
+            assert np.shares_memory(attached[column].to_numpy(), values)
+        assert attached.index.equals(data.index)
+        np.testing.assert_array_equal(attached[shared.columns].to_numpy(), data[shared.columns].to_numpy())
+        np.testing.assert_array_equal(attached['symbol'].to_numpy(), data['symbol'].to_numpy())
+        del attached, values, block
+        for handle in handles:
+            handle.close()
+    finally:
+        shared.close()
+
+
+def test_parallel_map_matches_serial(minute_bars):
+    data = minute_bars(n_days=4, switch_day=2)
+    tasks = [_task(short_period, long_period) for short_period, long_period in [(3, 10), (5, 20), (8, 30)]]
+    with ParallelExecutor(data, n_jobs=2) as executor:
+        parallel = executor.map(tasks)
+    serial = [run_task(task, data) for task in tasks]
+    assert [summary['总收益率'] for summary in parallel] == [summary['总收益率'] for summary in serial]
+    assert [summary['交易次数'] for summary in parallel] == [summary['交易次数'] for summary in serial]
@@ -0,0 +1,43 @@
+"""逐轮淘汰搜索的轮数和区间安排"""
+import pytest
+from param_search import halving_schedule, successive_halving
+
+DATES = [f"2024{month:02d}{day:02d}" for month in range(1, 13) for day in range(1, 29)]
+
+
+@pytest.mark.parametrize('n_candidates, eta, rounds', [
+    (1, 3, 1), (2, 3, 1), (3, 3, 1), (4, 3, 2), (9, 3, 2), (10, 3, 3), (27, 3, 3), (28, 3, 4),
+    (243, 3, 5), (8, 2, 3), (1000, 10, 3), (1001, 10, 4)
+])
+def test_rounds_use_exact_integer_powers(n_candidates, eta, rounds):
+    schedule = halving_schedule(DATES, n_candidates, eta)
+    assert len(schedule) == rounds
+    assert schedule[0][2] == n_candidates
+    assert schedule[-1][:2] == (DATES[0], DATES[-1])
+
+
+def test_schedule_widens_window_each_round():
+    schedule = halving_schedule(DATES, 27, 3)
+    assert [n for _, _, n in schedule] == [27, 9, 3]
+    ends = [DATES.index(end) for _, end, _ in schedule]
+    assert ends == sorted(ends) and ends[-1] == len(DATES) - 1
+
+
+@pytest.mark.parametrize('eta', [1, 0.5, 0, -2])
+def test_eta_must_be_greater_than_one(eta):
+    with pytest.raises(ValueError, match='eta'):
+        halving_schedule(DATES, 27, eta)
+    with pytest.raises(ValueError, match='eta'):
+        successive_halving([1, 2, 3], lambda *args: [0, 0, 0], [(DATES[0], DATES[-1], 3)], eta)
+
+
+def test_successive_halving_keeps_best_candidates():
+    schedule = halving_schedule(DATES, 9, 3)
+    rounds = []
+
+    def evaluate(candidates, start_date, end_date, final):
+        rounds.append(list(candidates))
+        return [-abs(candidate - 5) for candidate in candidates]
+
+    assert successive_halving(list(range(9)), evaluate, schedule, 3) == [4, 5, 6]
+    assert rounds == [list(range(9)), [4, 5, 6]]
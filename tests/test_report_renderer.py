@@ -0,0 +1,32 @@
+"""批量渲染报告：进程池渲染的文件与任务一一对应、按任务顺序返回"""
+import os
+import numpy as np
+import pytest
+import report_renderer
+from backtest_engine import BacktestEngine
+from strategies.ma_strategy import MAStrategy
+
+
+def _heatmap(k):
+    return {'values': np.arange(6, dtype=float).reshape(2, 3) * k, 'index': [1, 2], 'columns': [3, 4, 5],
+            'title': f'热力图{k}', 'xlabel': 'x', 'ylabel': 'y'}
+
+
+@pytest.mark.parametrize('n_jobs', [1, 3])
+def test_paths_follow_job_order(tmp_path, minute_bars, n_jobs):
+    engine = BacktestEngine()
+    strategy = MAStrategy(3, 10)
+    engine.run_backtest(strategy, 'IF', '20240101', '20241231', data=minute_bars(n_days=2), plot=False, verbose=False)
+
+    jobs = [report_renderer.heatmap_job(f'S{k}', _heatmap(k)) for k in range(5)]
+    jobs[2:2] = report_renderer.backtest_report_jobs('MA(3,10)', engine, strategy, pixels=300)
+    paths = report_renderer.render_reports(jobs, str(tmp_path / 'reports'), n_jobs=n_jobs, dpi=30)
+
+    assert [os.path.basename(path) for path in paths] == [job['file_name'] for job in jobs]
+    assert paths[2].endswith('MA(3,10)_trades.png') and paths[3].endswith('MA(3,10)_pnl.png')
+    assert all(os.path.getsize(path) > 0 for path in paths)
+    assert sorted(os.listdir(tmp_path / 'reports')) == sorted(job['file_name'] for job in jobs)
+
+
+def test_file_name_replaces_unsafe_characters():
+    assert report_renderer._file_name('Grid(10,0.020) a/b:c', 'pnl') == 'Grid(10,0.020)_a_b_c_pnl.png'
@@ -0,0 +1,52 @@
+"""稳健性分析：交易段盈亏、按交易日的每日资产和模拟结果的可复现性"""
+import numpy as np
+import pandas as pd
+import pytest
+from robustness import daily_returns, daily_values, simulate, trade_pnls
+from trade_analytics import round_trips
+
+TIMES = pd.date_range('2024-01-02 09:30', periods=6, freq='min')
+
+
+def _fill(k, direction, volume, price, symbol='IF2401', kind='trade'):
+    return {'timestamp': TIMES[k], 'symbol': symbol, 'direction': direction, 'volume': volume, 'price': price,
+            'cost': price * volume, 'type': kind, 'commission': price * volume * 0.001}
+
+
+def test_trade_pnls_keep_position_open_across_roll():
+    trades = [_fill(0, 1, 1, 100.0),
+              _fill(2, -1, 1, 105.0, kind='switch_close'),
+              _fill(2, 1, 1, 105.0, symbol='IF2402', kind='switch_open'),
+              _fill(3, -1, 3, 108.0, symbol='IF2402'),
+              _fill(5, 1, 2, 104.0, symbol='IF2402')]
+    pnls = trade_pnls(trades)
+
+    # 换月不结束交易：一段多头（含换月手续费）和反手后的一段空头
+    np.testing.assert_allclose(pnls, round_trips(trades, method='netting')['net_pnl'])
+    np.testing.assert_allclose(pnls, [8.0 - (100.0 + 105.0 + 105.0 + 108.0) * 0.001,
+                                      2 * (108.0 - 104.0) - (2 * 108.0 + 2 * 104.0) * 0.001])
+    assert len(trade_pnls([])) == 0
+
+
+def test_daily_values_assign_night_session_to_next_trading_day():
+    index = pd.DatetimeIndex(['2024-01-04 14:59', '2024-01-04 21:01', '2024-01-05 09:31', '2024-01-05 14:59',
+                              '2024-01-05 21:01', '2024-01-06 01:00', '2024-01-08 09:31', '2024-01-08 14:59'])
+    pnl_df = pd.DataFrame({'total_value': [100.0, 101.0, 102.0, 103.0, 104.0, 105.0, 106.0, 107.0]}, index=index)
+    values = daily_values(pnl_df)
+
+    # 周五夜盘（含周六凌晨）属于下周一
+    assert list(values.index) == list(pd.DatetimeIndex(['2024-01-04', '2024-01-05', '2024-01-08']))
+    assert list(values) == [100.0, 103.0, 107.0]
+    np.testing.assert_allclose(daily_returns(pnl_df, 100.0), [0.0, 0.03, 107.0 / 103.0 - 1])
+
+
+@pytest.mark.parametrize('method', ['bootstrap', 'block', 'permutation'])
+def test_simulate_is_reproducible_and_independent_of_jobs(method):
+    values = np.random.default_rng(0).normal(0.001, 0.01, 60)
+    serial = simulate(values, method, n_paths=500, chunk_size=100, seed=7)
+    parallel = simulate(values, method, n_paths=500, chunk_size=100, n_jobs=2, seed=7)
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert len(serial) == 500
+    if method == 'permutation':
+        # 打乱顺序不改变总收益
+        np.testing.assert_allclose(serial['总收益率'], values.sum())
@@ -0,0 +1,73 @@
+"""策略逐K线计算的指标与指标库的向量化计算一致，网格策略的二分查找与逐网格线检查一致"""
+import numpy as np
+import pandas as pd
+from strategies.grid_strategy import GridStrategy
+from strategies.indicators import SMA
+from strategies.ma_strategy import MAStrategy
+from strategies.vwap_strategy import VWAPStrategy
+
+
+def _run_bars(strategy, data):
+    for timestamp, bar in data.iterrows():
+        strategy.on_bar(timestamp, bar)
+    return strategy
+
+
+def test_ma_strategy_averages_match_sma_compute(minute_bars):
+    data = minute_bars(n_days=3, seed=2)
+    history = _run_bars(MAStrategy(5, 20), data).ma_history.to_dict()
+
+    # 长均线预热完成后每根K线记录一次
+    warm = slice(19, None)
+    np.testing.assert_array_equal(history['timestamp'], data.index.values[warm])
+    np.testing.assert_allclose(history['short_ma'], SMA(5).compute(data)[warm], rtol=1e-12)
+    np.testing.assert_allclose(history['long_ma'], SMA(20).compute(data)[warm], rtol=1e-12)
+
+
+def test_vwap_strategy_matches_compute_vwap(minute_bars):
+    data = minute_bars(n_days=3, seed=3)
+    strategy = _run_bars(VWAPStrategy(band_multiplier=2.0), data)
+    history = strategy.vwap_history.to_dict()
+    expected = strategy.compute_vwap(data)
+
+    # 收盘平仓时段的K线不更新VWAP，也不参与向量化计算的累计
+    expected = expected[pd.DatetimeIndex(data.index).time < strategy.trading_times['close_time']]
+    np.testing.assert_array_equal(history['timestamp'], expected.index.values)
+    np.testing.assert_allclose(history['vwap'], expected['vwap'], rtol=1e-12)
+    np.testing.assert_allclose(history['vwap_std'], expected['vwap_std'], rtol=1e-10, atol=1e-12)
+
+
+def _loop_grid_signals(grids, positions, last_price, price, volume):
+    """逐网格线检查穿越（二分查找之前的实现），positions: {网格价格: 持仓状态}"""
+    signals = []
+    for grid_price in grids:
+        if last_price < grid_price <= price and positions[grid_price] >= 0:
+            signals.append((-1, volume, price, grid_price))
+            positions[grid_price] = -1
+        elif price <= grid_price < last_price and positions[grid_price] <= 0:
+            signals.append((1, volume, price, grid_price))
+            positions[grid_price] = 1
+    return signals
+
+
+def test_grid_crossings_match_per_level_loop():
+    rng = np.random.default_rng(4)
+    strategy = GridStrategy(grid_num=12, price_range_ratio=0.02)
+    strategy.initialize_grids(100.0, pd.Timestamp('2024-01-02 09:30'))
+    positions = {grid_price: 0 for grid_price in strategy.grids}
+
+    # 单根K线跨越多条网格线的大幅跳动、恰好落在网格线上、价格不变，以及超出网格区间
+    path = np.r_[100.0, 103.0, 97.0, strategy.grids[7], strategy.grids[7], strategy.grids[2], 99.9, 101.5,
+                 96.0, 104.0, 100.0 + np.cumsum(rng.normal(0, 0.8, 300))]
+    strategy.last_price = path[0]
+    crossed_several = False
+    for last_price, price in zip(path[:-1], path[1:]):
+        volume = strategy.calculate_position_volume(price)
+        expected = _loop_grid_signals(strategy.grids, positions, last_price, price, volume)
+        signals = strategy.get_grid_signals(price)
+        strategy.last_price = price
+
+        assert [(s['direction'], s['volume'], s['price'], s['grid_price']) for s in signals] == expected
+        assert list(strategy.grid_positions) == [positions[grid_price] for grid_price in strategy.grids]
+        crossed_several |= len(expected) > 2
+    assert crossed_several
@@ -0,0 +1,47 @@
+"""参数优化器：策略注册、结果表按注册名称分组"""
+import pytest
+from param_space import ParamSpace
+from results_store import ResultsTable
+from strategies.ma_strategy import MAStrategy
+from strategy_optimizer import StrategyOptimizer
+
+
+@pytest.fixture
+def optimizer(minute_bars):
+    optimizer = StrategyOptimizer('IF', '20240101', '20241231')
+    optimizer.market_data = minute_bars(n_days=6, switch_day=3)
+    return optimizer
+
+
+def test_results_grouped_by_registry_name(optimizer):
+    optimizer.set_strategy_config('VWAP', enabled=True)
+    optimizer.set_strategy_config('MA', enabled=True, params={'short_period': [3, 5], 'long_period': [10, 20]})
+    optimizer.run_all_tests()
+
+    # VWAP 策略实例名称为 'VWAP Strategy'，不以注册名称开头
+    assert {summary['策略名称'] for summary in optimizer.results} >= {'VWAP Strategy', 'MA(3,10)'}
+    table = optimizer.results_table()
+    assert set(table.df['策略类型'].cat.categories) == {'VWAP', 'MA'}
+    assert len(table.strategy('VWAP')) == 1 and len(table.strategy('MA')) == 4
+    assert optimizer.heatmap_data('MA')['title'] == 'MA策略参数优化热力图'
+
+
+def test_strategy_type_falls_back_to_name_prefix():
+    table = ResultsTable.from_summaries([{'策略名称': 'MA(3,10)', '参数明细': {'short_period': 3}},
+                                         {'策略名称': 'VWAP Strategy', '策略类型': 'VWAP'}])
+    assert list(table.df['策略类型']) == ['MA', 'VWAP']
+
+
+def test_register_strategy_accepts_positional_options(optimizer):
+    kernel = lambda space: []
+    optimizer.register_strategy('MA2', MAStrategy, {'short_period': [3]}, '均线2', kernel)
+    registry = optimizer.strategy_registry['MA2']
+    assert registry['label'] == '均线2' and registry['kernel'] is kernel
+    assert isinstance(registry['space'], ParamSpace) and registry['optimizer'] is None
+
+    custom = lambda: None
+    optimizer.register_strategy('MA3', MAStrategy, None, None, None, custom)
+    assert optimizer.strategy_registry['MA3']['optimizer'] is custom
+    # 旧版本第三个参数为优化函数，传入时提示使用 optimizer_func
+    with pytest.raises(TypeError, match='optimizer_func'):
+        optimizer.register_strategy('MA4', MAStrategy, custom)
@@ -0,0 +1,28 @@
+"""流式回测（逐日读取、后台预读）与一次性加载数据的逐K线回测结果一致"""
+import pandas as pd
+import pytest
+from strategies.daily_return_strategy import DailyReturnStrategy
+from strategies.ma_strategy import MAStrategy
+
+
+@pytest.mark.parametrize('symbol', ['IF', 'I', 'IF2402'])
+@pytest.mark.parametrize('make_strategy', [
+    lambda: MAStrategy(short_period=3, long_period=10),
+    lambda: DailyReturnStrategy(return_threshold=0.0, entry_time='09:50:00'),
+])
+@pytest.mark.parametrize('prefetch_days', [1, 3])
+def test_streaming_matches_run_backtest(minute_tree, tree_engine, symbol, make_strategy, prefetch_days):
+    _, dates = minute_tree
+    batch = tree_engine()
+    batch_results = batch.run_backtest(make_strategy(), symbol, dates[0], dates[-1], plot=False, verbose=False)
+    stream = tree_engine()
+    stream_results = stream.run_streaming_backtest(make_strategy(), symbol, dates[0], dates[-1], plot=False,
+                                                   verbose=False, prefetch_days=prefetch_days)
+
+    assert len(batch.trades) > 0
+    pd.testing.assert_frame_equal(pd.DataFrame(stream.trades), pd.DataFrame(batch.trades))
+    pd.testing.assert_frame_equal(stream.pnl_df, batch.pnl_df)
+    for key in ['总收益率', '交易次数', '交易天数', '合约切换次数', '合约切换记录']:
+        assert stream_results[key] == batch_results[key]
+    if symbol != 'IF2402':
+        assert batch_results['合约切换次数'] == 1
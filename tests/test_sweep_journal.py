@@ -0,0 +1,39 @@
+"""扫描断点记录：任务标识包含策略源码和输入数据指纹，中断后续跑只复用相同代码和数据的结果"""
+import pandas as pd
+import pytest
+import sweep_journal
+from strategies.ma_strategy import MAStrategy
+from sweep_journal import SweepJournal, task_key
+
+
+def _task(short_period=3, **options):
+    return dict({'strategy': MAStrategy(short_period, 10), 'params': {'short_period': short_period},
+                 'symbol': 'IF', 'start_date': '20240101', 'end_date': '20240131',
+                 'initial_capital': 1000000, 'commission_rate': 0.00005}, **options)
+
+
+def test_task_key_covers_data_and_source(monkeypatch):
+    key = task_key(_task(), 'data-v1')
+    assert task_key(_task(), 'data-v1') == key
+    assert task_key(_task(), 'data-v2') != key
+    assert task_key(_task(5), 'data-v1') != key
+    assert task_key(_task(bar_size='15min'), 'data-v1') != key
+
+    # 策略源码变化
+    monkeypatch.setattr(sweep_journal, '_source_hashes', {})
+    monkeypatch.setattr(sweep_journal, 'source_hash', lambda strategy_class: 'edited')
+    assert task_key(_task(), 'data-v1') != key
+
+
+def test_journal_resumes_only_with_same_data(tmp_path):
+    path = str(tmp_path / 'sweep.jsonl')
+    equity = pd.Series([1.0, 1.01], index=pd.DatetimeIndex(['2024-01-02', '2024-01-03']))
+    with SweepJournal(path) as journal:
+        journal.append(_task(), {'总收益率': 0.01, '每日资产': equity}, 'data-v1')
+
+    resumed = SweepJournal(path)
+    summary = resumed.get(_task(), 'data-v1')
+    assert summary['总收益率'] == pytest.approx(0.01)
+    pd.testing.assert_series_equal(summary['每日资产'], equity, check_freq=False)
+    assert resumed.get(_task(), 'data-v2') is None
+    assert resumed.get(_task(5), 'data-v1') is None
@@ -0,0 +1,28 @@
+"""矩阵化参数扫描内核与逐K线回测的结果汇总一致"""
+import numpy as np
+import pytest
+from parallel_executor import run_task
+from strategies.ma_strategy import MAStrategy
+from sweep_kernels import ma_crossover_sweep
+
+
+@pytest.mark.parametrize('short_period, long_period', [(5, 20), (3, 10)])
+def test_ma_kernel_matches_event_loop_summary(minute_bars, short_period, long_period):
+    # 8个交易日：日均交易次数按实际交易天数计算，不是固定的5天
+    data = minute_bars(n_days=8, switch_day=4)
+    task = {
+        'strategy': MAStrategy(short_period, long_period),
+        'params': {'short_period': short_period, 'long_period': long_period},
+        'symbol': 'IF',
+        'start_date': '20240101',
+        'end_date': '20241231',
+        'initial_capital': 1000000,
+        'commission_rate': 0.00005
+    }
+    loop = run_task(task, data)
+    kernel = ma_crossover_sweep(data, [short_period], [long_period])[0]
+
+    assert loop['交易天数'] == kernel['交易天数'] == 8
+    assert loop['交易次数'] == kernel['交易次数'] > 0
+    assert loop['日均交易次数'] == kernel['日均交易次数'] == loop['交易次数'] / 8
+    assert np.isclose(loop['总收益率'], kernel['总收益率'], rtol=1e-9, atol=1e-12)
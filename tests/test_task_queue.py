@@ -0,0 +1,127 @@
+"""共享目录任务队列：多个本地进程同时领取任务"""
+import multiprocessing
+import os
+import time
+import pytest
+from strategies.ma_strategy import MAStrategy
+from task_queue import TaskQueue
+
+
+def _make_task(short_period):
+    return {
+        'strategy': MAStrategy(short_period, 40),
+        'params': {'short_period': short_period, 'long_period': 40},
+        'symbol': 'IF',
+        'start_date': '20240101',
+        'end_date': '20240131',
+        'initial_capital': 1000000,
+        'commission_rate': 0.00005
+    }
+
+
+def _drain(queue_dir, worker_id):
+    """工作进程：领取并完成任务直到队列为空（不运行回测，结果为工作进程标识）"""
+    queue = TaskQueue(queue_dir)
+    while True:
+        claimed = queue.claim(worker_id)
+        if claimed is None:
+            return
+        task_id, claim_path, item = claimed
+        time.sleep(0.001)
+        queue.complete(task_id, claim_path, {'worker': worker_id, 'params': item['task']['params']},
+                       {'pid': worker_id, 'seconds': 0.0, 'bars': 0})
+
+
+def _start_workers(queue_dir, n):
+    context = multiprocessing.get_context()
+    workers = [context.Process(target=_drain, args=(queue_dir, f"w{i}")) for i in range(n)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def test_each_task_runs_once_across_processes(tmp_path):
+    queue = TaskQueue(str(tmp_path))
+    task_ids = [queue.submit(_make_task(period), ('IF', '20240101', '20240131')) for period in range(1, 41)]
+    assert len(set(task_ids)) == 40
+
+    workers = _start_workers(str(tmp_path), 4)
+    results = []
+    summaries = queue.collect(task_ids, lambda task_id, summary, stats: results.append(task_id), poll_interval=0.05)
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+    # 每个任务恰好完成一次，结果与任务对应
+    assert sorted(results) == sorted(task_ids)
+    assert [summaries[task_id]['params']['short_period'] for task_id in task_ids] == list(range(1, 41))
+    assert queue.status() == {'待领取': 0, '运行中': 0, '已完成': 0, '出错': 0}
+
+
+def test_stale_claim_is_requeued_and_finished_by_another_worker(tmp_path):
+    queue = TaskQueue(str(tmp_path), stale_timeout=0.2)
+    task_id = queue.submit(_make_task(5), ('IF', '20240101', '20240131'))
+
+    # 领取后不再心跳（工作进程被杀掉）
+    claimed = queue.claim('dead')
+    assert claimed is not None and claimed[0] == task_id
+    assert queue.claim('other') is None
+    # 领取时刷新了修改时间，超时之前不会被放回
+    assert queue.requeue_stale() == 0
+
+    time.sleep(0.3)
+    assert queue.requeue_stale() == 1
+    workers = _start_workers(str(tmp_path), 2)
+    summaries = queue.collect([task_id], poll_interval=0.05)
+    for worker in workers:
+        worker.join(timeout=30)
+    assert summaries[task_id]['worker'] in ('w0', 'w1')
+
+
+def test_claim_refreshes_mtime_of_long_queued_task(tmp_path):
+    queue = TaskQueue(str(tmp_path), stale_timeout=60)
+    task_id = queue.submit(_make_task(5), ('IF', '20240101', '20240131'))
+    # 任务已排队很久
+    old = time.time() - 3600
+    os.utime(os.path.join(queue.dirs['tasks'], f"{task_id}.pkl"), (old, old))
+
+    _, claim_path, _ = queue.claim('w0')
+    assert time.time() - os.path.getmtime(claim_path) < 60
+    assert queue.requeue_stale() == 0
+
+
+def test_failed_task_is_reported(tmp_path):
+    queue = TaskQueue(str(tmp_path))
+    task_id = queue.submit(_make_task(5), ('IF', '20240101', '20240131'))
+    _, claim_path, _ = queue.claim('w0')
+    queue.fail(task_id, claim_path, 'Traceback: 出错')
+    with pytest.raises(RuntimeError, match='出错'):
+        queue.collect([task_id], poll_interval=0.05)
+
+
+def test_resubmit_skips_claimed_and_finished_tasks(tmp_path):
+    queue = TaskQueue(str(tmp_path))
+    data_range = ('IF', '20240101', '20240131')
+    task_id = queue.submit(_make_task(5), data_range, 'data-v1')
+    _, claim_path, _ = queue.claim('w0')
+
+    # 运行中的任务重新提交（如协调进程重启）不会再放回队列，避免重复运行
+    assert queue.submit(_make_task(5), data_range, 'data-v1') == task_id
+    assert queue.status()['待领取'] == 0 and queue.claim('w1') is None
+
+    queue.complete(task_id, claim_path, {'worker': 'w0'}, {'pid': 'w0', 'seconds': 0.0, 'bars': 0})
+    assert queue.submit(_make_task(5), data_range, 'data-v1') == task_id
+    assert queue.status() == {'待领取': 0, '运行中': 0, '已完成': 1, '出错': 0}
+
+
+def test_task_id_includes_data_fingerprint(tmp_path):
+    queue = TaskQueue(str(tmp_path))
+    data_range = ('IF', '20240101', '20240131')
+    task_id = queue.submit(_make_task(5), data_range, 'data-v1')
+    _, claim_path, _ = queue.claim('w0')
+    queue.complete(task_id, claim_path, {'worker': 'w0'}, {'pid': 'w0', 'seconds': 0.0, 'bars': 0})
+
+    # 数据文件变化后是新的任务，不使用旧数据上的结果
+    new_id = queue.submit(_make_task(5), data_range, 'data-v2')
+    assert new_id != task_id
+    assert queue.claim('w1')[0] == new_id
@@ -0,0 +1,99 @@
+"""成交配对为完整交易：先开先平、净持仓、反手和换月的盈亏、手续费和 MAE/MFE"""
+import numpy as np
+import pandas as pd
+import pytest
+from trade_analytics import round_trips, summarize_round_trips
+
+RATE = 0.001
+TIMES = pd.date_range('2024-01-02 09:30', periods=8, freq='min')
+
+
+@pytest.fixture
+def bars():
+    return pd.DataFrame({
+        'high': [101.0, 112.0, 125.0, 121.0, 108.0, 107.0, 106.0, 106.0],
+        'low': [99.0, 108.0, 98.0, 115.0, 100.0, 103.0, 104.0, 104.0],
+    }, index=TIMES)
+
+
+def _fill(k, direction, volume, price, symbol='IF2401', kind='trade'):
+    return {'timestamp': TIMES[k], 'symbol': symbol, 'direction': direction, 'volume': volume, 'price': price,
+            'cost': price * volume, 'type': kind, 'commission': price * volume * RATE}
+
+
+def _scale_in_trades():
+    # 分两笔开多，分两笔平仓
+    return [_fill(0, 1, 1, 100.0), _fill(1, 1, 1, 110.0), _fill(3, -1, 1, 120.0), _fill(5, -1, 1, 105.0)]
+
+
+def test_fifo_pairs_first_entry_with_first_exit(bars):
+    trips = round_trips(_scale_in_trades(), bars, method='fifo')
+
+    assert list(trips['side']) == [1, 1]
+    np.testing.assert_allclose(trips['entry_price'], [100.0, 110.0])
+    np.testing.assert_allclose(trips['exit_price'], [120.0, 105.0])
+    np.testing.assert_allclose(trips['pnl'], [20.0, -5.0])
+    np.testing.assert_allclose(trips['commission'], [(100.0 + 120.0) * RATE, (110.0 + 105.0) * RATE])
+    np.testing.assert_allclose(trips['net_pnl'], trips['pnl'] - trips['commission'])
+    assert list(trips['holding_bars']) == [3, 4]
+    # 开仓信号之后到平仓信号K线（含）：第1笔为K线1~3，第2笔为K线2~5
+    np.testing.assert_allclose(trips['mfe'], [125.0 - 100.0, 125.0 - 110.0])
+    np.testing.assert_allclose(trips['mae'], [98.0 - 100.0, 98.0 - 110.0])
+
+
+def test_netting_merges_fills_until_flat(bars):
+    trips = round_trips(_scale_in_trades(), bars, method='netting')
+
+    assert len(trips) == 1
+    trip = trips.iloc[0]
+    assert trip['volume'] == 2
+    assert trip['entry_time'] == TIMES[0] and trip['exit_time'] == TIMES[5]
+    assert trip['entry_price'] == pytest.approx(105.0)
+    assert trip['exit_price'] == pytest.approx(112.5)
+    assert trip['pnl'] == pytest.approx(15.0)
+    assert trip['commission'] == pytest.approx((100.0 + 110.0 + 120.0 + 105.0) * RATE)
+    assert trip['mfe'] == pytest.approx((125.0 - 105.0) * 2)
+    assert trip['mae'] == pytest.approx((98.0 - 105.0) * 2)
+
+
+@pytest.mark.parametrize('method', ['fifo', 'netting'])
+def test_reversal_splits_into_close_and_open(bars, method):
+    # 多头2手，卖出3手：平掉2手多头并开1手空头
+    trades = [_fill(0, 1, 2, 100.0), _fill(2, -1, 3, 110.0), _fill(4, 1, 1, 104.0)]
+    trips = round_trips(trades, bars, method=method)
+
+    assert list(trips['side']) == [1, -1]
+    np.testing.assert_allclose(trips['volume'], [2.0, 1.0])
+    np.testing.assert_allclose(trips['pnl'], [20.0, 6.0])
+    # 反手成交的手续费按数量分摊到平仓和开仓两部分
+    np.testing.assert_allclose(trips['commission'], [(2 * 100.0 + 2 * 110.0) * RATE, (110.0 + 104.0) * RATE])
+    np.testing.assert_allclose(trips['mfe'], [(125.0 - 100.0) * 2, 110.0 - 100.0])
+    np.testing.assert_allclose(trips['mae'], [(98.0 - 100.0) * 2, 110.0 - 121.0])
+
+
+@pytest.mark.parametrize('method', ['fifo', 'netting'])
+def test_roll_keeps_trade_open_and_adds_roll_commission(bars, method):
+    trades = [_fill(0, 1, 1, 100.0),
+              _fill(2, -1, 1, 105.0, kind='switch_close'),
+              _fill(2, 1, 1, 105.0, symbol='IF2402', kind='switch_open'),
+              _fill(4, -1, 1, 108.0, symbol='IF2402')]
+    trips = round_trips(trades, bars, method=method)
+
+    assert len(trips) == 1
+    trip = trips.iloc[0]
+    assert (trip['entry_symbol'], trip['exit_symbol'], trip['rolls']) == ('IF2401', 'IF2402', 1)
+    assert trip['pnl'] == pytest.approx(8.0)
+    assert trip['commission'] == pytest.approx((100.0 + 105.0 + 105.0 + 108.0) * RATE)
+
+
+def test_summary_extremes_come_from_wins_and_losses(bars):
+    summary = summarize_round_trips(round_trips(_scale_in_trades(), bars, method='fifo'))
+    assert summary['交易笔数'] == 2
+    assert summary['胜率'] == 0.5
+    assert summary['最大单笔盈利'] == pytest.approx(20.0 - 0.22)
+    assert summary['最大单笔亏损'] == pytest.approx(-5.0 - 0.215)
+
+    # 没有亏损交易时最大单笔亏损为0，而不是最小的盈利
+    winners = summarize_round_trips(round_trips([_fill(0, 1, 1, 100.0), _fill(3, -1, 1, 120.0)], bars))
+    assert winners['最大单笔亏损'] == 0.0
+    assert winners['最大单笔盈利'] > 0
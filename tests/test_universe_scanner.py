@@ -0,0 +1,71 @@
+"""全市场横截面扫描：进程池与串行结果一致、按品种代码筛选，日线汇总按数据文件指纹缓存"""
+import os
+import pandas as pd
+import pytest
+import universe_scanner
+from universe_scanner import UniverseScanner, daily_bar_summary
+
+
+def last_close(data):
+    return {'close': data['close'].iloc[-1], 'bars': len(data)}
+
+
+def half_hour_bars(data):
+    # 多行统计结果：每个合约每日两行
+    return data[['close', 'volume']].resample('15min', label='right', closed='right').agg(
+        {'close': 'last', 'volume': 'sum'}).head(2).rename_axis('time')
+
+
+@pytest.mark.parametrize('func', [last_close, half_hour_bars])
+def test_scan_parallel_matches_serial(minute_tree, func):
+    data_path, dates = minute_tree
+    serial = UniverseScanner(data_path, n_jobs=1, cache_dir=None).scan(func, dates[0], dates[-1])
+    parallel = UniverseScanner(data_path, n_jobs=3, cache_dir=None).scan(func, dates[0], dates[-1])
+    pd.testing.assert_frame_equal(parallel, serial)
+
+    rows_per_file = 1 if func is last_close else 2
+    assert len(serial) == len(dates) * 5 * rows_per_file
+    assert list(serial.columns[:3]) == ['date', 'symbol', 'product']
+    assert serial['date'].is_monotonic_increasing
+
+
+def test_products_match_whole_product_code(minute_tree):
+    data_path, dates = minute_tree
+    table = UniverseScanner(data_path, n_jobs=1, cache_dir=None).scan(last_close, dates[0], dates[2], products=['I'])
+    # 'I' 不匹配 IF、IC 合约
+    assert set(table['symbol']) == {'I2405', 'I2409'}
+    assert set(table['product']) == {'I'}
+
+
+def test_daily_summary_cache_follows_data_files(monkeypatch, tmp_path, minute_tree):
+    data_path, dates = minute_tree
+    calls = []
+
+    def counting_summary(data):
+        calls.append(len(data))
+        return daily_bar_summary(data)
+
+    monkeypatch.setattr(universe_scanner, 'daily_bar_summary', counting_summary)
+    scanner = UniverseScanner(data_path, n_jobs=1, cache_dir=str(tmp_path / 'universe'))
+    summary = scanner.daily_summary(dates[0], dates[-1])
+    expected = scanner.scan(daily_bar_summary, dates[0], dates[-1])
+    pd.testing.assert_frame_equal(summary, expected)
+    assert len(os.listdir(tmp_path / 'universe')) == len(dates)
+    assert len(calls) == len(dates) * 5
+
+    # 缓存命中时不再读取分钟数据，按品种筛选缓存的全部合约
+    calls.clear()
+    pd.testing.assert_frame_equal(scanner.daily_summary(dates[0], dates[-1]), summary)
+    only_if = scanner.daily_summary(dates[0], dates[-1], products=['IF'])
+    assert calls == [] and set(only_if['symbol']) == {'IF2401', 'IF2402'}
+
+    # 数据文件变化后只重新计算该日期
+    path = os.path.join(data_path, dates[3], 'IC2402.pkl')
+    minutes = pd.read_pickle(path)
+    minutes['volume'] *= 2
+    minutes.to_pickle(path)
+    changed = scanner.daily_summary(dates[0], dates[-1])
+    assert len(calls) == 5
+    row = (changed['date'] == pd.Timestamp(dates[3])) & (changed['symbol'] == 'IC2402')
+    assert changed.loc[row, 'volume'].item() == 2 * summary.loc[row, 'volume'].item()
+    pd.testing.assert_frame_equal(changed[~row], summary[~row])
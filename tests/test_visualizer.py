@@ -0,0 +1,92 @@
+"""图表数据：折线降采样保留的下标升序、包含首尾和每个桶的极值，交易点位和换月线对齐到K线位置"""
+import numpy as np
+import pandas as pd
+import pytest
+from backtest_engine import BacktestEngine
+from strategies.ma_strategy import MAStrategy
+from visualizer import BacktestVisualizer, decimate_indices, lttb_indices, minmax_indices
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(5)
+    y = np.cumsum(rng.normal(0, 1, 10007))
+    y[[123, 4567]] = [y.max() + 50, y.min() - 50]  # 单点尖峰
+    return y
+
+
+@pytest.mark.parametrize('n_buckets', [7, 100, 1500])
+def test_minmax_keeps_extremes_of_every_bucket(series, n_buckets):
+    indices = minmax_indices(series, n_buckets)
+
+    assert np.all(np.diff(indices) > 0)
+    assert indices[0] == 0 and indices[-1] == len(series) - 1
+    assert len(indices) <= 4 * n_buckets
+    assert {123, 4567} <= set(indices)
+    bucket = int(np.ceil(len(series) / n_buckets))
+    for start in range(0, len(series), bucket):
+        kept = indices[(indices >= start) & (indices < start + bucket)]
+        values = series[start:start + bucket]
+        assert series[kept].min() == values.min() and series[kept].max() == values.max()
+
+
+def test_minmax_skips_nan_and_short_series(series):
+    assert np.array_equal(minmax_indices(series[:40], 10), np.arange(40))
+    assert np.array_equal(minmax_indices(series, 0), np.arange(len(series)))
+
+    y = series.copy()
+    y[1000:3000] = np.nan
+    indices = minmax_indices(y, 100)
+    assert np.all(np.diff(indices) > 0) and indices[-1] == len(y) - 1
+    assert np.nanmax(y[indices]) == np.nanmax(y) and np.nanmin(y[indices]) == np.nanmin(y)
+
+
+@pytest.mark.parametrize('n_out', [3, 50, 3000])
+def test_lttb_picks_one_point_per_bucket(series, n_out):
+    indices = lttb_indices(series, n_out)
+    assert len(indices) == n_out
+    assert indices[0] == 0 and indices[-1] == len(series) - 1
+    assert np.all(np.diff(indices) > 0)
+    assert np.array_equal(lttb_indices(series[:10], 20), np.arange(10))
+
+
+def test_decimate_indices_dispatch(series):
+    assert np.array_equal(decimate_indices(series, None), np.arange(len(series)))
+    assert np.array_equal(decimate_indices(series, 500, method=None), np.arange(len(series)))
+    assert np.array_equal(decimate_indices(series, 500), minmax_indices(series, 500))
+    assert np.array_equal(decimate_indices(series, 500, 'lttb'), lttb_indices(series, 1000))
+
+
+def test_trade_markers_and_switches_at_bar_positions(minute_bars):
+    data = minute_bars(n_days=4, switch_day=2)
+    engine = BacktestEngine()
+    strategy = MAStrategy(3, 10)
+    engine.run_backtest(strategy, 'IF', '20240101', '20241231', data=data, plot=False, verbose=False)
+    chart = BacktestVisualizer(engine.trades, engine.data, engine.pnl_df, strategy, decimate=None).trade_chart_data()
+
+    # 逐笔查找K线位置（向量化之前的做法）
+    index = pd.DatetimeIndex(engine.data.index)
+    trades = pd.DataFrame(engine.trades)
+    for direction, key in [(1, 'buy'), (-1, 'sell')]:
+        side = trades[(trades['type'] == 'trade') & (trades['direction'] == direction)]
+        assert list(chart[key][0]) == [index.get_loc(timestamp) for timestamp in side['timestamp']]
+        np.testing.assert_array_equal(chart[key][1], side['price'].to_numpy(dtype=float))
+    switches = trades.loc[trades['type'] == 'switch_close', 'timestamp']
+    assert len(switches) == 1
+    assert list(chart['switches']) == [index.get_loc(timestamp) for timestamp in switches]
+
+    # 指标折线按时间戳对齐到K线位置
+    history = strategy.ma_history.to_dict()
+    line = next(line for line in chart['indicators'] if np.array_equal(line['y'], history['short_ma']))
+    assert list(line['x']) == [index.get_loc(timestamp) for timestamp in pd.DatetimeIndex(history['timestamp'])]
+
+
+def test_markers_outside_trading_bars_are_dropped(minute_bars):
+    data = minute_bars(n_days=1)
+    pnl_df = pd.DataFrame({'net_value': 1.0, 'position': 0.0}, index=data.index)
+    trades = [{'timestamp': data.index[5], 'direction': 1, 'price': 1.0, 'type': 'trade'},
+              {'timestamp': data.index[5] + pd.Timedelta(seconds=30), 'direction': -1, 'price': 2.0, 'type': 'trade'},
+              {'timestamp': pd.Timestamp('2030-01-01 10:00'), 'direction': -1, 'price': 3.0, 'type': 'trade'}]
+    chart = BacktestVisualizer(trades, data, pnl_df, MAStrategy(3, 10)).trade_chart_data()
+    assert list(chart['buy'][0]) == [5]
+    assert len(chart['sell'][0]) == 0
@@ -0,0 +1,277 @@
+"""
+逐笔交易分析
+
+BacktestEngine.trades 记录的是单笔成交（direction、volume、price），本模块把成交配对为完整的交易
+（开仓到平仓），计算每笔交易的盈亏、持仓时间和持仓期间的最大不利/有利波动（MAE/MFE）。全部为数组运算，
+网格策略几十万笔成交也能很快完成。
+
+配对方式：
+- fifo: 先开先平，一笔成交可能与多笔成交配对，按数量拆分
+- netting: 从空仓开始到持仓归零（或反手）为一笔交易，开平仓价格为成交量加权均价
+
+反手成交拆分为平仓和开仓两部分；主力合约切换（switch_close / switch_open）不作为开平仓，
+持仓延续到新合约，换月手续费按持仓数量计入跨越换月的交易。
+
+    trips = round_trips(engine.trades, engine.data)
+    print(summarize_round_trips(trips))
+"""
+import numpy as np
+import pandas as pd
+
+ROLL_TYPES = ('switch_close', 'switch_open')
+
+COLUMNS = ['entry_time', 'exit_time', 'entry_symbol', 'exit_symbol', 'side', 'volume', 'entry_price', 'exit_price',
+           'pnl', 'commission', 'net_pnl', 'holding_time', 'holding_bars', 'rolls', 'mae', 'mfe']
+
+
+def _split_fills(trades_df, is_roll):
+    """
+    去掉换月成交（is_roll 为True的成交），反手成交拆分为平仓和开仓两部分
+
+    Returns:
+    --------
+    dict: 每个部分的 'fill'（成交在 trades_df 中的位置）、'qty'（数量）、'side'（所属持仓方向，1多 -1空）、
+        'opening'（是否开仓），按成交顺序排列，同一成交先平仓后开仓
+    """
+    fills = np.flatnonzero(~is_roll)
+    # 按资金调整后成交量可能为负（资金为负时），以带符号的数量确定实际方向
+    signed = (trades_df['direction'].to_numpy(dtype=float) * trades_df['volume'].to_numpy(dtype=float))[fills]
+    direction = np.sign(signed)
+    volume = np.abs(signed)
+
+    position = np.cumsum(direction * volume)
+    before = position - direction * volume
+    tolerance = 1e-9 * max(1.0, np.abs(volume).max()) if len(volume) else 0.0
+    before[np.abs(before) <= tolerance] = 0
+    position[np.abs(position) <= tolerance] = 0
+
+    # 与原持仓方向相反的成交先平仓（最多平掉原持仓），其余为开仓
+    reducing = np.sign(direction) == -np.sign(before)
+    close_qty = np.where(reducing, np.minimum(volume, np.abs(before)), 0.0)
+    open_qty = volume - close_qty
+    open_side = np.where(open_qty > tolerance, np.sign(direction), 0)
+
+    parts = {
+        'fill': np.r_[fills, fills],
+        'qty': np.r_[close_qty, open_qty],
+        'side': np.r_[np.sign(before), open_side],
+        'opening': np.r_[np.zeros(len(fills), dtype=bool), np.ones(len(fills), dtype=bool)]
+    }
+    keep = parts['qty'] > tolerance
+    order = np.lexsort((parts['opening'][keep], parts['fill'][keep]))
+    return {key: values[keep][order] for key, values in parts.items()}
+
+
+def _fifo_pairs(parts, tolerance):
+    """
+    先开先平配对：同一方向的开仓数量和平仓数量分别累加，两组累计数量区间的交集即为配对的数量
+
+    Returns:
+    --------
+    tuple: (开仓部分位置, 平仓部分位置, 配对数量)，按平仓顺序排列
+    """
+    entries, exits, quantities = [], [], []
+    for side in (1, -1):
+        opens = np.flatnonzero(parts['opening'] & (parts['side'] == side))
+        closes = np.flatnonzero(~parts['opening'] & (parts['side'] == side))
+        if len(opens) == 0 or len(closes) == 0:
+            continue
+        opened = np.cumsum(parts['qty'][opens])
+        closed = np.cumsum(parts['qty'][closes])
+        bounds = np.union1d(opened, closed)
+        bounds = np.r_[0.0, bounds[bounds <= min(opened[-1], closed[-1]) + tolerance]]
+        qty = np.diff(bounds)
+        valid = qty > tolerance
+        middle = (bounds[:-1] + qty / 2)[valid]
+        entries.append(opens[np.minimum(np.searchsorted(opened, middle), len(opens) - 1)])
+        exits.append(closes[np.minimum(np.searchsorted(closed, middle), len(closes) - 1)])
+        quantities.append(qty[valid])
+    if not entries:
+        empty = np.array([], dtype=int)
+        return empty, empty, np.array([])
+
+    entries, exits, quantities = np.concatenate(entries), np.concatenate(exits), np.concatenate(quantities)
+    order = np.lexsort((entries, exits))
+    return entries[order], exits[order], quantities[order]
+
+
+def _sparse_table(values, ufunc, max_length):
+    """稀疏表：第 k 层为长度 2^k 的区间的极值，只建到 max_length 需要的层数"""
+    table = [values]
+    while (1 << len(table)) <= max_length:
+        half = 1 << (len(table) - 1)
+        table.append(ufunc(table[-1][:-half], table[-1][half:]))
+    return table
+
+
+def _range_extreme(table, ufunc, left, right):
+    """区间 [left, right] 的极值（O(1) 查询，矩阵化），要求 left <= right"""
+    levels = np.frexp((right - left + 1).astype(float))[1] - 1
+    result = np.empty(len(left))
+    for level in np.unique(levels):
+        idx = levels == level
+        result[idx] = ufunc(table[level][left[idx]], table[level][right[idx] - (1 << level) + 1])
+    return result
+
+
+def _excursions(data, entry_loc, exit_loc, side, entry_price, exit_price, quantity):
+    """
+    持仓期间的最大不利波动（MAE，负数）和最大有利波动（MFE），单位为金额
+
+    开仓成交于开仓信号K线的下一根K线开盘，平仓成交于平仓信号K线的下一根K线开盘，
+    因此使用开仓信号之后到平仓信号K线（含）的最高/最低价，并包含开平仓价格本身
+    """
+    high = np.maximum(entry_price, exit_price)
+    low = np.minimum(entry_price, exit_price)
+    left, right = entry_loc + 1, exit_loc
+    window = right >= left
+    if window.any():
+        max_length = int((right - left + 1)[window].max())
+        highs = data['high'].to_numpy(dtype=float)
+        lows = data['low'].to_numpy(dtype=float)
+        high[window] = np.maximum(high[window], _range_extreme(_sparse_table(highs, np.maximum, max_length),
+                                                               np.maximum, left[window], right[window]))
+        low[window] = np.minimum(low[window], _range_extreme(_sparse_table(lows, np.minimum, max_length),
+                                                             np.minimum, left[window], right[window]))
+    favorable = np.where(side > 0, high - entry_price, entry_price - low)
+    adverse = np.where(side > 0, low - entry_price, entry_price - high)
+    return adverse * quantity, favorable * quantity
+
+
+def round_trips(trades, data=None, method='fifo'):
+    """
+    把成交配对为完整的交易
+
+    Parameters:
+    -----------
+    trades: list
+        BacktestEngine.trades
+    data: pd.DataFrame
+        回测使用的K线数据（BacktestEngine.data），用于计算持仓K线数和 MAE/MFE，None表示不计算
+    method: str
+        配对方式：'fifo' 或 'netting'
+
+    Returns:
+    --------
+    pd.DataFrame: 每行一笔已平仓的交易，列为 COLUMNS：
+        side 为 1（多）或 -1（空），pnl 为不含手续费的盈亏，commission 为开平仓和换月手续费，
+        rolls 为持仓期间的换月次数，mae/mfe 为持仓期间的最大不利/有利波动（金额）
+    """
+    if method not in ('fifo', 'netting'):
+        raise ValueError(f"未知的配对方式: {method}")
+    if not trades:
+        return pd.DataFrame(columns=COLUMNS)
+
+    trades_df = pd.DataFrame(trades)
+    volume = trades_df['volume'].to_numpy(dtype=float)
+    price = trades_df['price'].to_numpy(dtype=float)
+    commission = trades_df['commission'].to_numpy(dtype=float)
+    timestamps = pd.to_datetime(trades_df['timestamp']).to_numpy()
+    symbols = trades_df['symbol'].to_numpy()
+    tolerance = 1e-9 * max(1.0, np.abs(volume).max())
+
+    types = trades_df['type'] if 'type' in trades_df.columns else pd.Series('trade', index=trades_df.index)
+    is_roll = types.isin(ROLL_TYPES).to_numpy()
+
+    parts = _split_fills(trades_df, is_roll)
+    fill = parts['fill']
+    # 每单位成交量的手续费，拆分和配对的部分按数量分摊
+    unit_commission = commission / np.where(np.abs(volume) > 0, np.abs(volume), 1)
+
+    # 换月的累计次数和累计手续费（按成交顺序），两笔成交位置之差即为期间的换月
+    roll_counts = np.cumsum(types.eq('switch_close').to_numpy())
+    roll_costs = np.cumsum(np.where(is_roll, unit_commission, 0.0))
+    roll_total = np.cumsum(np.where(is_roll, commission, 0.0))
+
+    if method == 'fifo':
+        entries, exits, quantity = _fifo_pairs(parts, tolerance)
+        entry_fill, exit_fill = fill[entries], fill[exits]
+        side = parts['side'][entries]
+        entry_price, exit_price = price[entry_fill], price[exit_fill]
+        fees = (unit_commission[entry_fill] + unit_commission[exit_fill] +
+                roll_costs[exit_fill] - roll_costs[entry_fill]) * quantity
+    else:
+        # 平仓后持仓归零（或反手）结束一笔交易
+        signed = np.where(parts['opening'], 1, -1) * parts['qty']
+        holding = np.cumsum(signed)
+        closed = ~parts['opening'] & (np.abs(holding) <= tolerance)
+        trip_id = np.r_[0, np.cumsum(closed)[:-1]]
+        n_trips = int(closed.sum())
+        complete = trip_id < n_trips
+        trip_id, sub = trip_id[complete], {key: values[complete] for key, values in parts.items()}
+
+        opening = sub['opening']
+        qty = sub['qty']
+        quantity = np.bincount(trip_id, weights=np.where(opening, qty, 0), minlength=n_trips)
+        closing_qty = np.bincount(trip_id, weights=np.where(opening, 0, qty), minlength=n_trips)
+        value = qty * price[sub['fill']]
+        entry_price = np.bincount(trip_id, weights=np.where(opening, value, 0), minlength=n_trips) / quantity
+        exit_price = np.bincount(trip_id, weights=np.where(opening, 0, value), minlength=n_trips) / closing_qty
+        starts = np.searchsorted(trip_id, np.arange(n_trips))
+        ends = np.r_[starts[1:], len(trip_id)] - 1
+        entry_fill, exit_fill = sub['fill'][starts], sub['fill'][ends]
+        side = sub['side'][starts]
+        fees = (np.bincount(trip_id, weights=qty * unit_commission[sub['fill']], minlength=n_trips) +
+                roll_total[exit_fill] - roll_total[entry_fill])
+
+    pnl = side * (exit_price - entry_price) * quantity
+    table = pd.DataFrame({
+        'entry_time': timestamps[entry_fill],
+        'exit_time': timestamps[exit_fill],
+        'entry_symbol': symbols[entry_fill],
+        'exit_symbol': symbols[exit_fill],
+        'side': side.astype(int),
+        'volume': quantity,
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'pnl': pnl,
+        'commission': fees,
+        'net_pnl': pnl - fees,
+        'holding_time': timestamps[exit_fill] - timestamps[entry_fill],
+        'holding_bars': np.nan,
+        'rolls': roll_counts[exit_fill] - roll_counts[entry_fill],
+        'mae': np.nan,
+        'mfe': np.nan
+    }, columns=COLUMNS)
+
+    if data is not None and len(table):
+        # 成交所在的K线（时间戳不在数据中时取之前最近的K线）
+        index = pd.DatetimeIndex(data.index)
+        locs = np.clip(index.searchsorted(timestamps, side='right') - 1, 0, len(index) - 1)
+        entry_loc, exit_loc = locs[entry_fill], locs[exit_fill]
+        table['holding_bars'] = exit_loc - entry_loc
+        table['mae'], table['mfe'] = _excursions(data, entry_loc, exit_loc, side, entry_price, exit_price, quantity)
+    return table
+
+
+def summarize_round_trips(table):
+    """
+    交易统计
+
+    Parameters:
+    -----------
+    table: pd.DataFrame
+        round_trips 的返回结果
+
+    Returns:
+    --------
+    dict: 交易笔数、胜率、平均盈亏、盈亏比、平均持仓时间等（含手续费）
+    """
+    net = table['net_pnl'].to_numpy(dtype=float)
+    wins, losses = net[net > 0], net[net < 0]
+    return {
+        '交易笔数': len(net),
+        '多头笔数': int((table['side'] == 1).sum()),
+        '空头笔数': int((table['side'] == -1).sum()),
+        '胜率': len(wins) / len(net) if len(net) else 0.0,
+        '总盈亏': net.sum(),
+        '平均盈亏': net.mean() if len(net) else 0.0,
+        '平均盈利': wins.mean() if len(wins) else 0.0,
+        '平均亏损': losses.mean() if len(losses) else 0.0,
+        '盈亏比': wins.mean() / -losses.mean() if len(wins) and len(losses) else np.nan,
+        '最大单笔盈利': wins.max() if len(wins) else 0.0,
+        '最大单笔亏损': losses.min() if len(losses) else 0.0,
+        '平均持仓时间': table['holding_time'].mean() if len(net) else pd.Timedelta(0),
+        '平均MAE': table['mae'].mean() if len(net) else np.nan,
+        '平均MFE': table['mfe'].mean() if len(net) else np.nan
+    }
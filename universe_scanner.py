@@ -0,0 +1,207 @@
+"""
+全市场横截面扫描
+
+对日期区间内每个 (日期, 合约) 的分钟数据文件调用用户提供的矩阵化统计函数，在进程池中按交易日
+分发，结果汇总为一张整洁的表（每行一个日期、合约）。只需要日级统计（日内涨跌幅、成交量排名、
+流动性筛选等）时使用 daily_summary，各合约的日线汇总按数据文件指纹缓存，之后直接在汇总表上
+做矩阵化计算，不再读取分钟数据。
+
+    def first_hour_return(data):
+        first_hour = data.between_time('09:30', '10:30')
+        return {'first_hour_return': first_hour['close'].iloc[-1] / first_hour['open'].iloc[0] - 1}
+
+    scanner = UniverseScanner(n_jobs=8)
+    table = scanner.scan(first_hour_return, '20200101', '20241231', products=['IF', 'IC', 'IH'])
+
+    summary = scanner.daily_summary('20200101', '20241231')
+    summary['volume_rank'] = summary.groupby('date')['volume'].rank(ascending=False)
+    liquid = summary[summary.groupby(['date', 'product'])['volume'].transform('max') == summary['volume']]
+"""
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from data_loader import MinuteDataLoader, product_code
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.universe_cache')
+
+
+def daily_bar_summary(data):
+    """
+    单个合约单日分钟数据的日线汇总（daily_summary 使用的统计函数）
+
+    Returns:
+    --------
+    dict: 开高低收、成交量、成交额、K线数量、日内涨跌幅和振幅
+    """
+    opens = data['open'].to_numpy()
+    closes = data['close'].to_numpy()
+    high = data['high'].to_numpy().max()
+    low = data['low'].to_numpy().min()
+    return {
+        'open': opens[0],
+        'high': high,
+        'low': low,
+        'close': closes[-1],
+        'volume': data['volume'].to_numpy().sum(),
+        'amount': data['amount'].to_numpy().sum() if 'amount' in data.columns else np.nan,
+        'bars': len(data),
+        'return': closes[-1] / opens[0] - 1 if opens[0] else np.nan,
+        'range': (high - low) / opens[0] if opens[0] else np.nan
+    }
+
+
+def _scan_date(data_path, date, products, func):
+    """
+    工作进程：对某一日期的全部合约（可按品种筛选）调用统计函数
+
+    Returns:
+    --------
+    list: [(日期, 合约, 统计结果)]
+    """
+    loader = MinuteDataLoader(data_path)
+    rows = []
+    for symbol in sorted(loader.get_available_symbols(date)):
+        if products is not None and product_code(symbol) not in products:
+            continue
+        try:
+            data = loader.load_future_data(symbol, date, date)
+        except ValueError:
+            # 文件为空或缺少必要的列
+            continue
+        if data.empty:
+            continue
+        result = func(data)
+        if result is not None:
+            rows.append((date, symbol, result))
+    return rows
+
+
+def _tidy(rows):
+    """把 [(日期, 合约, 统计结果)] 整理为表，统计结果为字典/Series（一行）或 DataFrame（多行）"""
+    frames = []
+    records = []
+    for date, symbol, result in rows:
+        keys = {'date': pd.Timestamp(date), 'symbol': symbol, 'product': product_code(symbol)}
+        if isinstance(result, pd.DataFrame):
+            frame = result.reset_index(drop=result.index.name is None)
+            frames.append(frame.assign(**keys)[list(keys) + list(frame.columns)])
+        else:
+            records.append({**keys, **dict(result)})
+    if records:
+        frames.insert(0, pd.DataFrame.from_records(records))
+    if not frames:
+        return pd.DataFrame(columns=['date', 'symbol', 'product'])
+    table = pd.concat(frames, ignore_index=True)
+    return table.sort_values(['date', 'symbol'], kind='stable').reset_index(drop=True)
+
+
+class UniverseScanner:
+    """
+    全市场横截面扫描
+
+    Parameters:
+    -----------
+    data_path: str
+        分钟数据目录，默认与 MinuteDataLoader 一致
+    n_jobs: int
+        进程数，None表示使用全部CPU核心，1表示在当前进程中串行计算
+    cache_dir: str
+        日线汇总的缓存目录，None表示不缓存
+    """
+    def __init__(self, data_path=None, n_jobs=None, cache_dir=DEFAULT_CACHE_DIR):
+        self.loader = MinuteDataLoader(data_path) if data_path else MinuteDataLoader()
+        self.data_path = self.loader.data_path
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def dates(self, start_date, end_date):
+        """日期区间内有数据目录的日期（'YYYYMMDD'，升序）"""
+        dates = pd.date_range(pd.Timestamp(start_date), pd.Timestamp(end_date), freq='D').strftime('%Y%m%d')
+        return [date for date in dates if os.path.isdir(os.path.join(self.data_path, date))]
+
+    def _map_dates(self, func, dates, products):
+        """按日期分发统计任务，返回 {日期: [(日期, 合约, 统计结果)]}"""
+        products = set(products) if products is not None else None
+        if self.n_jobs == 1 or len(dates) <= 1:
+            return {date: _scan_date(self.data_path, date, products, func) for date in dates}
+
+        n = len(dates)
+        # 每个进程分多批领取，兼顾负载均衡和进程间通信次数
+        chunksize = max(1, n // (self.n_jobs * 4))
+        with ProcessPoolExecutor(max_workers=min(self.n_jobs, n)) as executor:
+            results = executor.map(_scan_date, [self.data_path] * n, dates, [products] * n, [func] * n,
+                                   chunksize=chunksize)
+            return dict(zip(dates, results))
+
+    def scan(self, func, start_date, end_date, products=None):
+        """
+        对每个 (日期, 合约) 的分钟数据调用统计函数
+
+        Parameters:
+        -----------
+        func: callable
+            func(data) -> dict / pd.Series（一行）、pd.DataFrame（多行）或 None（跳过），
+            data 为该合约当日的分钟数据；使用进程池时必须是模块级函数（可以被 pickle）
+        start_date, end_date: str
+            日期，格式：'YYYYMMDD'
+        products: list
+            只扫描这些品种（如 ['IF', 'IC']），None表示全部合约
+
+        Returns:
+        --------
+        pd.DataFrame: 'date'、'symbol'、'product' 列和统计结果列，按日期、合约排序
+        """
+        rows_by_date = self._map_dates(func, self.dates(start_date, end_date), products)
+        return _tidy([row for date in sorted(rows_by_date) for row in rows_by_date[date]])
+
+    def _cache_path(self, date):
+        return os.path.join(self.cache_dir, f"{date}.pkl")
+
+    def daily_summary(self, start_date, end_date, products=None):
+        """
+        全部合约的日线汇总（见 daily_bar_summary），按日期目录的文件指纹缓存，
+        数据文件没有变化的日期直接读取缓存
+
+        Parameters:
+        -----------
+        同 scan
+
+        Returns:
+        --------
+        pd.DataFrame: 每行一个 (日期, 合约)
+        """
+        dates = self.dates(start_date, end_date)
+        rows_by_date = {}
+        fingerprints = {}
+        for date in dates:
+            if not self.cache_dir:
+                break
+            fingerprints[date] = self.loader.fingerprint(None, date, date)
+            try:
+                with open(self._cache_path(date), 'rb') as f:
+                    cached = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                continue
+            if cached['fingerprint'] == fingerprints[date]:
+                rows_by_date[date] = cached['rows']
+
+        # 缓存了全部合约，未命中的日期也计算全部合约，再按品种筛选
+        missing = [date for date in dates if date not in rows_by_date]
+        computed = self._map_dates(daily_bar_summary, missing, None)
+        for date, rows in computed.items():
+            rows_by_date[date] = rows
+            if self.cache_dir:
+                # 先写临时文件再替换，保证并发读取时文件完整
+                path = self._cache_path(date)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump({'fingerprint': fingerprints[date], 'rows': rows}, f)
+                os.replace(tmp_path, path)
+
+        products = set(products) if products is not None else None
+        return _tidy([row for date in dates for row in rows_by_date[date]
+                      if products is None or product_code(row[1]) in products])
@@ -5,6 +5,8 @@ from datetime import datetime
 import numpy as np
 from matplotlib.dates import DateFormatter, AutoDateLocator
 import matplotlib as mpl
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import sys
 import platform
 
@@ -67,156 +69,416 @@ plt.style.use('seaborn')
 mpl.rcParams['figure.dpi'] = 100
 mpl.rcParams['savefig.dpi'] = 100
 
+def minmax_indices(y, n_buckets):
+    """
+    按桶保留首、尾、最小值和最大值所在的点（min/max-per-pixel 降采样）
+    
+    每个像素一个桶时，折线的形状与绘制全部数据点时一致
+    
+    Parameters:
+    -----------
+    y: np.ndarray
+        数据序列（等间隔）
+    n_buckets: int
+        桶数量，一般为绘图区域宽度的像素数
+        
+    Returns:
+    --------
+    np.ndarray: 保留的数据点下标（升序）
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_buckets <= 0 or n <= 4 * n_buckets:
+        return np.arange(n)
+    
+    bucket = int(np.ceil(n / n_buckets))
+    padded = np.full(bucket * int(np.ceil(n / bucket)), np.nan)
+    padded[:n] = y
+    rows = padded.reshape(-1, bucket)
+    starts = np.arange(len(rows)) * bucket
+    
+    # 全为NaN的桶 argmin/argmax 返回0，与桶首重复，不影响结果
+    lows = np.where(np.isnan(rows), np.inf, rows).argmin(axis=1)
+    highs = np.where(np.isnan(rows), -np.inf, rows).argmax(axis=1)
+    indices = np.concatenate([starts, starts + lows, starts + highs, np.minimum(starts + bucket, n) - 1])
+    return np.unique(indices[indices < n])
+
+
+def lttb_indices(y, n_out):
+    """
+    Largest-Triangle-Three-Buckets 降采样，保留视觉上最显著的 n_out 个点
+    
+    Parameters:
+    -----------
+    y: np.ndarray
+        数据序列（等间隔，横坐标为下标）
+    n_out: int
+        保留的点数
+        
+    Returns:
+    --------
+    np.ndarray: 保留的数据点下标（升序）
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+    previous = 0
+    for k in range(n_out - 2):
+        lo, hi = edges[k], edges[k + 1]
+        # 下一个桶的平均点（最后一个桶使用末尾点）
+        next_lo, next_hi = hi, edges[k + 2] if k + 2 < len(edges) else n
+        avg_x = (next_lo + next_hi - 1) / 2
+        avg_y = np.nanmean(y[next_lo:next_hi])
+        x = np.arange(lo, hi)
+        area = np.abs((previous - avg_x) * (y[lo:hi] - y[previous]) - (previous - x) * (avg_y - y[previous]))
+        previous = lo + int(np.nanargmax(area)) if np.isfinite(area).any() else lo
+        indices[k + 1] = previous
+    return indices
+
+
+def decimate_indices(y, pixels, method='minmax'):
+    """
+    按绘图宽度（像素）选择保留的数据点
+    
+    Parameters:
+    -----------
+    y: np.ndarray
+        数据序列
+    pixels: int
+        绘图区域宽度（像素），None表示不降采样
+    method: str
+        'minmax'、'lttb' 或 None（保留全部数据点）
+        
+    Returns:
+    --------
+    np.ndarray: 保留的数据点下标（升序）
+    """
+    if method is None or pixels is None:
+        return np.arange(len(y))
+    if method == 'lttb':
+        return lttb_indices(y, 2 * pixels)
+    return minmax_indices(y, pixels)
+
+
+def _decimate(x, y, pixels, method):
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    indices = decimate_indices(y, pixels, method)
+    return x[indices], y[indices]
+
+
+def _plot_line(ax, x, y, decimate, **kwargs):
+    """按坐标轴宽度（像素）降采样后绘制折线"""
+    x, y = _decimate(x, y, max(int(ax.get_window_extent().width), 1), decimate)
+    return ax.plot(x, y, **kwargs)
+
+
+def _set_time_ticks(ax, ticks):
+    """设置x轴刻度和标签"""
+    positions, labels = ticks
+    ax.set_xticks(positions)
+    ax.set_xticklabels(labels, rotation=45)
+
+
+def _new_figure(figsize, use_pyplot, **kwargs):
+    """
+    创建图表：use_pyplot 为 True 时由 pyplot 管理（可以 plt.show()），
+    否则创建独立的 Figure（Agg 画布，不依赖 pyplot 后端，只用于保存文件）
+    """
+    if use_pyplot:
+        return plt.figure(figsize=figsize)
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def draw_trade_chart(chart, decimate='minmax', figsize=(15, 8), use_pyplot=True):
+    """
+    绘制价格、交易点位和策略指标
+    
+    Parameters:
+    -----------
+    chart: dict
+        BacktestVisualizer.trade_chart_data 的返回结果
+    decimate: str
+        折线降采样方式，见 BacktestVisualizer
+    figsize: tuple
+        图表尺寸
+    use_pyplot: bool
+        是否由 pyplot 管理图表，见 _new_figure
+    """
+    fig = _new_figure(figsize, use_pyplot)
+    ax = fig.subplots()
+    
+    # 绘制价格走势
+    _plot_line(ax, *chart['price'], decimate, label='Price', color='gray', alpha=0.7)
+    
+    # 绘制策略指标
+    for indicator in chart['indicators']:
+        _plot_line(ax, indicator['x'], indicator['y'], decimate,
+                   label=indicator['name'], color=indicator['color'], alpha=indicator['alpha'])
+    
+    # 买入点（绿色上箭头）、卖出点（红色下箭头）
+    if len(chart['buy'][0]):
+        ax.scatter(*chart['buy'], marker='^', color='green', s=100, label='Buy')
+    if len(chart['sell'][0]):
+        ax.scatter(*chart['sell'], marker='v', color='red', s=100, label='Sell')
+    
+    # 标记主力合约切换点
+    if len(chart['switches']):
+        ax.vlines(chart['switches'], 0, 1, transform=ax.get_xaxis_transform(),
+                  colors='blue', linestyles='--', alpha=0.3, label='Contract Switch')
+    
+    _set_time_ticks(ax, chart['ticks'])
+    
+    ax.set_title('Price and Trade Points')
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Price')
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+def draw_pnl_curve(chart, decimate='minmax', figsize=(15, 12), use_pyplot=True):
+    """
+    绘制净值曲线和仓位变化
+    
+    Parameters:
+    -----------
+    chart: dict
+        BacktestVisualizer.pnl_curve_data 的返回结果
+    decimate, figsize, use_pyplot:
+        见 draw_trade_chart
+    """
+    # 创建两个子图
+    fig = _new_figure(figsize, use_pyplot)
+    ax1, ax2 = fig.subplots(2, 1, height_ratios=[2, 1], sharex=True)
+    
+    # 绘制净值曲线（上图）
+    _plot_line(ax1, *chart['net_value'], decimate, label='Strategy Net Value', color='blue')
+    
+    # 添加基准线
+    ax1.axhline(y=1, color='gray', linestyle='--', alpha=0.5, label='Benchmark')
+    
+    # 设置上图标题和标签
+    ax1.set_title('Strategy Net Value Curve')
+    ax1.set_ylabel('Net Value')
+    ax1.grid(True)
+    ax1.legend()
+    
+    # 绘制仓位变化（下图）
+    position_x, position = _decimate(*chart['position'], max(int(ax2.get_window_extent().width), 1), decimate)
+    ax2.plot(position_x, position, label='Position', color='orange', alpha=0.8)
+    ax2.fill_between(position_x, position, 0, alpha=0.2, color='orange')
+    
+    # 添加零线
+    ax2.axhline(y=0, color='gray', linestyle='-', alpha=0.3)
+    
+    # 设置下图标题和标签
+    ax2.set_title('Position')
+    ax2.set_xlabel('Time')
+    ax2.set_ylabel('Position Size')
+    ax2.grid(True)
+    
+    _set_time_ticks(ax2, chart['ticks'])
+    
+    # 调整子图间距
+    fig.tight_layout()
+    return fig
+
+
+def draw_heatmap(chart, figsize=(10, 8), use_pyplot=True):
+    """
+    绘制参数热力图
+    
+    Parameters:
+    -----------
+    chart: dict
+        {'values': 二维数组, 'index': 行取值, 'columns': 列取值, 'title', 'xlabel', 'ylabel'}，
+        见 StrategyOptimizer.heatmap_data
+    figsize, use_pyplot:
+        见 draw_trade_chart
+    """
+    fig = _new_figure(figsize, use_pyplot)
+    ax = fig.subplots()
+    heatmap_data = pd.DataFrame(chart['values'], index=chart['index'], columns=chart['columns'])
+    sns.heatmap(heatmap_data, annot=True, fmt='.2%', cmap='RdYlGn', ax=ax)
+    ax.set_title(chart['title'])
+    ax.set_xlabel(chart['xlabel'])
+    ax.set_ylabel(chart['ylabel'])
+    return fig
+
+
 class BacktestVisualizer:
-    def __init__(self, trades, data_df, pnl_df, strategy):
+    """
+    回测图表
+    
+    图表先整理为数组（trade_chart_data、pnl_curve_data），再由 draw_* 函数绘制，
+    批量生成报告时只需要把数组传给绘图进程（见 report_renderer）
+    
+    Parameters:
+    -----------
+    trades: list
+        交易记录
+    data_df: pd.DataFrame
+        K线数据
+    pnl_df: pd.DataFrame
+        逐K线净值和持仓
+    strategy: Strategy
+        策略实例（用于获取指标数据）
+    decimate: str
+        折线降采样方式：'minmax'（默认，每像素保留最小/最大值）、'lttb' 或 None（绘制全部数据点）；
+        交易点位和合约切换线始终按原始位置绘制
+    """
+    def __init__(self, trades, data_df, pnl_df, strategy, decimate='minmax'):
         self.trades = trades
         self.trades_df = pd.DataFrame(trades)
         self.data_df = data_df
         self.pnl_df = pnl_df
         self.strategy = strategy
+        self.decimate = decimate
         
-    def plot_trades_and_indicators(self, figsize=(15, 8)):
-        """绘制价格、交易点位和策略指标"""
-        fig, ax = plt.subplots(figsize=figsize)
+        # 交易时段只计算一次：K线所在位置 -> 交易时段内的序号
+        index = pd.DatetimeIndex(data_df.index)
+        self.trading_mask = self._session_mask(index)
+        self.trading_index = index[self.trading_mask]
+    
+    @staticmethod
+    def _session_mask(index):
+        """交易时段（09:30-15:00）掩码"""
+        offsets = index - index.normalize()
+        return (offsets >= pd.Timedelta('09:30:00')) & (offsets <= pd.Timedelta('15:00:00'))
+    
+    def _locate(self, timestamps):
+        """
+        一次 searchsorted 定位一批时间戳在交易时段K线中的序号
+        
+        Returns:
+        --------
+        tuple: (序号数组, 是否找到的掩码)，不在交易时段K线中的时间戳掩码为False
+        """
+        timestamps = pd.DatetimeIndex(pd.to_datetime(timestamps))
+        positions = self.trading_index.searchsorted(timestamps)
+        found = positions < len(self.trading_index)
+        found[found] = self.trading_index[positions[found]] == timestamps[found]
+        return positions, found
+    
+    @staticmethod
+    def _time_ticks(index):
+        """x轴刻度位置和标签（约8个）"""
+        step = max(len(index) // 8, 1)
+        return list(range(0, len(index), step)), [x.strftime('%Y-%m-%d %H:%M') for x in index[::step]]
+    
+    def trade_chart_data(self, pixels=None):
+        """
+        整理交易图数据
         
+        Parameters:
+        -----------
+        pixels: int
+            按该宽度（像素）预先对折线降采样，用于减小传给绘图进程的数据量；None表示保留全部数据点
+            
+        Returns:
+        --------
+        dict: 价格和指标折线 (x, y)、买卖点位 (x, 价格)、合约切换位置和x轴刻度，
+        x 为交易时段K线的序号
+        """
         # 只保留交易时段的数据
         trading_data = self._get_trading_data(self.data_df)
+        chart = {
+            'price': _decimate(np.arange(len(trading_data)), trading_data['close'], pixels, self.decimate),
+            'indicators': [],
+            'buy': (np.array([], dtype=int), np.array([])),
+            'sell': (np.array([], dtype=int), np.array([])),
+            'switches': np.array([], dtype=int),
+            'ticks': self._time_ticks(trading_data.index)
+        }
         
-        # 绘制价格走势
-        ax.plot(range(len(trading_data)), trading_data['close'], 
-                label='Price', color='gray', alpha=0.7)
-        
-        # 绘制策略指标
+        # 策略指标（共用同一份数据的指标只定位一次）
         indicator_data = self.strategy.get_indicator_data()
         if indicator_data:
-            if isinstance(indicator_data, list):
-                # 多个指标
-                for indicator in indicator_data:
-                    self._plot_indicator(ax, trading_data, indicator)
-            else:
+            if not isinstance(indicator_data, list):
                 # 单个指标
-                self._plot_indicator(ax, trading_data, indicator_data)
-        
-        # 绘制交易点位
-        normal_trades = self.trades_df[self.trades_df['type'] == 'trade']
-        buy_trades = normal_trades[normal_trades['direction'] == 1]
-        sell_trades = normal_trades[normal_trades['direction'] == -1]
-        
-        # 买入点（绿色上箭头）
-        if not buy_trades.empty:
-            buy_trades['timestamp'] = pd.to_datetime(buy_trades['timestamp'])
-            # 找到买入时间点在trading_data中的位置
-            buy_indices = [trading_data.index.get_loc(t) for t in buy_trades['timestamp']
-                          if t in trading_data.index]
-            ax.scatter(buy_indices, buy_trades['price'], 
-                      marker='^', color='green', s=100, label='Buy')
-        
-        # 卖出点（红色下箭头）
-        if not sell_trades.empty:
-            sell_trades['timestamp'] = pd.to_datetime(sell_trades['timestamp'])
-            # 找到卖出时间点在trading_data中的位置
-            sell_indices = [trading_data.index.get_loc(t) for t in sell_trades['timestamp']
-                           if t in trading_data.index]
-            ax.scatter(sell_indices, sell_trades['price'], 
-                      marker='v', color='red', s=100, label='Sell')
+                indicator_data = [indicator_data]
+            located = {}
+            for indicator in indicator_data:
+                line = self._indicator_line(indicator, located)
+                if line is not None:
+                    line['x'], line['y'] = _decimate(line['x'], line['y'], pixels, self.decimate)
+                    chart['indicators'].append(line)
         
-        # 标记主力合约切换点
-        switch_trades = self.trades_df[self.trades_df['type'] == 'switch_close']
-        if not switch_trades.empty:
-            switch_trades['timestamp'] = pd.to_datetime(switch_trades['timestamp'])
-            for _, trade in switch_trades.iterrows():
-                if trade['timestamp'] in trading_data.index:
-                    switch_idx = trading_data.index.get_loc(trade['timestamp'])
-                    ax.axvline(x=switch_idx, color='blue', linestyle='--', alpha=0.3)
-            ax.axvline(x=switch_idx, color='blue', linestyle='--', 
-                      alpha=0.3, label='Contract Switch')
-        
-        # 设置x轴刻度和标签
-        num_points = len(trading_data)
-        step = max(num_points // 8, 1)
-        xticks_pos = range(0, num_points, step)
-        xticks_labels = trading_data.index[::step]
-        
-        ax.set_xticks(xticks_pos)
-        ax.set_xticklabels([x.strftime('%Y-%m-%d %H:%M') for x in xticks_labels], rotation=45)
+        # 交易点位
+        if not self.trades_df.empty:
+            normal_trades = self.trades_df[self.trades_df['type'] == 'trade']
+            positions, found = self._locate(normal_trades['timestamp'])
+            directions = normal_trades['direction'].values
+            prices = normal_trades['price'].values.astype(float)
+            buy = found & (directions == 1)
+            sell = found & (directions == -1)
+            chart['buy'] = (positions[buy], prices[buy])
+            chart['sell'] = (positions[sell], prices[sell])
+            
+            # 主力合约切换点
+            switch_trades = self.trades_df[self.trades_df['type'] == 'switch_close']
+            positions, found = self._locate(switch_trades['timestamp'])
+            chart['switches'] = positions[found]
+        return chart
+    
+    def _indicator_line(self, indicator, located):
+        """单个指标的折线数据，按时间戳对齐到价格K线的位置；没有可绘制的点时返回None"""
+        data = indicator['data']
+        if id(data) not in located:
+            values = data if isinstance(data, dict) else pd.DataFrame(data)
+            located[id(data)] = (values, *self._locate(values['timestamp']))
+        values, positions, found = located[id(data)]
+        if not found.any():
+            return None
+        return {
+            'name': indicator['name'],
+            'color': indicator['color'],
+            'alpha': indicator['alpha'],
+            'x': positions[found],
+            'y': np.asarray(values[indicator['value_key']], dtype=float)[found]
+        }
+    
+    def pnl_curve_data(self, pixels=None):
+        """
+        整理净值曲线数据
         
-        ax.set_title('Price and Trade Points')
-        ax.set_xlabel('Time')
-        ax.set_ylabel('Price')
-        ax.legend()
-        plt.tight_layout()
-        return fig
-    
-    def _plot_indicator(self, ax, trading_data, indicator):
-        """绘制单个指标"""
-        df = pd.DataFrame(indicator['data'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        trading_indicator = self._get_trading_data(df.set_index('timestamp'))
+        Parameters:
+        -----------
+        pixels: int
+            见 trade_chart_data
+            
+        Returns:
+        --------
+        dict: 净值和持仓折线 (x, y) 及x轴刻度
+        """
+        # 只保留交易时段数据
+        trading_data = self._get_trading_data(self.pnl_df)
+        x = np.arange(len(trading_data))
+        return {
+            'net_value': _decimate(x, trading_data['net_value'], pixels, self.decimate),
+            'position': _decimate(x, trading_data['position'], pixels, self.decimate),
+            'ticks': self._time_ticks(trading_data.index)
+        }
         
-        if not trading_indicator.empty:
-            ax.plot(range(len(trading_indicator)), 
-                   trading_indicator[indicator['value_key']], 
-                   label=indicator['name'],
-                   color=indicator['color'],
-                   alpha=indicator['alpha'])
+    def plot_trades_and_indicators(self, figsize=(15, 8)):
+        """绘制价格、交易点位和策略指标"""
+        return draw_trade_chart(self.trade_chart_data(), self.decimate, figsize)
     
     def _get_trading_data(self, df):
-        """获取交易时段的数据"""
-        # 确保索引是datetime类型
-        df.index = pd.to_datetime(df.index)
-        
-        # 只保留交易时段的据
-        trading_mask = (df.index.time >= pd.Timestamp('09:30:00').time()) & \
-                      (df.index.time <= pd.Timestamp('15:00:00').time())
-        trading_data = df[trading_mask]
-        
-        return trading_data
+        """获取交易时段的数据（与K线数据同索引时直接使用预先计算的掩码）"""
+        if len(df) == len(self.trading_mask) and (df is self.data_df or df.index.equals(self.data_df.index)):
+            return df[self.trading_mask]
+        return df[self._session_mask(pd.DatetimeIndex(df.index))]
     
     def plot_pnl_curve(self, figsize=(15, 12)):
         """绘制净值曲线和仓位变化"""
-        # 创建两个子图
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=figsize, height_ratios=[2, 1], sharex=True)
-        
-        # 确保时间戳格式正确并只保留交易时段数据
-        trading_data = self._get_trading_data(self.pnl_df)
-        
-        # 绘制净值曲线（上图）
-        ax1.plot(range(len(trading_data)), trading_data['net_value'], 
-                label='Strategy Net Value', color='blue')
-        
-        # 添加基准线
-        ax1.axhline(y=1, color='gray', linestyle='--', alpha=0.5, label='Benchmark')
-        
-        # 设置上图标题和标签
-        ax1.set_title('Strategy Net Value Curve')
-        ax1.set_ylabel('Net Value')
-        ax1.grid(True)
-        ax1.legend()
-        
-        # 绘制仓位变化（下图）
-        ax2.plot(range(len(trading_data)), trading_data['position'], 
-                label='Position', color='orange', alpha=0.8)
-        ax2.fill_between(range(len(trading_data)), trading_data['position'], 
-                         0, alpha=0.2, color='orange')
-        
-        # 添加零线
-        ax2.axhline(y=0, color='gray', linestyle='-', alpha=0.3)
-        
-        # 设置下图标题和标签
-        ax2.set_title('Position')
-        ax2.set_xlabel('Time')
-        ax2.set_ylabel('Position Size')
-        ax2.grid(True)
-        
-        # 设置x轴刻度和标签
-        num_points = len(trading_data)
-        step = max(num_points // 8, 1)
-        xticks_pos = range(0, num_points, step)
-        xticks_labels = trading_data.index[::step]
-        
-        ax2.set_xticks(xticks_pos)
-        ax2.set_xticklabels([x.strftime('%Y-%m-%d %H:%M') for x in xticks_labels], rotation=45)
-        
-        # 调整子图间距
-        plt.tight_layout()
-        return fig
\ No newline at end of file
+        return draw_pnl_curve(self.pnl_curve_data(), self.decimate, figsize)
@@ -0,0 +1,99 @@
+"""
+滚动前进（walk-forward）分析
+
+把完整交易日序列切分为若干个 训练区间 + 测试区间 的组合（fold）：
+- 滚动窗口：训练区间长度固定，随测试区间一起向前平移
+- 锚定窗口：训练区间起点固定为第一个交易日，长度逐步增加
+
+每个fold在训练区间上做参数扫描，选出的最优参数在紧随其后的测试区间上回测，
+测试区间首尾相接，拼接成样本外净值曲线
+"""
+import pandas as pd
+import numpy as np
+
+
+def walk_forward_folds(trading_dates, train_days, test_days, step_days=None, anchored=False):
+    """
+    计算各fold的训练区间和测试区间
+
+    Parameters:
+    -----------
+    trading_dates: list
+        完整区间内的交易日（'YYYYMMDD'，升序）
+    train_days: int
+        训练区间交易日数（锚定窗口为第一个训练区间的长度）
+    test_days: int
+        测试区间交易日数
+    step_days: int
+        相邻fold的间隔交易日数，默认等于 test_days（测试区间不重叠）
+    anchored: bool
+        是否使用锚定窗口
+
+    Returns:
+    --------
+    list: [{'fold', 'train_start', 'train_end', 'test_start', 'test_end'}, ...]
+    """
+    step_days = step_days or test_days
+    folds = []
+    test_begin = train_days
+    while test_begin < len(trading_dates):
+        test_stop = min(test_begin + test_days, len(trading_dates))
+        train_begin = 0 if anchored else test_begin - train_days
+        folds.append({
+            'fold': len(folds) + 1,
+            'train_start': trading_dates[train_begin],
+            'train_end': trading_dates[test_begin - 1],
+            'test_start': trading_dates[test_begin],
+            'test_end': trading_dates[test_stop - 1]
+        })
+        test_begin += step_days
+    return folds
+
+
+def stitch_equity(daily_values, initial_capital):
+    """
+    拼接各测试区间的每日总资产为连续的样本外资产曲线
+
+    每个测试区间都从 initial_capital 开始独立回测，按上一区间的期末资产等比例缩放后首尾相接；
+    测试区间有重叠时，重叠日期只保留较早fold的结果，较晚fold从重叠结束后开始接续
+
+    Parameters:
+    -----------
+    daily_values: list
+        按fold顺序排列的每日总资产序列（pd.Series，索引为日期）
+    initial_capital: float
+        初始资金
+
+    Returns:
+    --------
+    pd.Series: 样本外每日总资产
+    """
+    pieces = []
+    equity = initial_capital
+    last_date = None
+    for values in daily_values:
+        base = initial_capital
+        if last_date is not None:
+            # 重叠部分以本fold在上一区间末日的资产为基准
+            overlap = values[values.index <= last_date]
+            if not overlap.empty:
+                base = overlap.iloc[-1]
+            values = values[values.index > last_date]
+        if values.empty:
+            continue
+        scaled = values / base * equity
+        pieces.append(scaled)
+        equity = scaled.iloc[-1]
+        last_date = values.index[-1]
+    if not pieces:
+        return pd.Series(dtype=float)
+    return pd.concat(pieces)
+
+
+def max_drawdown(values):
+    """计算资产曲线的最大回撤（负数）"""
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return 0.0
+    peak = np.maximum.accumulate(values)
+    return float((values / peak - 1).min())